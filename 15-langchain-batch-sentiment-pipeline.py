@@ -0,0 +1,278 @@
+# Example: Batched, concurrent feedback classification with LangChain and Groq
+# This script takes the parse -> summarize -> sentiment -> route flow from script 09 and runs it
+# over a whole file (or stream) of feedback instead of one string per blocking `invoke`.
+#
+# - Input is read from a JSONL file (one {"id": ..., "feedback": ...} object per line),
+#   a CSV file (with a "feedback" column), or stdin ("-"), one window at a time.
+# - Each window is pushed through `abatch_as_completed` with a configurable `max_concurrency`.
+# - Results are written to a JSONL file as soon as each item finishes. Malformed input lines and
+#   items whose model calls fail get an {"id": ..., "error": ...} record and are counted as failed.
+# - Throughput (items/s) and p50/p99 latency are reported at the end.
+#
+# Usage:
+#   python 15-langchain-batch-sentiment-pipeline.py feedback.jsonl --output results.jsonl --concurrency 16
+#   cat feedback.csv | python 15-langchain-batch-sentiment-pipeline.py - --format csv
+#   python 15-langchain-batch-sentiment-pipeline.py --fake   # no API key required
+
+import argparse
+import asyncio
+import csv
+import json
+import statistics
+import sys
+import time
+from itertools import islice
+from operator import itemgetter
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: A local fake chat model for testing without an API key ---
+# It answers the sentiment prompt with a keyword-based label and echoes a short text for the
+# other prompts. `latency` simulates the network round-trip so concurrency effects are visible.
+class FakeFeedbackLLM(BaseChatModel):
+    latency: float = 0.05
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-feedback"
+
+    def _respond(self, messages):
+        prompt = messages[-1].content
+        body = prompt.split("\n\n", 1)[-1].strip()
+        if prompt.startswith("Determine the sentiment"):
+            lowered = body.lower()
+            if any(word in lowered for word in ("disappointed", "rude", "terrible", "unhelpful")):
+                return "Negative"
+            if any(word in lowered for word in ("fantastic", "great", "friendly", "love")):
+                return "Positive"
+            return "Neutral"
+        return body[:200]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        message = AIMessage(content=self._respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = AIMessage(content=self._respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# --- Step 2: Prompt templates (same wording as script 09) ---
+parse_template = PromptTemplate(
+    input_variables=["raw_feedback"],
+    template="Parse and clean the following customer feedback for key information:\n\n{raw_feedback}"
+)
+summary_template = PromptTemplate(
+    input_variables=["parsed_feedback"],
+    template="Summarize this customer feedback in one concise sentence:\n\n{parsed_feedback}"
+)
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+thankyou_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Given the feedback, draft a thank you message for the user and request them to leave a positive rating on our webpage:\n\n{feedback}"
+)
+details_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Given the feedback, draft a message for the user and request them provide more details about their concern:\n\n{feedback}"
+)
+apology_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Given the feedback, draft an apology message for the user and mention that their concern has been forwarded to the relevant department:\n\n{feedback}"
+)
+
+
+# --- Step 3: Build the full parse -> summarize -> sentiment -> route pipeline ---
+# The input is {"id": ..., "raw_feedback": ...}; each stage adds one key to the dict so the
+# final output carries the summary, the sentiment and the tailored response together.
+def build_pipeline(llm):
+    summary_chain = (
+        parse_template
+        | llm
+        | StrOutputParser()
+        | RunnableLambda(lambda output: {"parsed_feedback": output})
+        | summary_template
+        | llm
+        | StrOutputParser()
+    )
+    sentiment_chain = sentiment_template | llm | StrOutputParser()
+    thankyou_chain = thankyou_template | llm | StrOutputParser()
+    details_chain = details_template | llm | StrOutputParser()
+    apology_chain = apology_template | llm | StrOutputParser()
+
+    def route(info):
+        if "positive" in info["sentiment"].lower():
+            return thankyou_chain
+        elif "negative" in info["sentiment"].lower():
+            return apology_chain
+        else:
+            return details_chain
+
+    return (
+        RunnablePassthrough.assign(summary=summary_chain)
+        | RunnablePassthrough.assign(
+            sentiment={"feedback": itemgetter("summary")} | sentiment_chain
+        )
+        | RunnablePassthrough.assign(
+            response={"feedback": itemgetter("summary"), "sentiment": itemgetter("sentiment")}
+            | RunnableLambda(route)
+        )
+    )
+
+
+# --- Step 4: Read feedback from JSONL/CSV files or streams ---
+# Records are yielded one at a time so arbitrarily large inputs never sit in memory at once.
+# A malformed line or row becomes an {"id": ..., "error": ...} record instead of ending the run.
+def read_feedback(stream, fmt):
+    if fmt == "csv":
+        for index, row in enumerate(csv.DictReader(stream)):
+            if row.get("feedback") is None:
+                yield {"id": row.get("id") or index, "error": "Missing 'feedback' column"}
+            else:
+                yield {"id": row.get("id") or index, "raw_feedback": row["feedback"]}
+    else:
+        for index, line in enumerate(stream):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield {"id": index, "error": f"Malformed input line: {e!r}"}
+                continue
+            if isinstance(record, str):
+                record = {"feedback": record}
+            if not isinstance(record, dict) or not isinstance(record.get("feedback"), str):
+                record_id = record.get("id", index) if isinstance(record, dict) else index
+                yield {"id": record_id, "error": "Input line has no 'feedback' string"}
+                continue
+            yield {"id": record.get("id", index), "raw_feedback": record["feedback"]}
+
+
+def detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+# --- Step 5: Run the pipeline with bounded concurrency and incremental output ---
+# Each item is timed individually; `abatch_as_completed` yields results as they finish so they
+# can be written out straight away instead of waiting for the slowest item in the window. An item
+# whose model calls fail is written as an error record and counted, and the batch goes on.
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_batch(pipeline, records, output, concurrency=8, window_size=1000):
+    async def timed_invoke(record):
+        if "error" in record:
+            return record, None
+        start = time.perf_counter()
+        try:
+            result = await pipeline.ainvoke(record)
+        except Exception as e:
+            result = {"id": record["id"], "error": repr(e)}
+        return result, time.perf_counter() - start
+
+    timed_pipeline = RunnableLambda(timed_invoke)
+    config = {"max_concurrency": concurrency}
+    latencies = []
+    items = failed = 0
+    started = time.perf_counter()
+
+    records = iter(records)
+    while window := list(islice(records, window_size)):
+        async for _, (result, latency) in timed_pipeline.abatch_as_completed(window, config=config):
+            items += 1
+            if latency is not None:
+                latencies.append(latency)
+            if "error" in result:
+                failed += 1
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "items": items,
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "items_per_s": items / elapsed if elapsed else 0.0,
+        "p50_latency_s": percentile(latencies, 50),
+        "p99_latency_s": percentile(latencies, 99),
+        "mean_latency_s": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+# Example feedbacks used when no input file is given
+sample_feedback = [
+    "The delivery was late, and the product was damaged when it arrived. However, the customer support team was very helpful in resolving the issue quickly.",
+    "The customer service was fantastic. The representative was friendly, knowledgeable, and resolved my issue quickly.",
+    "I was extremely disappointed with the customer service. The representative was unhelpful and rude.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch sentiment classification and routing")
+    parser.add_argument("input", nargs="?", help="JSONL/CSV file, or '-' for stdin (default: built-in samples)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from file extension)")
+    parser.add_argument("--output", default="-", help="JSONL results file, or '-' for stdout")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum in-flight items")
+    parser.add_argument("--window-size", type=int, default=1000, help="Items read from the input at a time")
+    parser.add_argument("--fake", action="store_true", help="Use the local fake chat model (no API key required)")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="Simulated seconds per fake LLM call")
+    args = parser.parse_args()
+
+    if args.fake:
+        llm = FakeFeedbackLLM(latency=args.fake_latency)
+    else:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(model="llama-3.1-8b-instant")
+    pipeline = build_pipeline(llm)
+
+    if args.input is None:
+        records = ({"id": i, "raw_feedback": text} for i, text in enumerate(sample_feedback))
+        source = None
+    elif args.input == "-":
+        source = sys.stdin
+        records = read_feedback(source, args.format or "jsonl")
+    else:
+        source = open(args.input, newline="", encoding="utf-8")
+        records = read_feedback(source, args.format or detect_format(args.input))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = asyncio.run(run_batch(pipeline, records, output, args.concurrency, args.window_size))
+    finally:
+        if source not in (None, sys.stdin):
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    # Print the throughput report to stderr so it never mixes with JSONL results on stdout
+    print(
+        f"Processed {stats['items']} items ({stats['failed']} failed) in {stats['elapsed_s']:.2f}s "
+        f"({stats['items_per_s']:.1f} items/s), "
+        f"p50 latency {stats['p50_latency_s'] * 1000:.0f} ms, "
+        f"p99 latency {stats['p99_latency_s'] * 1000:.0f} ms",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+# Example: Exact + semantic response cache in front of a Groq chat model
+# Scripts 02, 04 and 09 send the same prompts again and again (script 02 asks
+# "What is the tallest building in the world?" twice). This script wraps the shared LLM object in
+# a caching chat model so repeated prompts are answered locally.
+#
+# - Exact tier: keyed on (model + params, messages), stored in SQLite with a TTL and LRU eviction.
+# - Semantic tier (optional): if an embeddings model is given, a prompt whose embedding is close
+#   enough (cosine >= threshold) to a cached prompt for the same model/params reuses its answer.
+#   The embeddings are kept in memory as one NumPy matrix, so a lookup is a single matmul.
+# - Works for `invoke`, `stream` and their async versions (SQLite runs on a worker thread there);
+#   a cached stream replays the original chunks.
+# - Exposes hit/miss counters and the total model latency saved.
+#
+# LangChain's built-in `BaseCache` (set via `ChatGroq(cache=...)`) is only consulted by `invoke`,
+# which is why the cache is applied as a wrapper model here instead.
+#
+# Usage:
+#   python 16-langchain-response-cache.py          # uses ChatGroq (requires GROQ_API_KEY)
+#   python 16-langchain-response-cache.py --fake   # no API key required
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumpd
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: SQLite-backed response store with TTL and LRU eviction ---
+# Each entry stores the list of message chunks that made up the answer, so a stream can be
+# replayed chunk by chunk and an invoke can simply merge them back into one message.
+class _EmbeddingIndex:
+    """The stored prompt embeddings as one unit-normalized NumPy matrix, so a semantic lookup is a
+    single matrix-vector product instead of a Python loop over every row of the table."""
+
+    def __init__(self):
+        self.matrix = None
+        self.size = 0
+        self.keys = []
+        self.rows = {}  # key -> row
+        self.llm_ids = np.zeros(0, dtype=np.int32)
+        self.llm_strings = {}  # llm_string -> id
+        self.created = np.zeros(0)
+        self.live = np.zeros(0, dtype=bool)
+
+    def add(self, key, llm_string, embedding, created):
+        self.remove(key)
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        if self.matrix is None:
+            self.matrix = np.zeros((0, len(vector)), dtype=np.float32)
+        if self.size == len(self.matrix):
+            self._resize(max(16, 2 * self.size))
+        row = self.size
+        self.matrix[row] = vector
+        self.llm_ids[row] = self.llm_strings.setdefault(llm_string, len(self.llm_strings))
+        self.created[row] = created
+        self.live[row] = True
+        self.keys.append(key)
+        self.rows[key] = row
+        self.size += 1
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.live[row] = False
+            # Drop the dead rows once they make up most of the matrix
+            if self.size > 64 and len(self.rows) < self.size // 2:
+                self._compact()
+
+    def nearest(self, llm_string, embedding, threshold, min_created):
+        """(key, score) of the most similar live row for llm_string above threshold, or None."""
+        llm_id = self.llm_strings.get(llm_string)
+        if llm_id is None or not self.rows:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        n = self.size
+        scores = self.matrix[:n] @ query
+        mask = self.live[:n] & (self.llm_ids[:n] == llm_id) & (self.created[:n] >= min_created)
+        scores[~mask] = -np.inf
+        row = int(np.argmax(scores))
+        if not scores[row] >= threshold:
+            return None
+        return self.keys[row], float(scores[row])
+
+    def _resize(self, capacity):
+        matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        self.matrix = matrix
+        for name in ("llm_ids", "created", "live"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            setattr(self, name, grown)
+
+    def _compact(self):
+        keep = np.flatnonzero(self.live[:self.size])
+        self.matrix[:len(keep)] = self.matrix[keep]
+        for name in ("llm_ids", "created", "live"):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.keys = [self.keys[row] for row in keep]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.size = len(keep)
+
+
+class SQLiteResponseCache:
+    def __init__(self, path=":memory:", ttl_seconds=24 * 3600, max_entries=10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " llm_string TEXT NOT NULL,"
+            " embedding TEXT,"
+            " chunks TEXT NOT NULL,"
+            " latency REAL NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_llm ON responses (llm_string)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+        # Loaded from the table on the first semantic lookup, then kept in step with this
+        # connection's writes (entries written by other processes show up after reopening)
+        self._index = None
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key):
+        """Return (chunks, latency) for an exact key, or None on a miss/expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks, latency, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[2], now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                if self._index is not None:
+                    self._index.remove(key)
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def nearest(self, llm_string, embedding, threshold):
+        """Return (chunks, latency, score) of the most similar live entry above threshold."""
+        now = time.time()
+        min_created = now - self.ttl_seconds if self.ttl_seconds is not None else -np.inf
+        with self._lock:
+            if self._index is None:
+                self._index = _EmbeddingIndex()
+                rows = self._conn.execute(
+                    "SELECT key, llm_string, embedding, created FROM responses WHERE embedding IS NOT NULL"
+                )
+                for key, stored_llm_string, stored, created in rows:
+                    self._index.add(key, stored_llm_string, json.loads(stored), created)
+            best = self._index.nearest(llm_string, embedding, threshold, min_created)
+            if best is None:
+                return None
+            key, score = best
+            chunks, latency = self._conn.execute(
+                "SELECT chunks, latency FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(chunks), latency, score
+
+    def put(self, key, llm_string, chunks, latency, embedding=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    llm_string,
+                    json.dumps(embedding) if embedding is not None else None,
+                    json.dumps(chunks),
+                    latency,
+                    now,
+                    now,
+                ),
+            )
+            if self._index is not None:
+                if embedding is not None:
+                    self._index.add(key, llm_string, embedding, now)
+                else:
+                    self._index.remove(key)
+            # Evict the least recently used entries once the cache grows past max_entries
+            if self.max_entries is not None:
+                evicted = self._conn.execute(
+                    "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                    (self.max_entries,),
+                ).fetchall()
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+                if self._index is not None:
+                    for (evicted_key,) in evicted:
+                        self._index.remove(evicted_key)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._index = None
+
+    # SQLite calls block, so the async variants run them on a worker thread
+    async def alookup(self, key):
+        return await asyncio.to_thread(self.get, key)
+
+    async def alookup_nearest(self, llm_string, embedding, threshold):
+        return await asyncio.to_thread(self.nearest, llm_string, embedding, threshold)
+
+    async def aupdate(self, key, llm_string, chunks, latency, embedding=None):
+        await asyncio.to_thread(self.put, key, llm_string, chunks, latency, embedding)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+# --- Step 2: A caching chat model that wraps any LangChain chat model ---
+# The wrapper is itself a chat model, so it can be dropped into prompts and chains wherever the
+# original `llm` was used (e.g. `prompt | cached_llm | StrOutputParser()`).
+class CachedChatModel(BaseChatModel):
+    llm: BaseChatModel
+    store: Any
+    embeddings: Embeddings | None = None
+    similarity_threshold: float = 0.95
+    stats: dict = Field(
+        default_factory=lambda: {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "latency_saved_s": 0.0}
+    )
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.llm._llm_type}"
+
+    def _keys(self, messages, stop, kwargs):
+        # Model name and sampling params come from the wrapped model's own cache string
+        llm_string = self.llm._get_llm_string(stop=stop, **kwargs)
+        payload = json.dumps(
+            {"llm": llm_string, "messages": [dumpd(m) for m in messages]}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest(), llm_string
+
+    def _embed(self, messages):
+        if self.embeddings is None:
+            return None
+        text = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        return self.embeddings.embed_query(text)
+
+    async def _aembed(self, messages):
+        if self.embeddings is None:
+            return None
+        text = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        return await self.embeddings.aembed_query(text)
+
+    def _record(self, hit, kind):
+        if hit is None:
+            return None
+        self.stats[kind] += 1
+        self.stats["latency_saved_s"] += hit[1]
+        return hit[0]
+
+    def _lookup(self, messages, stop, kwargs):
+        key, llm_string = self._keys(messages, stop, kwargs)
+        chunks = self._record(self.store.get(key), "exact_hits")
+        if chunks is not None:
+            return key, llm_string, None, chunks
+        embedding = self._embed(messages)
+        if embedding is not None:
+            chunks = self._record(self.store.nearest(llm_string, embedding, self.similarity_threshold), "semantic_hits")
+            if chunks is not None:
+                return key, llm_string, embedding, chunks
+        self.stats["misses"] += 1
+        return key, llm_string, embedding, None
+
+    async def _alookup(self, messages, stop, kwargs):
+        key, llm_string = self._keys(messages, stop, kwargs)
+        chunks = self._record(await self.store.alookup(key), "exact_hits")
+        if chunks is not None:
+            return key, llm_string, None, chunks
+        embedding = await self._aembed(messages)
+        if embedding is not None:
+            near = await self.store.alookup_nearest(llm_string, embedding, self.similarity_threshold)
+            chunks = self._record(near, "semantic_hits")
+            if chunks is not None:
+                return key, llm_string, embedding, chunks
+        self.stats["misses"] += 1
+        return key, llm_string, embedding, None
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key, llm_string, embedding, chunks = self._lookup(messages, stop, kwargs)
+        if chunks is not None:
+            message = merge_chunks(chunks)
+        else:
+            start = time.perf_counter()
+            message = self.llm.invoke(messages, stop=stop, **kwargs)
+            latency = time.perf_counter() - start
+            self.store.put(key, llm_string, [message_to_dict(message)], latency, embedding)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        key, llm_string, embedding, chunks = self._lookup(messages, stop, kwargs)
+        if chunks is not None:
+            # Replay the cached chunks exactly as they were originally streamed
+            for serialized in chunks:
+                chunk = to_chunk(messages_from_dict([serialized])[0])
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+            return
+        recorded = []
+        start = time.perf_counter()
+        for chunk in self.llm.stream(messages, stop=stop, **kwargs):
+            recorded.append(message_to_dict(chunk))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        # Only complete streams are cached; an interrupted stream never reaches this point
+        self.store.put(key, llm_string, recorded, time.perf_counter() - start, embedding)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        key, llm_string, embedding, chunks = await self._alookup(messages, stop, kwargs)
+        if chunks is not None:
+            message = merge_chunks(chunks)
+        else:
+            start = time.perf_counter()
+            message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+            latency = time.perf_counter() - start
+            await self.store.aupdate(key, llm_string, [message_to_dict(message)], latency, embedding)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key, llm_string, embedding, chunks = await self._alookup(messages, stop, kwargs)
+        if chunks is not None:
+            for serialized in chunks:
+                chunk = to_chunk(messages_from_dict([serialized])[0])
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+            return
+        recorded = []
+        start = time.perf_counter()
+        async for chunk in self.llm.astream(messages, stop=stop, **kwargs):
+            recorded.append(message_to_dict(chunk))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        await self.store.aupdate(key, llm_string, recorded, time.perf_counter() - start, embedding)
+
+    def hit_rate(self):
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+def to_chunk(message):
+    """The message as a chunk, with every field (ids, usage and response metadata, tool calls) kept."""
+    if isinstance(message, AIMessageChunk):
+        return message
+    fields = message.model_dump(exclude={"type", "tool_calls", "invalid_tool_calls"})
+    tool_call_chunks = [
+        {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index, "type": "tool_call_chunk"}
+        for index, call in enumerate(message.tool_calls)
+    ]
+    return AIMessageChunk(**fields, tool_call_chunks=tool_call_chunks)
+
+
+def merge_chunks(chunks):
+    messages = messages_from_dict(chunks)
+    if len(messages) == 1 and not isinstance(messages[0], AIMessageChunk):
+        return messages[0]
+    merged = to_chunk(messages[0])
+    for message in messages[1:]:
+        merged += to_chunk(message)
+    return message_chunk_to_message(merged)
+
+
+# --- Step 3: Local fakes so the example runs without API keys ---
+# FakeSlowChatModel answers with a fixed sentence after a simulated delay and streams it word by
+# word. BagOfWordsEmbeddings is a tiny hashing embedder so near-duplicate prompts score high.
+class FakeSlowChatModel(BaseChatModel):
+    latency: float = 0.3
+    model_name: str = "fake-llama"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-slow"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def _answer(self, messages):
+        return f"The answer to '{messages[-1].content}' is the Burj Khalifa in Dubai."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in re.split(r"(\s)", self._answer(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    def __init__(self, size=256):
+        self.size = size
+
+    def embed_query(self, text):
+        vector = [0.0] * self.size
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+# --- Step 4: Demo ---
+def main():
+    parser = argparse.ArgumentParser(description="Response cache demo")
+    parser.add_argument("--fake", action="store_true", help="Use local fake model/embeddings (no API key required)")
+    parser.add_argument("--db", default=":memory:", help="SQLite file for the cache (default: in-memory)")
+    parser.add_argument("--ttl", type=float, default=24 * 3600, help="Entry time-to-live in seconds")
+    parser.add_argument("--max-entries", type=int, default=10_000, help="LRU capacity")
+    parser.add_argument("--threshold", type=float, default=0.9, help="Semantic similarity threshold")
+    args = parser.parse_args()
+
+    if args.fake:
+        llm = FakeSlowChatModel()
+        embeddings = BagOfWordsEmbeddings()
+    else:
+        from langchain_groq import ChatGroq
+        from langchain_openai import OpenAIEmbeddings
+        llm = ChatGroq(model="llama3-8b-8192")
+        # The semantic tier is optional; it needs OPENAI_API_KEY for the embeddings model
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+
+    cached_llm = CachedChatModel(
+        llm=llm,
+        store=SQLiteResponseCache(args.db, ttl_seconds=args.ttl, max_entries=args.max_entries),
+        embeddings=embeddings,
+        similarity_threshold=args.threshold,
+    )
+
+    question = "What is the tallest building in the world?"
+    for label in ("first (miss)", "second (exact hit)"):
+        start = time.perf_counter()
+        response = cached_llm.invoke(question)
+        print(f"Invoke {label} in {time.perf_counter() - start:.3f}s:", response.content)
+
+    # A streamed answer is cached chunk by chunk and replayed the same way on the next call
+    stream_question = "Which city has the tallest building in the world?"
+    for label in ("first (miss)", "second (replayed from cache)"):
+        start = time.perf_counter()
+        chunks = [chunk.content for chunk in cached_llm.stream(stream_question)]
+        print(f"\nStreamed {label} in {time.perf_counter() - start:.3f}s, {len(chunks)} chunks:")
+        print("".join(chunks))
+
+    # A reworded prompt is served by the semantic tier
+    start = time.perf_counter()
+    response = cached_llm.invoke("what is the tallest building in the world")
+    print(f"\nInvoke reworded prompt in {time.perf_counter() - start:.3f}s:", response.content)
+
+    print("\nCache stats:", cached_llm.stats)
+    print(f"Hit rate: {cached_llm.hit_rate():.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# Example: Fusing the multi-step sentiment chain into a single structured-output call
+# `advanced_chain` in script 09 calls the LLM three times in sequence per feedback item
+# (parse -> summarize -> sentiment). This script asks for all three results in one call using
+# `with_structured_output` (as in script 08), and falls back to the original multi-step path
+# whenever the structured answer fails validation. The fallback's free-text label is mapped onto
+# the same three labels ("Mixed" becomes "Neutral"); anything else raises OutputParserException.
+#
+# A small benchmark compares both modes on a fixed corpus with a deterministic fake model:
+# LLM calls, tokens and wall time per item.
+#
+# Usage:
+#   python 17-langchain-fused-sentiment-chain.py          # uses ChatGroq (requires GROQ_API_KEY)
+#   python 17-langchain-fused-sentiment-chain.py --fake   # no API key required
+
+import argparse
+import re
+import time
+from typing import Literal
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Pydantic model describing everything the three steps used to produce ---
+class FeedbackAnalysis(BaseModel):
+    # The cleaned-up key information from the raw feedback (output of the parse step)
+    parsed_feedback: str = Field(description="The key information from the customer feedback, cleaned up")
+    # A one-sentence summary (output of the summary step)
+    summary: str = Field(description="The feedback summarized in one concise sentence")
+    # The sentiment label (output of the sentiment step)
+    sentiment: Literal["Positive", "Neutral", "Negative"] = Field(
+        description="The sentiment of the feedback: 'Positive', 'Neutral', or 'Negative'"
+    )
+
+
+# --- Step 2: Prompt templates ---
+# The three templates below are the multi-step path from script 09 (used as the fallback).
+parse_template = PromptTemplate(
+    input_variables=["raw_feedback"],
+    template="Parse and clean the following customer feedback for key information:\n\n{raw_feedback}"
+)
+summary_template = PromptTemplate(
+    input_variables=["parsed_feedback"],
+    template="Summarize this customer feedback in one concise sentence:\n\n{parsed_feedback}"
+)
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+
+# The fused template asks for all three results at once
+fused_template = PromptTemplate(
+    input_variables=["raw_feedback"],
+    template=(
+        "Analyze the following customer feedback. Parse and clean it for key information, "
+        "summarize it in one concise sentence, and determine its sentiment as either "
+        "'Positive', 'Neutral', or 'Negative':\n\n{raw_feedback}"
+    ),
+)
+
+
+# --- Step 3: Build the multi-step chain, the fused chain, and the fused chain with fallback ---
+# Both paths take {"raw_feedback": ...} and return {"summary": ..., "sentiment": ...} so they are
+# interchangeable and the fallback is transparent to callers.
+SENTIMENT_WORDS = {"positive": "Positive", "neutral": "Neutral", "negative": "Negative", "mixed": "Neutral"}
+
+
+def normalize_sentiment(text):
+    """Map a free-text sentiment answer onto the FeedbackAnalysis labels ("Mixed" counts as Neutral)."""
+    labels = {SENTIMENT_WORDS[word] for word in re.findall(r"[a-z]+", text.lower()) if word in SENTIMENT_WORDS}
+    if len(labels) != 1:
+        raise OutputParserException(f"Expected 'Positive', 'Neutral' or 'Negative', got {text!r}", llm_output=text)
+    return labels.pop()
+
+
+def build_multi_step_chain(llm):
+    summary_chain = (
+        parse_template
+        | llm
+        | StrOutputParser()
+        | RunnableLambda(lambda output: {"parsed_feedback": output})
+        | summary_template
+        | llm
+        | StrOutputParser()
+    )
+    sentiment_chain = (
+        RunnableLambda(lambda x: {"feedback": x["summary"]})
+        | sentiment_template
+        | llm
+        | StrOutputParser()
+    )
+    return (
+        RunnablePassthrough.assign(summary=summary_chain)
+        | RunnablePassthrough.assign(sentiment=sentiment_chain)
+        | RunnableLambda(lambda x: {"summary": x["summary"], "sentiment": normalize_sentiment(x["sentiment"])})
+    )
+
+
+def build_fused_chain(llm):
+    structured_llm = llm.with_structured_output(FeedbackAnalysis)
+    return (
+        fused_template
+        | structured_llm
+        | RunnableLambda(lambda analysis: {"summary": analysis.summary, "sentiment": analysis.sentiment})
+    )
+
+
+def build_optimized_chain(llm):
+    # If the fused answer is missing, malformed, or fails validation (e.g. an unknown sentiment
+    # label), `with_fallbacks` retries the same input on the multi-step path.
+    return build_fused_chain(llm).with_fallbacks([build_multi_step_chain(llm)])
+
+
+# --- Step 4: Deterministic fake model for benchmarking ---
+# Plain prompts get a rule-based text answer; when tools are bound (as `with_structured_output`
+# does) it answers with a tool call. Feedback containing "mixed" yields an invalid sentiment label
+# so the fallback path is exercised. Latency and token usage are derived from the text lengths.
+class FakeAnalysisLLM(BaseChatModel):
+    base_latency: float = 0.02
+    per_token_latency: float = 0.0005
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-analysis"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    @staticmethod
+    def _sentiment(text):
+        lowered = text.lower()
+        if "mixed" in lowered:
+            return "Mixed"
+        if any(word in lowered for word in ("disappointed", "rude", "broken", "never")):
+            return "Negative"
+        if any(word in lowered for word in ("fantastic", "great", "friendly", "love")):
+            return "Positive"
+        return "Neutral"
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        prompt = messages[-1].content
+        body = prompt.split("\n\n", 1)[-1].strip()
+        first_sentence = re.split(r"(?<=[.!?])\s", body, maxsplit=1)[0]
+        if tools:
+            args = {"parsed_feedback": body, "summary": first_sentence, "sentiment": self._sentiment(body)}
+            output_text = " ".join(str(v) for v in args.values())
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": tools[0]["function"]["name"], "args": args, "id": "call_1"}],
+            )
+        else:
+            if prompt.startswith("Determine the sentiment"):
+                output_text = self._sentiment(body)
+            elif prompt.startswith("Summarize"):
+                output_text = first_sentence
+            else:
+                output_text = body
+            message = AIMessage(content=output_text)
+        input_tokens = len(prompt.split())
+        output_tokens = len(output_text.split())
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        time.sleep(self.base_latency + self.per_token_latency * output_tokens)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# --- Step 5: Benchmark helpers ---
+# A callback handler counts every chat model call and sums the reported token usage.
+class CallCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                self.tokens += usage.get("total_tokens", 0)
+
+
+corpus = [
+    "The delivery was late, and the product was damaged when it arrived. However, the customer support team was very helpful in resolving the issue quickly.",
+    "The customer service was fantastic. The representative was friendly, knowledgeable, and resolved my issue quickly.",
+    "I was extremely disappointed with the customer service. The representative was unhelpful and rude.",
+    "Great prices and a friendly checkout experience. I love the new app.",
+    "The package arrived on Tuesday. It contained the items I ordered.",
+    "My order arrived broken and nobody answered my emails. I will never order again.",
+    "A mixed experience overall: the product is good but shipping took three weeks.",
+    "The website works. Nothing special to report.",
+]
+
+
+def benchmark(name, chain, items):
+    counter = CallCounter()
+    results = []
+    start = time.perf_counter()
+    for item in items:
+        results.append(chain.invoke({"raw_feedback": item}, config={"callbacks": [counter]}))
+    elapsed = time.perf_counter() - start
+    n = len(items)
+    print(
+        f"{name:<12} calls/item={counter.calls / n:.2f}  tokens/item={counter.tokens / n:.1f}  "
+        f"wall time/item={elapsed / n * 1000:.1f} ms"
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused vs multi-step sentiment chain")
+    parser.add_argument("--fake", action="store_true", help="Use the deterministic fake model (no API key required)")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to run through the corpus")
+    args = parser.parse_args()
+
+    if args.fake:
+        llm = FakeAnalysisLLM()
+    else:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(model="llama-3.1-8b-instant")
+
+    items = corpus * args.repeat
+    print(f"Benchmarking {len(items)} feedback items\n")
+    multi_step_results = benchmark("multi-step", build_multi_step_chain(llm), items)
+    fused_results = benchmark("fused", build_optimized_chain(llm), items)
+
+    # Show that both modes agree on the sentiment labels for the corpus
+    agreement = sum(a["sentiment"] == b["sentiment"] for a, b in zip(multi_step_results, fused_results))
+    print(f"\nSentiment agreement between modes: {agreement}/{len(items)}")
+    print("\nFused results:")
+    for result in fused_results[:len(corpus)]:
+        print(f"- {result['sentiment']:<8} {result['summary']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# Example: Latency-optimized sentiment routing with parallel fan-out and speculative drafting
+# In script 09, `full_chain` waits for the sentiment result before `route()` picks one of
+# `thankyou_chain`, `apology_chain` or `details_chain`, and only then makes another LLM call.
+# This script compares three ways of producing the tailored response:
+#
+# - sequential:  sentiment first, then the matching draft (script 09; 2 calls, 2 round-trips)
+# - parallel:    `RunnableParallel` runs the sentiment and all three drafts at once and keeps
+#                the matching one (4 calls, 1 round-trip)
+# - speculative: the sentiment and the drafts for the `--speculate` branches start together;
+#                as soon as the sentiment is known the non-matching drafts are cancelled, and a
+#                branch that was not speculated is drafted afterwards. Speculating on fewer
+#                branches trades some latency for fewer wasted tokens.
+#
+# p50/p95 end-to-end latency and the number of LLM calls started/completed are reported per mode.
+#
+# Usage:
+#   python 18-langchain-speculative-routing.py --fake
+#   python 18-langchain-speculative-routing.py --fake --speculate positive,negative
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Prompt templates (same wording as script 09) ---
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+thankyou_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Given the feedback, draft a thank you message for the user and request them to leave a positive rating on our webpage:\n\n{feedback}"
+)
+details_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Given the feedback, draft a message for the user and request them provide more details about their concern:\n\n{feedback}"
+)
+apology_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Given the feedback, draft an apology message for the user and mention that their concern has been forwarded to the relevant department:\n\n{feedback}"
+)
+
+
+# Map a sentiment label to its branch name (same rules as `route()` in script 09)
+def branch_for(sentiment):
+    if "positive" in sentiment.lower():
+        return "positive"
+    elif "negative" in sentiment.lower():
+        return "negative"
+    else:
+        return "neutral"
+
+
+# --- Step 2: The three routing modes ---
+class ResponseRouter:
+    def __init__(self, llm, speculate=("positive", "neutral", "negative")):
+        self.sentiment_chain = sentiment_template | llm | StrOutputParser()
+        self.drafts = {
+            "positive": thankyou_template | llm | StrOutputParser(),
+            "neutral": details_template | llm | StrOutputParser(),
+            "negative": apology_template | llm | StrOutputParser(),
+        }
+        self.speculate = tuple(speculate)
+
+        # sequential: the `full_chain` from script 09
+        def route(info):
+            return self.drafts[branch_for(info["sentiment"])]
+
+        self.sequential_chain = (
+            RunnableParallel(
+                feedback=lambda x: x["feedback"],
+                sentiment=self.sentiment_chain,
+            )
+            | RunnableLambda(route)
+        )
+
+        # parallel: sentiment and all drafts in one fan-out, then keep the matching draft
+        self.parallel_chain = (
+            RunnableParallel(sentiment=self.sentiment_chain, **self.drafts)
+            | RunnableLambda(lambda results: results[branch_for(results["sentiment"])])
+        )
+
+    async def sequential(self, feedback, config=None):
+        return await self.sequential_chain.ainvoke({"feedback": feedback}, config=config)
+
+    async def parallel(self, feedback, config=None):
+        return await self.parallel_chain.ainvoke({"feedback": feedback}, config=config)
+
+    async def speculative(self, feedback, config=None):
+        inputs = {"feedback": feedback}
+        drafts = {
+            branch: asyncio.create_task(self.drafts[branch].ainvoke(inputs, config=config))
+            for branch in self.speculate
+        }
+        try:
+            sentiment = await self.sentiment_chain.ainvoke(inputs, config=config)
+            branch = branch_for(sentiment)
+            # Cancel the drafts that turned out not to be needed
+            for name, task in drafts.items():
+                if name != branch:
+                    task.cancel()
+            if branch in drafts:
+                return await drafts[branch]
+            return await self.drafts[branch].ainvoke(inputs, config=config)
+        finally:
+            for task in drafts.values():
+                task.cancel()
+            await asyncio.gather(*drafts.values(), return_exceptions=True)
+
+
+# --- Step 3: Fake model with realistic call latencies ---
+# Classification answers are short, drafts are long, so drafts take longer to generate.
+class FakeRoutingLLM(BaseChatModel):
+    classify_latency: float = 0.15
+    draft_latency: float = 0.40
+    jitter: float = 0.05
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-routing"
+
+    def _answer(self, messages):
+        """(text, simulated latency) for a prompt."""
+        prompt = messages[-1].content
+        body = prompt.split("\n\n", 1)[-1].lower()
+        if prompt.startswith("Determine the sentiment"):
+            delay = self.classify_latency
+            if any(word in body for word in ("disappointed", "rude", "broken")):
+                text = "Negative"
+            elif any(word in body for word in ("fantastic", "great", "love")):
+                text = "Positive"
+            else:
+                text = "Neutral"
+        else:
+            delay = self.draft_latency
+            text = f"Draft reply for: {body[:60]}"
+        return text, delay + random.uniform(0, self.jitter)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, delay = self._answer(messages)
+        time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, delay = self._answer(messages)
+        await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+# Counts LLM calls that were started and calls that ran to completion
+class CallCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.started += 1
+
+    def on_llm_end(self, response, **kwargs):
+        self.completed += 1
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+corpus = [
+    "The customer service was fantastic. The representative was friendly, knowledgeable, and resolved my issue quickly.",
+    "I was extremely disappointed with the customer service. The representative was unhelpful and rude.",
+    "The delivery was late, but the support team was helpful in resolving the issue.",
+    "Great prices and I love the new app.",
+    "My order arrived broken.",
+    "The package arrived on Tuesday.",
+]
+
+
+# --- Step 4: Measure p50/p95 latency per mode ---
+async def measure(router, mode, items):
+    counter = CallCounter()
+    config = {"callbacks": [counter]}
+    latencies = []
+    for feedback in items:
+        start = time.perf_counter()
+        await getattr(router, mode)(feedback, config=config)
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{mode:<12} p50={percentile(latencies, 50) * 1000:6.0f} ms  "
+        f"p95={percentile(latencies, 95) * 1000:6.0f} ms  "
+        f"mean={statistics.fmean(latencies) * 1000:6.0f} ms  "
+        f"calls/item started={counter.started / len(items):.2f} completed={counter.completed / len(items):.2f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Sequential vs parallel vs speculative routing")
+    parser.add_argument("--fake", action="store_true", help="Use the local fake model (no API key required)")
+    parser.add_argument(
+        "--speculate",
+        default="positive,neutral,negative",
+        help="Comma-separated branches to draft speculatively (fewer = cheaper, more = faster)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="How many times to run through the corpus")
+    args = parser.parse_args()
+
+    if args.fake:
+        llm = FakeRoutingLLM()
+    else:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(model="llama-3.1-8b-instant")
+
+    speculate = [branch.strip() for branch in args.speculate.split(",") if branch.strip()]
+    unknown = set(speculate) - {"positive", "neutral", "negative"}
+    if unknown:
+        parser.error(f"unknown branches for --speculate: {', '.join(sorted(unknown))}")
+    router = ResponseRouter(llm, speculate=speculate)
+
+    print(f"Routing {len(corpus) * args.repeat} feedback items (speculating on: {', '.join(speculate) or 'none'})\n")
+    for mode in ("sequential", "parallel", "speculative"):
+        await measure(router, mode, corpus * args.repeat)
+
+    print("\nExample speculative response:")
+    print(await router.speculative(corpus[0]))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,415 @@
+# Example: A scalable NumPy-backed vector store (exact + IVF approximate search)
+# Script 11 uses `InMemoryVectorStore`, which scores every stored document one by one in Python
+# on each `similarity_search`. This script implements a drop-in LangChain `VectorStore` that keeps
+# all vectors in one contiguous float32 matrix instead:
+#
+# - Exact search scores all vectors with a single matrix multiply and picks the top k with
+#   `np.argpartition` (no full sort). Several queries can be scored in one batched multiply.
+# - An optional IVF (inverted file) approximate index clusters the vectors with k-means and only
+#   scores the `nprobe` closest clusters; raising `nprobe` raises recall at the cost of speed.
+# - Metadata pre-filtering (e.g. `filter={"source": "tweet"}`) restricts scoring to matching rows.
+#
+# Usage:
+#   python 19-langchain-numpy-vector-store.py                     # script 11 demo (requires OPENAI_API_KEY)
+#   python 19-langchain-numpy-vector-store.py --fake              # demo with a local fake embedder
+#   python 19-langchain-numpy-vector-store.py --benchmark 10000,100000,1000000 --dim 128
+
+import argparse
+import hashlib
+import re
+import time
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., OpenAI API key for embeddings) from .env
+load_dotenv()
+
+
+# --- Step 1: The vector store ---
+# Vectors are L2-normalized on insert so that a dot product is the cosine similarity.
+# Rows live in a preallocated matrix that grows by doubling; deleting a row moves the last row
+# into its slot so the live rows always stay contiguous.
+class NumpyVectorStore(VectorStore):
+    def __init__(self, embedding, dim=None, initial_capacity=1024):
+        self.embedding = embedding
+        self._dim = dim
+        self._capacity = initial_capacity
+        self._vectors = None if dim is None else np.empty((initial_capacity, dim), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._row_of = {}
+        # metadata (key, value) -> set of rows, used for pre-filtering; only hashable values are indexed
+        self._metadata_index = {}
+        # (key, value) -> sorted row array, built on first use and dropped on every write
+        self._index_arrays = {}
+        # IVF state (only set once build_ivf() has been called)
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        return self._size
+
+    # --- Writes ---
+    def _ensure_capacity(self, extra, dim):
+        if self._vectors is None:
+            self._dim = dim
+            self._capacity = max(self._capacity, extra)
+            self._vectors = np.empty((self._capacity, dim), dtype=np.float32)
+        needed = self._size + extra
+        if needed > self._capacity:
+            # Grow at least geometrically; a capacity of 0 would never grow by doubling
+            self._capacity = max(needed, 2 * self._capacity)
+            grown = np.empty((self._capacity, self._dim), dtype=np.float32)
+            grown[: self._size] = self._vectors[: self._size]
+            self._vectors = grown
+            if self._assignments is not None:
+                assignments = np.full(self._capacity, -1, dtype=np.int32)
+                assignments[: self._size] = self._assignments[: self._size]
+                self._assignments = assignments
+
+    @staticmethod
+    def _indexable(metadata):
+        pairs = []
+        for pair in metadata.items():
+            try:
+                hash(pair)
+            except TypeError:
+                continue  # lists/dicts are matched by a scan in _index_rows instead
+            pairs.append(pair)
+        return pairs
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        if not len(texts):
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Expected one embedding per text")
+        if self._dim is not None and vectors.shape[1] != self._dim:
+            raise ValueError(f"Expected embeddings of dimension {self._dim}, got {vectors.shape[1]}")
+        metadatas = metadatas or [{} for _ in texts]
+        if len(metadatas) != len(texts):
+            raise ValueError("Expected one metadata dict per text")
+        ids = [str(i) for i in ids] if ids else [str(uuid4()) for _ in texts]
+        # Replace existing ids instead of storing duplicates
+        existing = [i for i in ids if i in self._row_of]
+        if existing:
+            self.delete(existing)
+
+        self._ensure_capacity(len(vectors), vectors.shape[1])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        start = self._size
+        self._vectors[start : start + len(vectors)] = vectors / norms
+        for offset, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            row = start + offset
+            self._ids.append(id_)
+            self._texts.append(text)
+            self._metadatas.append(metadata)
+            self._row_of[id_] = row
+            for pair in self._indexable(metadata):
+                self._metadata_index.setdefault(pair, set()).add(row)
+        self._size += len(vectors)
+        self._index_arrays.clear()
+
+        if self._centroids is not None:
+            new_rows = self._vectors[start : self._size]
+            self._assignments[start : self._size] = np.argmax(new_rows @ self._centroids.T, axis=1)
+            self._lists = None
+        return ids
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def add_documents(self, documents, **kwargs):
+        ids = kwargs.pop("ids", None) or [doc.id for doc in documents]
+        if any(id_ is None for id_ in ids):
+            ids = None
+        return self.add_texts(
+            [doc.page_content for doc in documents], [doc.metadata for doc in documents], ids=ids
+        )
+
+    def delete(self, ids=None, **kwargs):
+        for id_ in ids or []:
+            row = self._row_of.pop(str(id_), None)
+            if row is None:
+                continue
+            last = self._size - 1
+            for pair in self._indexable(self._metadatas[row]):
+                self._metadata_index[pair].discard(row)
+            if row != last:
+                # Move the last row into the freed slot to keep the matrix contiguous
+                self._vectors[row] = self._vectors[last]
+                if self._assignments is not None:
+                    self._assignments[row] = self._assignments[last]
+                moved_id = self._ids[last]
+                self._ids[row], self._texts[row], self._metadatas[row] = (
+                    moved_id, self._texts[last], self._metadatas[last]
+                )
+                self._row_of[moved_id] = row
+                for pair in self._indexable(self._metadatas[row]):
+                    rows = self._metadata_index[pair]
+                    rows.discard(last)
+                    rows.add(row)
+            self._ids.pop()
+            self._texts.pop()
+            self._metadatas.pop()
+            self._size -= 1
+            self._lists = None
+            self._index_arrays.clear()
+        return True
+
+    def get_by_ids(self, ids, /):
+        return [self._document(self._row_of[str(i)]) for i in ids if str(i) in self._row_of]
+
+    def _document(self, row):
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    # --- IVF approximate index ---
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=50_000, seed=0):
+        """Cluster the stored vectors with spherical k-means and assign every row to a list."""
+        if self._size == 0:
+            raise ValueError("Cannot build an IVF index on an empty store")
+        n_lists = n_lists or max(1, int(np.sqrt(self._size)))
+        rng = np.random.default_rng(seed)
+        data = self._vectors[: self._size]
+        sample = data[rng.choice(self._size, size=min(sample_size, self._size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        self._centroids = centroids
+        self._assignments = np.full(self._capacity, -1, dtype=np.int32)
+        # Assign in blocks to bound the temporary (rows x lists) score matrix
+        for block in range(0, self._size, 65_536):
+            rows = data[block : block + 65_536]
+            self._assignments[block : block + len(rows)] = np.argmax(rows @ centroids.T, axis=1)
+        self._lists = None
+
+    def _inverted_lists(self):
+        # Rows grouped by cluster, rebuilt lazily after writes
+        if self._lists is None:
+            assignments = self._assignments[: self._size]
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[c] : bounds[c + 1]] for c in range(len(self._centroids))]
+        return self._lists
+
+    # --- Search ---
+    def _index_rows(self, key, value):
+        pair = (key, value)
+        try:
+            hash(pair)
+        except TypeError:
+            return np.fromiter(
+                (row for row, metadata in enumerate(self._metadatas) if key in metadata and metadata[key] == value),
+                dtype=np.int64,
+            )
+        rows = self._index_arrays.get(pair)
+        if rows is None:
+            rows = self._index_arrays[pair] = np.fromiter(sorted(self._metadata_index.get(pair, ())), dtype=np.int64)
+        return rows
+
+    def _filter_rows(self, filter):
+        if not filter:
+            return None
+        if callable(filter):
+            return np.fromiter(
+                (row for row in range(self._size) if filter(self._document(row))), dtype=np.int64
+            )
+        rows = None
+        for key, value in filter.items():
+            matches = self._index_rows(key, value)
+            rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+        return rows
+
+    def _candidates(self, query, nprobe, allowed):
+        if nprobe is None or self._centroids is None:
+            return allowed
+        lists = self._inverted_lists()
+        probe = np.argpartition(-(self._centroids @ query), min(nprobe, len(lists)) - 1)[:nprobe]
+        rows = np.concatenate([lists[c] for c in probe])
+        if allowed is not None:
+            rows = np.intersect1d(rows, allowed, assume_unique=True)
+        return rows
+
+    @staticmethod
+    def _top_k(scores, k):
+        if len(scores) <= k:
+            return np.argsort(-scores)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, nprobe=None, **kwargs):
+        if self._size == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        rows = self._candidates(query, nprobe, self._filter_rows(filter))
+        if rows is None:
+            scores = self._vectors[: self._size] @ query
+            top = self._top_k(scores, k)
+            return [(self._document(int(r)), float(scores[r])) for r in top]
+        if len(rows) == 0:
+            return []
+        scores = self._vectors[rows] @ query
+        top = self._top_k(scores, k)
+        return [(self._document(int(rows[i])), float(scores[i])) for i in top]
+
+    def batch_similarity_search_by_vector(self, embeddings, k=4):
+        """Exact top-k for many queries at once with one (queries x rows) matrix multiply."""
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self._vectors[: self._size].T
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return [[self._document(int(r)) for r in row] for row in top]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]; map them to [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+# --- Step 2: A tiny local embedder so the demo runs without an API key ---
+class BagOfWordsEmbeddings(Embeddings):
+    def __init__(self, size=256):
+        self.size = size
+
+    def embed_query(self, text):
+        vector = [0.0] * self.size
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+# --- Step 3: Demo mirroring script 11 ---
+def demo(embeddings):
+    documents = [
+        Document(page_content="I had chocolate chip pancakes and scrambled eggs for breakfast this morning.", metadata={"source": "tweet"}, id=1),
+        Document(page_content="The weather forecast for tomorrow is cloudy and overcast, with a high of 62 degrees.", metadata={"source": "news"}, id=2),
+        Document(page_content="Building an exciting new project with LangChain - come check it out!", metadata={"source": "tweet"}, id=3),
+    ]
+    vector_store = NumpyVectorStore(embeddings)
+    vector_store.add_documents(documents=documents, ids=[str(uuid4()) for _ in documents])
+
+    query = "What's the weather going to be like tomorrow?"
+    print("Query:", query)
+    print("Most similar document found:")
+    for doc in vector_store.similarity_search(query, k=1):
+        print("- Content:", doc.page_content)
+        print("  Metadata:", doc.metadata)
+
+    print("\nSame query restricted to tweets:")
+    for doc in vector_store.similarity_search(query, k=1, filter={"source": "tweet"}):
+        print("- Content:", doc.page_content)
+        print("  Metadata:", doc.metadata)
+
+
+# --- Step 4: Benchmark at 10k / 100k / 1M vectors ---
+# Synthetic clustered vectors (like real embeddings, which group by topic) are added directly,
+# without embedding calls, so only search cost is measured. Recall@k of the IVF index is measured
+# against the exact search results.
+def benchmark(sizes, dim, k=10, n_queries=50, seed=0):
+    rng = np.random.default_rng(seed)
+    for size in sizes:
+        topics = rng.standard_normal((max(1, size // 200), dim), dtype=np.float32)
+        vectors = topics[rng.integers(0, len(topics), size)]
+        vectors += 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+        metadatas = [{"source": "tweet" if i % 10 == 0 else "news"} for i in range(size)]
+        store = NumpyVectorStore(embedding=None, dim=dim, initial_capacity=size)
+        store.add_embeddings([""] * size, vectors, metadatas, ids=[str(i) for i in range(size)])
+        queries = vectors[rng.choice(size, n_queries, replace=False)] + 0.3 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+
+        def timed(fn):
+            start = time.perf_counter()
+            results = [fn(q) for q in queries]
+            return results, (time.perf_counter() - start) / n_queries * 1000
+
+        exact, exact_ms = timed(lambda q: store.similarity_search_by_vector(q, k=k))
+        _, filtered_ms = timed(lambda q: store.similarity_search_by_vector(q, k=k, filter={"source": "tweet"}))
+        start = time.perf_counter()
+        store.batch_similarity_search_by_vector(queries, k=k)
+        batch_ms = (time.perf_counter() - start) / n_queries * 1000
+        print(f"\n{size:,} vectors x {dim} dims ({store._vectors.nbytes / 2**20:.0f} MiB)")
+        print(f"  exact            {exact_ms:8.2f} ms/query")
+        print(f"  exact, batched   {batch_ms:8.2f} ms/query")
+        print(f"  exact, filtered  {filtered_ms:8.2f} ms/query (10% of rows match)")
+
+        if size <= 10_000:
+            baseline = InMemoryVectorStore(embedding=None)
+            baseline.store = {
+                str(i): {"id": str(i), "vector": vectors[i].tolist(), "text": "", "metadata": {}}
+                for i in range(size)
+            }
+            _, baseline_ms = timed(lambda q: baseline.similarity_search_by_vector(q.tolist(), k=k))
+            print(f"  InMemoryVectorStore {baseline_ms:5.2f} ms/query")
+
+        start = time.perf_counter()
+        store.build_ivf()
+        build_s = time.perf_counter() - start
+        print(f"  IVF build ({len(store._centroids)} lists) {build_s:.1f}s")
+        for nprobe in (1, 8, 32):
+            approx, approx_ms = timed(lambda q: store.similarity_search_by_vector(q, k=k, nprobe=nprobe))
+            recall = np.mean([
+                len({d.id for d in a} & {d.id for d in e}) / k for a, e in zip(approx, exact)
+            ])
+            print(f"  IVF nprobe={nprobe:<3}   {approx_ms:8.2f} ms/query, recall@{k}={recall:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy vector store demo and benchmark")
+    parser.add_argument("--fake", action="store_true", help="Use a local fake embedder (no API key required)")
+    parser.add_argument("--benchmark", help="Comma-separated store sizes to benchmark, e.g. 10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=128, help="Vector dimension used by the benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark([int(size) for size in args.benchmark.split(",")], args.dim)
+        return
+
+    if args.fake:
+        embeddings = BagOfWordsEmbeddings()
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+    demo(embeddings)
+
+
+if __name__ == "__main__":
+    main()
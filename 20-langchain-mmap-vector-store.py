@@ -0,0 +1,459 @@
+# Example: A persistent, memory-mapped vector store with fast cold start
+# The vector store in script 11 only lives in process memory, so every start re-embeds every
+# document. This script stores the vectors on disk in a format a new process can reopen in
+# milliseconds, without re-embedding and without reading the whole corpus into RAM.
+#
+# On-disk layout of a store directory:
+#   manifest.json  dimension, dtype, generation and the number of committed rows (rewritten atomically)
+#   vectors.bin    row-major float32/float16 matrix, opened with np.memmap
+#   ids.bin        fixed-width document ids, one per row (memmap)
+#   docs.jsonl     page content and metadata, one JSON line per row
+#   docs.idx       int64 byte offsets into docs.jsonl, one per row (memmap)
+#   deleted.bin    one tombstone byte per row (memmap)
+#   wal.log        append-only log of deleted rows/ids since the last compaction
+#
+# Adds append to the data files and then commit by rewriting the manifest; rows past the
+# committed count (e.g. from a crash mid-append) are ignored. Deletes append to the write log and
+# set a tombstone. Queries score the memory-mapped matrix block by block (zero-copy for float32)
+# and only load the text/metadata of the rows they return. `compact()` rewrites the live rows and
+# reclaims deleted ids. It writes the next generation of data files next to the current one
+# (e.g. vectors.1.bin) and switches over by replacing the manifest last, so a crash at any point
+# leaves the store on either the old or the new generation, never a mix of both.
+#
+# Usage:
+#   python 20-langchain-mmap-vector-store.py --fake                      # demo, no API key required
+#   python 20-langchain-mmap-vector-store.py --benchmark 1000000 --dim 256
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., OpenAI API key for embeddings) from .env
+load_dotenv()
+
+ID_WIDTH = 64
+BLOCK_ROWS = 65_536
+DATA_FILES = ("vectors.bin", "ids.bin", "docs.jsonl", "docs.idx", "deleted.bin", "wal.log")
+
+
+# --- Step 1: The memory-mapped vector store ---
+class MmapVectorStore(VectorStore):
+    def __init__(self, path, embedding=None, dim=None, dtype="float32"):
+        self.path = path
+        self.embedding = embedding
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.dim, self.dtype, self._rows = manifest["dim"], np.dtype(manifest["dtype"]), manifest["rows"]
+            self._generation = manifest.get("generation", 0)
+        else:
+            self.dim, self.dtype, self._rows = dim, np.dtype(dtype), 0
+            self._generation = 0
+        self._row_of = None
+        self._map_files()
+        self._replay_log()
+
+    @classmethod
+    def open(cls, path, embedding=None, dim=None, dtype="float32"):
+        return cls(path, embedding=embedding, dim=dim, dtype=dtype)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def _file(self, name, generation=None):
+        # Generation 0 keeps the plain names; compaction bumps the generation (vectors.1.bin, ...)
+        generation = self._generation if generation is None else generation
+        if generation:
+            stem, ext = os.path.splitext(name)
+            name = f"{stem}.{generation}{ext}"
+        return os.path.join(self.path, name)
+
+    def _map(self, name, dtype, shape, mode="r"):
+        if self._rows == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _map_files(self):
+        # Only the committed rows are mapped; nothing is read until a query touches the pages
+        n = self._rows
+        self._vectors = self._map("vectors.bin", self.dtype, (n, self.dim or 0))
+        self._ids = self._map("ids.bin", f"S{ID_WIDTH}", (n,))
+        self._offsets = self._map("docs.idx", np.int64, (n,))
+        self._deleted = self._map("deleted.bin", np.uint8, (n,), mode="r+")
+
+    def _replay_log(self):
+        # Re-apply logged deletes in case the tombstone pages were not flushed before a crash.
+        # Each line is "<row> <id>", so replaying never needs the id -> row map.
+        log_path = self._file("wal.log")
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                row = int(line.split(" ", 1)[0])
+                if row < self._rows:
+                    self._deleted[row] = 1
+
+    def _commit(self):
+        manifest = {"dim": self.dim, "dtype": self.dtype.name, "rows": self._rows, "generation": self._generation}
+        tmp_path = os.path.join(self.path, "manifest.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, "manifest.json"))
+
+    def __len__(self):
+        return int(self._rows - np.count_nonzero(self._deleted))
+
+    # --- Writes ---
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        vectors = np.asarray(embeddings, dtype=self.dtype)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape != (len(texts), self.dim):
+            raise ValueError(f"Expected {len(texts)} embeddings of dimension {self.dim}")
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(i) for i in ids] if ids else [str(uuid4()) for _ in texts]
+        if any(len(i.encode()) > ID_WIDTH for i in ids):
+            raise ValueError(f"Document ids must be at most {ID_WIDTH} bytes")
+        self.delete([i for i in ids if i in self._id_index()])
+
+        # Normalize once on write so that queries are a plain dot product
+        norms = np.linalg.norm(vectors.astype(np.float32), axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = (vectors / norms).astype(self.dtype)
+
+        # Truncate any uncommitted tail left behind by an interrupted append
+        self._truncate_to_rows()
+        with open(self._file("docs.jsonl"), "ab") as docs:
+            offset = docs.tell()
+            offsets = []
+            for text, metadata in zip(texts, metadatas):
+                line = json.dumps({"text": text, "metadata": metadata}).encode() + b"\n"
+                offsets.append(offset)
+                docs.write(line)
+                offset += len(line)
+        self._append("vectors.bin", vectors.tobytes())
+        self._append("ids.bin", np.array([i.encode() for i in ids], dtype=f"S{ID_WIDTH}").tobytes())
+        self._append("docs.idx", np.array(offsets, dtype=np.int64).tobytes())
+        self._append("deleted.bin", bytes(len(ids)))
+
+        start = self._rows
+        self._rows += len(ids)
+        self._commit()
+        self._map_files()
+        if self._row_of is not None:
+            self._row_of.update({id_: start + i for i, id_ in enumerate(ids)})
+        return ids
+
+    def _append(self, name, data, generation=None):
+        with open(self._file(name, generation), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_to_rows(self):
+        row_bytes = {
+            "vectors.bin": self.dtype.itemsize * (self.dim or 0),
+            "ids.bin": ID_WIDTH,
+            "docs.idx": 8,
+            "deleted.bin": 1,
+        }
+        for name, size in row_bytes.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > self._rows * size:
+                os.truncate(path, self._rows * size)
+        docs_path = self._file("docs.jsonl")
+        if os.path.exists(docs_path):
+            end = 0
+            if self._rows:
+                end = int(self._offsets[-1])
+                with open(docs_path, "rb") as f:
+                    f.seek(end)
+                    end += len(f.readline())
+            if os.path.getsize(docs_path) > end:
+                os.truncate(docs_path, end)
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def add_documents(self, documents, **kwargs):
+        ids = kwargs.pop("ids", None) or [doc.id for doc in documents]
+        if any(id_ is None for id_ in ids):
+            ids = None
+        return self.add_texts(
+            [doc.page_content for doc in documents], [doc.metadata for doc in documents], ids=ids
+        )
+
+    def _id_index(self):
+        # The id -> row map is only built when a delete or lookup by id needs it
+        if self._row_of is None:
+            self._row_of = {
+                raw.decode(): row
+                for row, raw in enumerate(self._ids.tolist())
+                if not self._deleted[row]
+            }
+        return self._row_of
+
+    def _rows_for(self, ids):
+        index = self._id_index()
+        return [index[i] for i in ids if i in index]
+
+    def _delete_rows(self, rows):
+        if not rows:
+            return
+        with open(self._file("wal.log"), "a", encoding="utf-8") as f:
+            f.write("".join(f"{row} {self._ids[row].decode()}\n" for row in rows))
+            f.flush()
+            os.fsync(f.fileno())
+        for row in rows:
+            self._deleted[row] = 1
+            if self._row_of is not None:
+                self._row_of.pop(self._ids[row].decode(), None)
+        if isinstance(self._deleted, np.memmap):
+            self._deleted.flush()
+
+    def delete(self, ids=None, **kwargs):
+        self._delete_rows(self._rows_for([str(i) for i in ids or []]))
+        return True
+
+    def compact(self):
+        """Rewrite the live rows into the next generation of files, reclaiming deleted rows."""
+        live = np.flatnonzero(self._deleted[: self._rows] == 0)
+        target = self._generation + 1
+        # Drop leftovers of an interrupted compaction (target) or of a finished one (previous)
+        self._remove_generation(target)
+        if self._generation:
+            self._remove_generation(self._generation - 1)
+
+        # Create every file up front so an empty compacted store is still a complete generation
+        for name in DATA_FILES[:-1]:
+            self._append(name, b"", target)
+        with open(self._file("docs.jsonl"), "ab+") as source, open(self._file("docs.jsonl", target), "wb") as docs:
+            offset = 0
+            for block in range(0, len(live), BLOCK_ROWS):
+                rows = live[block : block + BLOCK_ROWS]
+                offsets = []
+                for row in rows:
+                    source.seek(int(self._offsets[row]))
+                    line = source.readline()
+                    offsets.append(offset)
+                    docs.write(line)
+                    offset += len(line)
+                self._append("vectors.bin", np.ascontiguousarray(self._vectors[rows]).tobytes(), target)
+                self._append("ids.bin", np.ascontiguousarray(self._ids[rows]).tobytes(), target)
+                self._append("docs.idx", np.array(offsets, dtype=np.int64).tobytes(), target)
+            docs.flush()
+            os.fsync(docs.fileno())
+        self._append("deleted.bin", bytes(len(live)), target)
+
+        # Replacing the manifest is the commit point; the old generation is garbage after it
+        reclaimed = self._rows - len(live)
+        previous = self._generation
+        self._generation, self._rows = target, len(live)
+        self._commit()
+        self._vectors = self._ids = self._offsets = self._deleted = None
+        self._remove_generation(previous)
+        self._row_of = None
+        self._map_files()
+        return reclaimed
+
+    def _remove_generation(self, generation):
+        for name in DATA_FILES:
+            path = self._file(name, generation)
+            if os.path.exists(path):
+                os.remove(path)
+
+    # --- Reads ---
+    def _load_doc(self, row):
+        with open(self._file("docs.jsonl"), "rb") as f:
+            f.seek(int(self._offsets[row]))
+            return json.loads(f.readline())
+
+    def _document(self, row):
+        doc = self._load_doc(row)
+        return Document(id=self._ids[row].decode(), page_content=doc["text"], metadata=doc["metadata"])
+
+    def get_by_ids(self, ids, /):
+        return [self._document(row) for row in self._rows_for([str(i) for i in ids])]
+
+    def _scores(self, query):
+        # Score block by block so float16 stores never materialize a full float32 copy
+        scores = np.empty(self._rows, dtype=np.float32)
+        for start in range(0, self._rows, BLOCK_ROWS):
+            block = self._vectors[start : start + BLOCK_ROWS]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores[start : start + len(block)] = block @ query
+        scores[self._deleted.view(bool)] = -np.inf
+        return scores
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, **kwargs):
+        if self._rows == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self._scores(query)
+        live = self._rows - int(np.count_nonzero(self._deleted))
+        # Over-fetch when filtering, since metadata is only loaded for candidate rows
+        fetch = k if filter is None else k * 4
+        while True:
+            fetch = min(fetch, self._rows)
+            top = np.argpartition(-scores, fetch - 1)[:fetch] if fetch < self._rows else np.arange(self._rows)
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for row in top:
+                if np.isneginf(scores[row]):
+                    break
+                doc = self._document(int(row))
+                if filter is None or all(doc.metadata.get(key) == value for key, value in filter.items()):
+                    results.append((doc, float(scores[row])))
+                    if len(results) == k:
+                        return results
+            if fetch >= live or fetch == self._rows:
+                return results
+            fetch *= 4
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, path=None, **kwargs):
+        store = cls(path or tempfile.mkdtemp(), embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+# --- Step 2: A tiny local embedder so the demo runs without an API key ---
+class BagOfWordsEmbeddings(Embeddings):
+    def __init__(self, size=256):
+        self.size = size
+
+    def embed_query(self, text):
+        vector = [0.0] * self.size
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+# --- Step 3: Demo mirroring script 11, reopening the store as a new process would ---
+def demo(embeddings, path):
+    documents = [
+        Document(page_content="I had chocolate chip pancakes and scrambled eggs for breakfast this morning.", metadata={"source": "tweet"}, id="1"),
+        Document(page_content="The weather forecast for tomorrow is cloudy and overcast, with a high of 62 degrees.", metadata={"source": "news"}, id="2"),
+        Document(page_content="Building an exciting new project with LangChain - come check it out!", metadata={"source": "tweet"}, id="3"),
+    ]
+    vector_store = MmapVectorStore.open(path, embeddings)
+    vector_store.add_documents(documents=documents)
+    vector_store.delete(["1"])
+    del vector_store
+
+    # Reopen: no documents are re-embedded, only the query is
+    start = time.perf_counter()
+    vector_store = MmapVectorStore.open(path, embeddings)
+    print(f"Reopened store with {len(vector_store)} documents in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    query = "What's the weather going to be like tomorrow?"
+    print("Query:", query)
+    print("Most similar document found:")
+    for doc in vector_store.similarity_search(query, k=1):
+        print("- Content:", doc.page_content)
+        print("  Metadata:", doc.metadata)
+    print("Rows reclaimed by compaction:", vector_store.compact())
+
+
+# --- Step 4: Cold-start benchmark ---
+# Builds a store of random vectors, then times opening it and running one query in a fresh
+# Python process (the store is not re-embedded or loaded into RAM on open).
+def benchmark(size, dim, dtype, path):
+    rng = np.random.default_rng(0)
+    store = MmapVectorStore.open(path, dim=dim, dtype=dtype)
+    start = time.perf_counter()
+    for block in range(0, size, 100_000):
+        n = min(100_000, size - block)
+        store.add_embeddings(
+            [f"document {block + i}" for i in range(n)],
+            rng.standard_normal((n, dim), dtype=np.float32),
+            [{"source": "tweet" if (block + i) % 2 else "news"} for i in range(n)],
+            ids=[str(block + i) for i in range(n)],
+        )
+    print(f"Wrote {size:,} x {dim} {dtype} vectors in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(os.path.join(path, 'vectors.bin')) / 2**20:.0f} MiB)")
+    del store
+    subprocess.run([sys.executable, __file__, "--open-only", path, "--dim", str(dim)], check=True)
+
+
+def open_and_query(path, dim):
+    start = time.perf_counter()
+    store = MmapVectorStore.open(path)
+    opened = time.perf_counter()
+    store.similarity_search_by_vector(np.ones(dim, dtype=np.float32), k=10)
+    queried = time.perf_counter()
+    store.similarity_search_by_vector(np.ones(dim, dtype=np.float32), k=10)
+    warm = time.perf_counter()
+    print(f"Cold open {(opened - start) * 1000:.2f} ms, first query {(queried - opened) * 1000:.1f} ms, "
+          f"warm query {(warm - queried) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped vector store demo and benchmark")
+    parser.add_argument("--fake", action="store_true", help="Use a local fake embedder (no API key required)")
+    parser.add_argument("--path", help="Store directory (default: a temporary directory)")
+    parser.add_argument("--benchmark", type=int, help="Number of vectors for the cold-start benchmark")
+    parser.add_argument("--dim", type=int, default=256, help="Vector dimension used by the benchmark")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--open-only", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.open_only:
+        open_and_query(args.open_only, args.dim)
+        return
+
+    path = args.path or tempfile.mkdtemp(prefix="mmap-store-")
+    try:
+        if args.benchmark:
+            benchmark(args.benchmark, args.dim, args.dtype, path)
+            return
+        if args.fake:
+            embeddings = BagOfWordsEmbeddings()
+        else:
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+        demo(embeddings, path)
+    finally:
+        if args.path is None:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# Example: Embedding cache and batched, concurrent document ingestion
+# In script 11, `vector_store.add_documents` sends every document to
+# `OpenAIEmbeddings(model="text-embedding-3-large")`, and `similarity_search` re-embeds the query
+# on every call. This script adds:
+#
+# - CachedEmbeddings: an on-disk (SQLite) embedding cache keyed by sha256(model name + text), so
+#   the same text is never embedded twice by the same model, across runs and for queries too.
+# - ingest(): streams documents from a JSONL file without loading it all into memory,
+#   deduplicates them by content hash, packs them into batches bounded by item count and
+#   estimated tokens, and embeds the batches concurrently under a requests-per-minute limit.
+#
+# Usage:
+#   python 21-langchain-embedding-cache-ingestion.py --fake               # no API key required
+#   python 21-langchain-embedding-cache-ingestion.py docs.jsonl --cache embeddings.sqlite
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., OpenAI API key for embeddings) from .env
+load_dotenv()
+
+
+# --- Step 1: Content-hash keyed embedding cache on disk ---
+# Vectors are stored as packed float32 blobs. Lookups and inserts are batched into single SQL
+# statements so a 1,000-text batch costs one query, not 1,000.
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying, model_name, path=":memory:", rate_limiter=None):
+        self.underlying = underlying
+        self.model_name = model_name
+        # Only cache misses reach the provider, so only they wait for the rate limiter
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+
+    def _get_many(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+        return {key: list(struct.unpack(f"{len(blob) // 4}f", blob)) for key, blob in found.items()}
+
+    def _put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [(key, struct.pack(f"{len(vector)}f", *vector)) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def _split(self, texts):
+        keys = [self.key(text) for text in texts]
+        found = self._get_many(list(set(keys)))
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+        with self._lock:
+            self.stats["hits"] += len(texts) - len(missing)
+            self.stats["misses"] += len(missing)
+        return keys, found, missing
+
+    def embed_documents(self, texts):
+        keys, found, missing = self._split(texts)
+        if missing:
+            vectors = self.underlying.embed_documents(missing)
+            new = [(self.key(text), vector) for text, vector in zip(missing, vectors)]
+            self._put_many(new)
+            found.update(new)
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts):
+        # SQLite calls block, so they run on a worker thread instead of stalling the event loop
+        keys, found, missing = await asyncio.to_thread(self._split, texts)
+        if missing:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.wait()
+            vectors = await self.underlying.aembed_documents(missing)
+            new = [(self.key(text), vector) for text, vector in zip(missing, vectors)]
+            await asyncio.to_thread(self._put_many, new)
+            found.update(new)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+# --- Step 2: Streaming, deduplicating, batched ingestion ---
+def read_documents(path):
+    # One JSON object per line: {"id": ..., "text": ..., "metadata": {...}}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield Document(id=record.get("id"), page_content=record["text"], metadata=record.get("metadata", {}))
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English text
+    return len(text) // 4 + 1
+
+
+def make_batches(documents, max_items=256, max_tokens=100_000, seen=None):
+    """Group a document stream into batches, skipping exact duplicate texts."""
+    seen = set() if seen is None else seen
+    batch, batch_tokens = [], 0
+    for doc in documents:
+        digest = hashlib.sha256(doc.page_content.encode()).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        tokens = estimate_tokens(doc.page_content)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(doc)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+class RateLimiter:
+    """Spaces out request starts so that at most `requests_per_minute` begin per minute."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def ingest(vector_store, documents, max_items=256, max_tokens=100_000, max_concurrency=4):
+    """Add a document stream to a store whose embedding model is a CachedEmbeddings."""
+    stats = {"documents": 0, "batches": 0}
+
+    async def add_batch(batch):
+        ids = [doc.id for doc in batch] if all(doc.id for doc in batch) else None
+        await vector_store.aadd_documents(batch, ids=ids)
+        stats["documents"] += len(batch)
+        stats["batches"] += 1
+
+    # Keep at most `max_concurrency` batches in flight so a huge file is never fully in memory
+    pending = set()
+    for batch in make_batches(documents, max_items, max_tokens):
+        if len(pending) >= max_concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        pending.add(asyncio.create_task(add_batch(batch)))
+    await asyncio.gather(*pending)
+    return stats
+
+
+# --- Step 3: Deterministic fake embedding model that counts calls ---
+class CountingFakeEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+    texts_embedded: int = 0
+    latency: float = 0.05
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        await asyncio.sleep(self.latency)
+        return [self._get_embedding(seed=self._get_seed(text)) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def write_sample_corpus(path, size=5000, duplicate_rate=0.3, seed=0):
+    rng = random.Random(seed)
+    topics = ["weather", "breakfast", "LangChain", "football", "stock market", "travel"]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(size):
+            n = rng.randrange(int(size * (1 - duplicate_rate)))
+            text = f"Document {n} about {topics[n % len(topics)]}: " + " ".join(rng.choice(topics) for _ in range(20))
+            if rng.random() < duplicate_rate:
+                text = f"Document {n} about {topics[n % len(topics)]}"
+            f.write(json.dumps({"id": str(i), "text": text, "metadata": {"topic": topics[n % len(topics)]}}) + "\n")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Embedding cache and batched ingestion")
+    parser.add_argument("input", nargs="?", help="JSONL file of {'id', 'text', 'metadata'} (default: generated sample)")
+    parser.add_argument("--fake", action="store_true", help="Use a deterministic fake embedder (no API key required)")
+    parser.add_argument("--cache", help="SQLite file for the embedding cache (default: temporary file)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Maximum texts per embedding request")
+    parser.add_argument("--batch-tokens", type=int, default=100_000, help="Maximum estimated tokens per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--rpm", type=int, default=3000, help="Embedding requests per minute")
+    args = parser.parse_args()
+
+    model_name = "text-embedding-3-large"
+    if args.fake:
+        underlying = CountingFakeEmbeddings(size=256)
+        model_name = "fake-256"
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        underlying = OpenAIEmbeddings(model=model_name)
+
+    # The sample corpus and the default cache are removed when the run is over
+    with tempfile.TemporaryDirectory(prefix="ingest-") as workdir:
+        input_path = args.input or os.path.join(workdir, "corpus.jsonl")
+        if args.input is None:
+            write_sample_corpus(input_path)
+        cache_path = args.cache or os.path.join(workdir, "embeddings.sqlite")
+
+        for run in (1, 2):
+            # A fresh store per run; the second run finds every text in the on-disk cache
+            embeddings = CachedEmbeddings(underlying, model_name, cache_path, RateLimiter(args.rpm))
+            vector_store = InMemoryVectorStore(embeddings)
+            calls_before = getattr(underlying, "calls", 0)
+            start = time.perf_counter()
+            stats = await ingest(
+                vector_store, read_documents(input_path),
+                max_items=args.batch_size, max_tokens=args.batch_tokens, max_concurrency=args.concurrency,
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"Run {run}: ingested {stats['documents']} unique documents in {stats['batches']} batches "
+                f"in {elapsed:.2f}s; cache {embeddings.stats}; "
+                f"embedding API calls: {getattr(underlying, 'calls', 0) - calls_before}"
+            )
+
+        query = "What's the weather going to be like tomorrow?"
+        for _ in range(2):
+            calls_before = getattr(underlying, "calls", 0)
+            results = vector_store.similarity_search(query, k=1)
+            print(f"Query embedding API calls: {getattr(underlying, 'calls', 0) - calls_before}; top result: {results[0].page_content[:60]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
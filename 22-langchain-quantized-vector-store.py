@@ -0,0 +1,398 @@
+# Example: A compact vector store with int8 scalar or product quantization
+# Embeddings from text-embedding-3-large have 3072 dimensions: 12 KB per document at float32, and
+# script 11's `InMemoryVectorStore` keeps them as Python lists of floats, which is far larger.
+# This script stores quantized codes instead:
+#
+# - int8 scalar quantization: each dimension is scaled into [-127, 127] (4x smaller than float32).
+# - product quantization (PQ): the vector is split into `m` sub-vectors and each one is replaced by
+#   the 1-byte id of its nearest k-means centroid (e.g. 3072 dims, m=384 -> 384 bytes, 32x smaller).
+#   Queries are scored with per-query lookup tables (asymmetric distance computation).
+# - optional re-ranking: a float16 copy of each vector re-scores the top `k * rerank_factor`
+#   candidates exactly, recovering most of the recall lost to quantization. The float16 copy is
+#   only read for those candidates, so it is kept in a memory-mapped file (`rerank_dir`, default a
+#   temporary directory) and does not count against RAM (see the memmap store in script 20).
+#
+# The benchmark reports bytes per vector and recall@k against exact float32 search.
+#
+# Usage:
+#   python 22-langchain-quantized-vector-store.py --fake
+#   python 22-langchain-quantized-vector-store.py --benchmark --size 20000 --dim 3072
+
+import argparse
+import hashlib
+import os
+import re
+import tempfile
+import time
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., OpenAI API key for embeddings) from .env
+load_dotenv()
+
+BLOCK_ROWS = 32_768
+
+
+# --- Step 1: Quantizers ---
+# Both quantizers are trained once the store has staged enough vectors (or via `train()`).
+class ScalarQuantizer:
+    def train(self, vectors):
+        # Per-dimension scale from the 99.9th percentile to keep outliers from wasting resolution
+        self.scale = np.maximum(np.quantile(np.abs(vectors), 0.999, axis=0), 1e-6) / 127.0
+        self.scale = self.scale.astype(np.float32)
+
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale
+
+    def scores(self, codes, query):
+        # codes @ (query * scale) == decode(codes) @ query, without decoding the matrix
+        scaled = query * self.scale
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            out[start : start + BLOCK_ROWS] = codes[start : start + BLOCK_ROWS].astype(np.float32) @ scaled
+        return out
+
+    def nbytes(self):
+        return self.scale.nbytes
+
+
+class ProductQuantizer:
+    def __init__(self, m=None, n_centroids=256, iterations=10, sample_size=10_000, seed=0):
+        self.m = m
+        self.n_centroids = n_centroids
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+
+    def train(self, vectors):
+        dim = vectors.shape[1]
+        # Default to 8 dimensions per sub-vector (one byte per 8 floats, 32x smaller than float32)
+        self.m = self.m or max(1, dim // 8)
+        if dim % self.m:
+            raise ValueError(f"Dimension {dim} is not divisible into {self.m} sub-vectors")
+        self.sub_dim = dim // self.m
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.sample_size:
+            vectors = vectors[rng.choice(len(vectors), self.sample_size, replace=False)]
+        k = min(self.n_centroids, len(vectors))
+        self.codebooks = np.empty((self.m, k, self.sub_dim), dtype=np.float32)
+        for j in range(self.m):
+            sub = vectors[:, j * self.sub_dim : (j + 1) * self.sub_dim]
+            centroids = sub[rng.choice(len(sub), k, replace=False)].copy()
+            for _ in range(self.iterations):
+                labels = self._nearest(sub, centroids)
+                sums = np.stack(
+                    [np.bincount(labels, weights=sub[:, d], minlength=k) for d in range(self.sub_dim)], axis=1
+                )
+                counts = np.bincount(labels, minlength=k)[:, None]
+                centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+            self.codebooks[j] = centroids
+
+    @staticmethod
+    def _nearest(sub, centroids):
+        # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+        return np.argmin((centroids * centroids).sum(axis=1) - 2 * sub @ centroids.T, axis=1)
+
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = vectors[:, j * self.sub_dim : (j + 1) * self.sub_dim]
+            codes[:, j] = self._nearest(sub, self.codebooks[j])
+        return codes
+
+    def decode(self, codes):
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def scores(self, codes, query):
+        # One lookup table per query: table[j, c] = <query sub-vector j, centroid c of sub-space j>
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.m, self.sub_dim))
+        out = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.m):
+            out += table[j, codes[:, j]]
+        return out
+
+    def nbytes(self):
+        return self.codebooks.nbytes
+
+
+# --- Step 2: The quantized vector store ---
+# Until `min_train_size` vectors have been added, rows are staged as float32 and searched exactly;
+# the quantizer is then trained on all of them at once, so a small first batch cannot pin a poor
+# codebook. Call `train()` with a representative sample up front to quantize from the first add.
+class QuantizedVectorStore(VectorStore):
+    def __init__(
+        self,
+        embedding,
+        method="int8",
+        rerank=True,
+        rerank_factor=4,
+        pq_subvectors=None,
+        min_train_size=1024,
+        rerank_dir=None,
+    ):
+        self.embedding = embedding
+        if method == "int8":
+            self.quantizer = ScalarQuantizer()
+        elif method == "pq":
+            self.quantizer = ProductQuantizer(m=pq_subvectors)
+        else:
+            raise ValueError(f"Unknown quantization method: {method!r}")
+        self.method = method
+        self.rerank = rerank
+        self.rerank_factor = rerank_factor
+        self.min_train_size = min_train_size
+        self._trained = False
+        self._staged = None
+        self._codes = None
+        self._ids, self._texts, self._metadatas = [], [], []
+        # The float16 re-rank copy lives in a memory-mapped file: only candidate rows are paged in
+        self._floats = None
+        if rerank:
+            self._tmp_dir = None if rerank_dir else tempfile.TemporaryDirectory(prefix="quantized-rerank-")
+            self._floats_path = os.path.join(rerank_dir or self._tmp_dir.name, f"rerank-{uuid4().hex}.f16")
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        return len(self._ids)
+
+    def train(self, vectors=None):
+        """Train the quantizer on `vectors` (default: the staged rows) and encode the staged rows.
+
+        Rows already encoded with an earlier codebook are re-encoded from the float16 re-rank copy,
+        so retraining needs `rerank=True`."""
+        sample = self._staged if vectors is None else self._normalize(vectors)
+        if sample is None or len(sample) < self.min_train_size:
+            raise ValueError(f"Training needs at least {self.min_train_size} vectors")
+        if self._codes is not None and self._floats is None:
+            raise ValueError("Retraining would invalidate the existing codes; it needs rerank=True to re-encode them")
+        self.quantizer.train(sample)
+        self._trained = True
+        if self._codes is not None:
+            self._codes = np.concatenate([
+                self.quantizer.encode(np.asarray(self._floats[start : start + 65536], dtype=np.float32))
+                for start in range(0, len(self._floats), 65536)
+            ])
+        elif self._staged is not None:
+            self._codes = self.quantizer.encode(self._staged)
+            self._staged = None
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        if not len(texts):
+            return []
+        vectors = self._normalize(embeddings)
+        self._dim = vectors.shape[1]
+        if self._trained:
+            codes = self.quantizer.encode(vectors)
+            self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+        else:
+            self._staged = vectors if self._staged is None else np.concatenate([self._staged, vectors])
+        if self.rerank:
+            self._write_floats(vectors.astype(np.float16).tobytes(), "ab")
+        ids = [str(i) for i in ids] if ids else [str(uuid4()) for _ in texts]
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas or [{} for _ in texts])
+        if not self._trained and len(self._staged) >= self.min_train_size:
+            self.train()
+        return ids
+
+    def _write_floats(self, data, mode):
+        with open(self._floats_path, mode) as f:
+            f.write(data)
+        rows = os.path.getsize(self._floats_path) // 2 // self._dim
+        self._floats = np.memmap(self._floats_path, dtype=np.float16, mode="r", shape=(rows, self._dim)) if rows else None
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        doomed = {str(i) for i in ids or []}
+        keep = np.array([id_ not in doomed for id_ in self._ids], dtype=bool)
+        if keep.all():
+            return True
+        if self._codes is not None:
+            self._codes = self._codes[keep]
+        if self._staged is not None:
+            self._staged = self._staged[keep]
+        if self._floats is not None:
+            kept = np.asarray(self._floats[keep])
+            self._floats = None
+            self._write_floats(kept.tobytes(), "wb")
+        self._ids = [v for v, k in zip(self._ids, keep) if k]
+        self._texts = [v for v, k in zip(self._texts, keep) if k]
+        self._metadatas = [v for v, k in zip(self._metadatas, keep) if k]
+        return True
+
+    def get_by_ids(self, ids, /):
+        rows = {id_: row for row, id_ in enumerate(self._ids)}
+        return [self._document(rows[str(i)]) for i in ids if str(i) in rows]
+
+    def _document(self, row):
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    def memory_footprint(self):
+        """Bytes of vector data in RAM (codes, staged rows, codebooks/scales) and of the on-disk re-rank copy."""
+        codes = 0 if self._codes is None else self._codes.nbytes
+        staged = 0 if self._staged is None else self._staged.nbytes
+        floats = 0 if self._floats is None else self._floats.nbytes
+        return {
+            "codes": codes,
+            "staged": staged,
+            "quantizer": self.quantizer.nbytes() if self._trained else 0,
+            "rerank_disk": floats,
+        }
+
+    def search_rows(self, embedding, k=4, filter=None):
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if self._trained:
+            scores = self.quantizer.scores(self._codes, query)
+        else:
+            scores = self._staged @ query
+        candidates = len(scores)
+        if filter:
+            # Pre-filter: rows whose metadata does not match can never be returned
+            allowed = np.fromiter(
+                (all(m.get(key) == value for key, value in filter.items()) for m in self._metadatas),
+                dtype=bool,
+                count=len(self._metadatas),
+            )
+            scores[~allowed] = -np.inf
+            candidates = int(np.count_nonzero(allowed))
+        if candidates == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        fetch = min(candidates, k * self.rerank_factor if self.rerank else k)
+        top = np.argpartition(-scores, fetch - 1)[:fetch] if fetch < len(scores) else np.flatnonzero(scores > -np.inf)
+        if self.rerank:
+            scores = np.full(len(scores), -np.inf, dtype=np.float32)
+            order = np.sort(top)
+            scores[order] = self._floats[order].astype(np.float32) @ query
+        top = top[np.argsort(-scores[top])][:k]
+        return top, scores[top]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, **kwargs):
+        if not self._ids:
+            return []
+        rows, scores = self.search_rows(embedding, k, filter=filter)
+        return [(self._document(int(r)), float(s)) for r, s in zip(rows, scores)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+# --- Step 3: A tiny local embedder so the demo runs without an API key ---
+class BagOfWordsEmbeddings(Embeddings):
+    def __init__(self, size=256):
+        self.size = size
+
+    def embed_query(self, text):
+        vector = [0.0] * self.size
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def demo(embeddings):
+    texts = [
+        "I had chocolate chip pancakes and scrambled eggs for breakfast this morning.",
+        "The weather forecast for tomorrow is cloudy and overcast, with a high of 62 degrees.",
+        "Building an exciting new project with LangChain - come check it out!",
+    ]
+    metadatas = [{"source": "tweet"}, {"source": "news"}, {"source": "tweet"}]
+    vector_store = QuantizedVectorStore.from_texts(texts, embeddings, metadatas, method="int8")
+    query = "What's the weather going to be like tomorrow?"
+    print("Query:", query)
+    print("Most similar document found:")
+    for doc in vector_store.similarity_search(query, k=1):
+        print("- Content:", doc.page_content)
+        print("  Metadata:", doc.metadata)
+
+
+# --- Step 4: Memory footprint and recall@k benchmark ---
+def benchmark(size, dim, k=10, n_queries=100, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(1, size // 100), dim), dtype=np.float32)
+    vectors = topics[rng.integers(0, len(topics), size)] + 0.8 * rng.standard_normal((size, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(size, n_queries, replace=False)] + 0.3 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [set(np.argpartition(-(vectors @ q), k - 1)[:k]) for q in queries]
+
+    float_bytes = vectors.nbytes
+    print(f"{size:,} vectors x {dim} dims; float32 matrix: {float_bytes / 2**20:.1f} MiB "
+          f"({float_bytes // size} B/vector); Python lists (InMemoryVectorStore) ~{size * dim * 32 / 2**20:.0f} MiB\n")
+    configs = [("int8", False, 4), ("int8", True, 4), ("pq", False, 4), ("pq", True, 10)]
+    for method, rerank, rerank_factor in configs:
+        store = QuantizedVectorStore(None, method=method, rerank=rerank, rerank_factor=rerank_factor)
+        start = time.perf_counter()
+        store.add_embeddings([""] * size, vectors, ids=[str(i) for i in range(size)])
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [set(store.search_rows(q, k)[0].tolist()) for q in queries]
+        query_ms = (time.perf_counter() - start) / n_queries * 1000
+        recall = np.mean([len(f & e) / k for f, e in zip(found, exact)])
+        footprint = store.memory_footprint()
+        per_vector = footprint["codes"] / size
+        disk = footprint["rerank_disk"] / size
+        label = f"{method}{f' + re-rank top {rerank_factor * k}' if rerank else ''}"
+        print(f"{label:<22} {per_vector:7.0f} B/vector in RAM ({float_bytes / size / per_vector:5.1f}x smaller)"
+              f"{f' + {disk:.0f} B on disk' if disk else '':<18}  "
+              f"recall@{k}={recall:.3f}  {query_ms:6.2f} ms/query  build {build_s:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized vector store demo and benchmark")
+    parser.add_argument("--fake", action="store_true", help="Use a local fake embedder (no API key required)")
+    parser.add_argument("--benchmark", action="store_true", help="Run the footprint/recall benchmark")
+    parser.add_argument("--size", type=int, default=20_000, help="Number of vectors for the benchmark")
+    parser.add_argument("--dim", type=int, default=3072, help="Vector dimension for the benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.size, args.dim)
+        return
+    if args.fake:
+        embeddings = BagOfWordsEmbeddings()
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+    demo(embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# Example: Hybrid BM25 + vector retrieval with an incrementally updated inverted index
+# Script 11 only supports dense `similarity_search`, which handles exact terms such as product
+# names, SKUs and dates poorly. This script keeps a BM25 inverted index next to the vector store
+# and fuses both rankings:
+#
+# - BM25Index is updated incrementally on add/delete (postings, document frequencies and lengths
+#   are adjusted per document, never rebuilt from scratch).
+# - HybridRetriever is a LangChain retriever; it queries the vector store and the BM25 index
+#   concurrently and fuses the results with Reciprocal Rank Fusion ("rrf") or a weighted sum of
+#   min-max normalized scores ("weighted").
+# - A benchmark on a local synthetic product corpus reports latency and quality (hit@k, MRR) for
+#   dense-only, BM25-only and both fusion modes, over exact-SKU and paraphrased queries.
+#
+# Usage:
+#   python 23-langchain-hybrid-bm25-retriever.py --fake    # no API key required
+#   python 23-langchain-hybrid-bm25-retriever.py           # OpenAI embeddings (requires OPENAI_API_KEY)
+
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from uuid import uuid4
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., OpenAI API key for embeddings) from .env
+load_dotenv()
+
+# Keeps identifiers such as "sku-4821", "x200" and "2024-03-14" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# --- Step 1: Incremental BM25 inverted index ---
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)   # term -> {doc id: term frequency}
+        self.doc_lengths = {}               # doc id -> number of tokens
+        self.doc_terms = {}                 # doc id -> distinct terms (for deletes)
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_lengths:
+            self.delete(doc_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        self.doc_terms[doc_id] = tuple(counts)
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def delete(self, doc_id):
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(self, query, k=4):
+        n = len(self.doc_lengths)
+        if n == 0:
+            return []
+        avg_length = self.total_length / n
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+# --- Step 2: Score fusion ---
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    # score(d) = sum_i weight_i / (k + rank_i(d)); robust to incomparable score scales
+    weights = weights or [1.0] * len(rankings)
+    fused = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def weighted_fusion(rankings, weights):
+    # Min-max normalize each ranking's scores to [0, 1] before the weighted sum
+    fused = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        scores = [score for _, score in ranking]
+        low, high = min(scores), max(scores)
+        for doc_id, score in ranking:
+            fused[doc_id] += weight * ((score - low) / (high - low) if high > low else 1.0)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+# --- Step 3: The hybrid retriever ---
+class HybridRetriever(BaseRetriever):
+    vector_store: VectorStore
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    fusion: str = "rrf"
+    dense_weight: float = 0.5
+
+    def add_documents(self, documents, ids=None):
+        ids = ids or [doc.id or str(uuid4()) for doc in documents]
+        self.vector_store.add_documents(documents, ids=ids)
+        for doc_id, doc in zip(ids, documents):
+            self.bm25.add(doc_id, doc.page_content)
+        return ids
+
+    def delete(self, ids):
+        self.vector_store.delete(ids)
+        for doc_id in ids:
+            self.bm25.delete(doc_id)
+
+    def _dense(self, query):
+        return [(doc.id, score) for doc, score in self.vector_store.similarity_search_with_score(query, k=self.fetch_k)]
+
+    def _fuse(self, dense, sparse):
+        weights = [self.dense_weight, 1.0 - self.dense_weight]
+        if self.fusion == "rrf":
+            fused = reciprocal_rank_fusion([dense, sparse], weights=weights)
+        elif self.fusion == "weighted":
+            fused = weighted_fusion([dense, sparse], weights)
+        else:
+            raise ValueError(f"Unknown fusion mode: {self.fusion!r}")
+        ids = [doc_id for doc_id, _ in fused[: self.k]]
+        by_id = {doc.id: doc for doc in self.vector_store.get_by_ids(ids)}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self._fuse(self._dense(query), self.bm25.search(query, self.fetch_k))
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        # Query both indexes at the same time
+        dense, sparse = await asyncio.gather(
+            asyncio.to_thread(self._dense, query),
+            asyncio.to_thread(self.bm25.search, query, self.fetch_k),
+        )
+        return self._fuse(dense, sparse)
+
+
+# --- Step 4: A fake embedder with dense-model-like strengths and weaknesses ---
+# It maps synonyms onto the same canonical word (so paraphrased queries still match, which BM25
+# cannot do) and only gives a weak, heavily hashed signal to identifiers such as SKUs and dates
+# (which dense models tend to blur).
+SYNONYMS = {
+    "notebook": "laptop", "smartphone": "phone", "mobile": "phone", "display": "monitor",
+    "screen": "monitor", "earphones": "headphones", "headset": "headphones", "cheap": "affordable",
+    "inexpensive": "affordable", "light": "lightweight", "small": "compact", "strong": "powerful",
+    "fast": "powerful", "luxury": "premium", "sturdy": "durable", "rugged": "durable",
+    "gaming": "games", "travelling": "travel", "trips": "travel", "office": "work", "business": "work",
+    "photos": "photography", "pictures": "photography", "kids": "children",
+}
+
+
+class TopicEmbeddings(Embeddings):
+    def __init__(self, size=256, identifier_weight=0.2):
+        self.size = size
+        self.identifier_weight = identifier_weight
+
+    def _bucket(self, token):
+        return int(hashlib.md5(token.encode()).hexdigest(), 16) % self.size
+
+    def embed_query(self, text):
+        vector = [0.0] * self.size
+        for token in tokenize(text):
+            if any(ch.isdigit() for ch in token):
+                vector[self._bucket(token)] += self.identifier_weight
+            else:
+                vector[self._bucket(SYNONYMS.get(token, token))] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+# --- Step 5: Local benchmark corpus and evaluation ---
+# Two kinds of queries: exact lookups by SKU (BM25's strength) and paraphrased descriptions that
+# use synonyms of the document wording (the dense side's strength).
+PRODUCTS = ["laptop", "phone", "tablet", "monitor", "headphones", "camera", "router", "keyboard"]
+ADJECTIVES = ["lightweight", "powerful", "affordable", "premium", "compact", "durable"]
+USES = ["travel", "games", "work", "photography", "children", "music"]
+PARAPHRASE = {value: key for key, value in SYNONYMS.items()}
+
+
+def build_corpus(size=2000, seed=0):
+    rng = random.Random(seed)
+    documents, queries = [], []
+    for i in range(size):
+        product, adjective, use = rng.choice(PRODUCTS), rng.choice(ADJECTIVES), rng.choice(USES)
+        sku = f"SKU-{1000 + i}"
+        model = f"{product[:2].upper()}{rng.randrange(100, 999)}"
+        date = f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+        text = f"The {adjective} {product} {model} ({sku}) was released on {date}. Designed for {use}."
+        documents.append(Document(id=str(i), page_content=text, metadata={"topic": (product, adjective, use)}))
+    for i in range(0, size, 20):
+        product, adjective, use = documents[i].metadata["topic"]
+        queries.append((f"When was SKU-{1000 + i} released?", {str(i)}))
+        relevant = {doc.id for doc in documents if doc.metadata["topic"] == (product, adjective, use)}
+        paraphrase = " ".join(PARAPHRASE.get(word, word) for word in (adjective, product, "for", use))
+        queries.append((f"Looking for a {paraphrase}", relevant))
+    return documents, queries
+
+
+def evaluate(name, search, queries, k):
+    hits, reciprocal_ranks = 0, []
+    start = time.perf_counter()
+    for query, relevant in queries:
+        ids = list(search(query))[:k]
+        ranks = [rank for rank, doc_id in enumerate(ids, start=1) if doc_id in relevant]
+        hits += bool(ranks)
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+    elapsed = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"{name:<18} hit@{k}={hits / len(queries):.2f}  MRR={sum(reciprocal_ranks) / len(queries):.2f}  {elapsed:6.2f} ms/query")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + vector retrieval")
+    parser.add_argument("--fake", action="store_true", help="Use a local fake embedder (no API key required)")
+    parser.add_argument("--size", type=int, default=2000, help="Number of documents in the benchmark corpus")
+    args = parser.parse_args()
+
+    if args.fake:
+        embeddings = TopicEmbeddings()
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+
+    documents, queries = build_corpus(args.size)
+    retriever = HybridRetriever(vector_store=InMemoryVectorStore(embeddings), bm25=BM25Index(), k=4)
+    retriever.add_documents(documents, ids=[doc.id for doc in documents])
+
+    # Incremental update cost versus rebuilding the BM25 index from scratch
+    extra = Document(id="extra", page_content="The premium laptop LA123 (SKU-99999) was released on 2025-01-01. Designed for work.")
+    start = time.perf_counter()
+    retriever.bm25.add(extra.id, extra.page_content)
+    retriever.bm25.delete(extra.id)
+    incremental_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    rebuilt = BM25Index()
+    for doc in documents:
+        rebuilt.add(doc.id, doc.page_content)
+    rebuild_ms = (time.perf_counter() - start) * 1000
+    print(f"BM25 incremental add+delete: {incremental_ms:.3f} ms; full rebuild of {len(documents)} docs: {rebuild_ms:.1f} ms\n")
+
+    k = retriever.k
+    evaluate("dense only", lambda q: [d.id for d in retriever.vector_store.similarity_search(q, k=k)], queries, k)
+    evaluate("BM25 only", lambda q: [doc_id for doc_id, _ in retriever.bm25.search(q, k)], queries, k)
+    for fusion in ("rrf", "weighted"):
+        retriever.fusion = fusion
+        evaluate(f"hybrid ({fusion})", lambda q: [d.id for d in retriever.invoke(q)], queries, k)
+
+    # The async path queries both indexes concurrently
+    retriever.fusion = "rrf"
+    start = time.perf_counter()
+    await asyncio.gather(*(retriever.ainvoke(query) for query, _ in queries))
+    print(f"\nhybrid (rrf), async: {len(queries)} queries in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    query, _ = queries[0]
+    print(f"\nQuery: {query}")
+    for doc in retriever.invoke(query):
+        print("-", doc.page_content)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
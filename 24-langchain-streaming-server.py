@@ -0,0 +1,322 @@
+# Example: A long-lived async server exposing the cookbook chains over HTTP and SSE
+# Every other script is a one-shot CLI run, so each request pays Python start-up, imports and
+# client construction again. This script builds the `ChatGroq` client, the chains and the compiled
+# LangGraph graph once, and serves them from a FastAPI app:
+#
+#   POST /invoke     {"input": "..."}          -> {"output": "..."}
+#   POST /stream     {"input": "..."}          -> Server-Sent Events, one event per token
+#                                                 (the `llm.stream` loop from script 02)
+#   POST /sentiment  {"feedback": "..."}       -> {"sentiment": "..."}  (the chain from script 09)
+#   POST /graph      {"graph_state": "..."}    -> final state           (the graph from script 12)
+#
+# A semaphore bounds the number of requests in flight, and a shared httpx connection pool is
+# handed to ChatGroq so provider connections are reused across requests.
+#
+# The script also contains a local mock of Groq's OpenAI-compatible chat completions API (with a
+# time-to-first-token and tokens/second latency model) and a load-test harness.
+#
+# Usage:
+#   python 24-langchain-streaming-server.py demo                      # everything locally, no API key
+#   python 24-langchain-streaming-server.py serve --port 8000         # real Groq (requires GROQ_API_KEY)
+#   python 24-langchain-streaming-server.py mock-provider --port 9000
+#   python 24-langchain-streaming-server.py serve --provider-url http://127.0.0.1:9000
+#   python 24-langchain-streaming-server.py loadtest --url http://127.0.0.1:8000 --requests 200 --concurrency 20
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing_extensions import TypedDict
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langgraph.graph import StateGraph, START, END
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Request bodies ---
+class ChatRequest(BaseModel):
+    input: str
+
+
+class FeedbackRequest(BaseModel):
+    feedback: str
+
+
+class GraphRequest(BaseModel):
+    graph_state: str
+
+
+# --- Step 2: Chains and graphs, built once at start-up ---
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+
+
+class State(TypedDict):
+    graph_state: str
+
+
+def build_graph():
+    # The graph from script 12, without the print statements
+    def node_1(state):
+        return {"graph_state": state["graph_state"] + " AGI"}
+
+    def node_2(state):
+        return {"graph_state": state["graph_state"] + " Achieved!"}
+
+    def node_3(state):
+        return {"graph_state": state["graph_state"] + " Not Achieved :("}
+
+    def decide_mood(state):
+        return "node_2" if random.random() < 0.5 else "node_3"
+
+    builder = StateGraph(State)
+    builder.add_node("node_1", node_1)
+    builder.add_node("node_2", node_2)
+    builder.add_node("node_3", node_3)
+    builder.add_edge(START, "node_1")
+    builder.add_conditional_edges("node_1", decide_mood, ["node_2", "node_3"])
+    builder.add_edge("node_2", END)
+    builder.add_edge("node_3", END)
+    return builder.compile()
+
+
+def build_llm(provider_url=None, pool_size=100):
+    from langchain_groq import ChatGroq
+    # One connection pool per process, shared by every request
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    kwargs = {}
+    if provider_url:
+        kwargs = {"base_url": provider_url, "api_key": "mock-key"}
+    return ChatGroq(
+        model="llama3-8b-8192",
+        http_client=httpx.Client(limits=limits),
+        http_async_client=httpx.AsyncClient(limits=limits),
+        **kwargs,
+    )
+
+
+def build_app(llm, max_concurrency=32):
+    app = FastAPI(title="LangChain Groq cookbook server")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    sentiment_chain = sentiment_template | llm | StrOutputParser()
+    graph = build_graph()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/invoke")
+    async def invoke(request: ChatRequest):
+        async with semaphore:
+            response = await llm.ainvoke(request.input)
+        return {"output": response.content}
+
+    @app.post("/stream")
+    async def stream(request: ChatRequest):
+        async def events():
+            async with semaphore:
+                async for chunk in llm.astream(request.input):
+                    if chunk.content:
+                        yield f"data: {json.dumps({'token': chunk.content})}\n\n"
+            yield "event: end\ndata: {}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/sentiment")
+    async def sentiment(request: FeedbackRequest):
+        async with semaphore:
+            result = await sentiment_chain.ainvoke({"feedback": request.feedback})
+        return {"sentiment": result}
+
+    @app.post("/graph")
+    async def run_graph(request: GraphRequest):
+        return await graph.ainvoke({"graph_state": request.graph_state})
+
+    return app
+
+
+# --- Step 3: Local mock of the Groq chat completions API ---
+# Responses are derived from the prompt, so identical requests get identical answers. Latency is
+# modeled as a time-to-first-token plus a fixed number of tokens per second.
+def build_mock_provider(ttft=0.2, tokens_per_second=200.0):
+    app = FastAPI(title="Mock Groq provider")
+
+    def answer(messages):
+        prompt = messages[-1]["content"] if messages else ""
+        if prompt.startswith("Determine the sentiment"):
+            return random.Random(prompt).choice(["Positive", "Neutral", "Negative"])
+        words = prompt.split()
+        return "This is a mock answer about " + " ".join(words[:30]) + "."
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(body: dict):
+        text = answer(body.get("messages", []))
+        tokens = [token + " " for token in text.split()]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", "")).split()) for m in body.get("messages", [])),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + len(tokens) / tokens_per_second)
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def events():
+            await asyncio.sleep(ttft)
+            for index, token in enumerate(tokens):
+                delta = {"role": "assistant", "content": token} if index == 0 else {"content": token}
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": body["model"], "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / tokens_per_second)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                "model": body["model"], "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+# --- Step 4: Load-test harness ---
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def load_test(url, endpoint="stream", requests=200, concurrency=20):
+    """Send `requests` requests with at most `concurrency` in flight and report latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    first_tokens, totals, errors = [], [], 0
+
+    async def one(client, i):
+        nonlocal errors
+        prompt = f"Tell me about tall building number {i % 50}"
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if endpoint == "stream":
+                    first_token = None
+                    async with client.stream("POST", "/stream", json={"input": prompt}) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if first_token is None and line.startswith('data: {"token"'):
+                                first_token = time.perf_counter() - start
+                    first_tokens.append(first_token)
+                else:
+                    body = {"graph_state": prompt} if endpoint == "graph" else {"input": prompt, "feedback": prompt}
+                    response = await client.post(f"/{endpoint}", json=body)
+                    response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            totals.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{endpoint}: {len(totals)} ok, {errors} errors in {elapsed:.2f}s ({len(totals) / elapsed:.1f} req/s)")
+    if totals:
+        print(f"  latency p50={percentile(totals, 50) * 1000:.0f} ms  p95={percentile(totals, 95) * 1000:.0f} ms  "
+              f"mean={statistics.fmean(totals) * 1000:.0f} ms")
+    first_tokens = [t for t in first_tokens if t is not None]
+    if first_tokens:
+        print(f"  time to first token p50={percentile(first_tokens, 50) * 1000:.0f} ms  "
+              f"p95={percentile(first_tokens, 95) * 1000:.0f} ms")
+
+
+# --- Step 5: Command line ---
+async def serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def demo(args):
+    # Mock provider and server run in this process; the load test talks to them over HTTP
+    provider, provider_task = await serve(build_mock_provider(args.ttft, args.tokens_per_second), args.provider_port)
+    llm = build_llm(f"http://127.0.0.1:{args.provider_port}")
+    app_server, app_task = await serve(build_app(llm, args.max_concurrency), args.port)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        for endpoint in ("stream", "invoke", "sentiment", "graph"):
+            await load_test(url, endpoint, args.requests, args.concurrency)
+    finally:
+        app_server.should_exit = provider.should_exit = True
+        await asyncio.gather(app_task, provider_task)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async HTTP/SSE server for the cookbook chains")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the server")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 inside Docker")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--provider-url", help="Use a mock provider instead of the Groq API")
+    serve_parser.add_argument("--max-concurrency", type=int, default=32, help="LLM requests in flight")
+
+    mock_parser = commands.add_parser("mock-provider", help="Run the mock Groq provider")
+    mock_parser.add_argument("--port", type=int, default=9000)
+
+    load_parser = commands.add_parser("loadtest", help="Load-test a running server")
+    load_parser.add_argument("--url", default="http://127.0.0.1:8000")
+    load_parser.add_argument("--endpoint", choices=["stream", "invoke", "sentiment", "graph"], default="stream")
+
+    demo_parser = commands.add_parser("demo", help="Mock provider + server + load test in one process")
+    demo_parser.add_argument("--port", type=int, default=8000)
+    demo_parser.add_argument("--provider-port", type=int, default=9000)
+    demo_parser.add_argument("--max-concurrency", type=int, default=32, help="LLM requests in flight")
+
+    for sub in (mock_parser, demo_parser):
+        sub.add_argument("--ttft", type=float, default=0.2, help="Mock time to first token (seconds)")
+        sub.add_argument("--tokens-per-second", type=float, default=200.0, help="Mock generation speed")
+    for sub in (load_parser, demo_parser):
+        sub.add_argument("--requests", type=int, default=200)
+        sub.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        uvicorn.run(build_app(build_llm(args.provider_url), args.max_concurrency), host=args.host, port=args.port)
+    elif args.command == "mock-provider":
+        uvicorn.run(build_mock_provider(args.ttft, args.tokens_per_second), host="127.0.0.1", port=args.port)
+    elif args.command == "loadtest":
+        asyncio.run(load_test(args.url, args.endpoint, args.requests, args.concurrency))
+    else:
+        asyncio.run(demo(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,576 @@
+# Example: Client-side token-bucket rate limiting and adaptive concurrency for ChatGroq
+# Every `ChatGroq(model=...)` in scripts 01-10 sends requests as fast as the caller makes them.
+# Under batch load that runs into the provider's requests-per-minute and tokens-per-minute limits,
+# and time is lost on 429 responses and retries. This script adds:
+#
+# - TokenBuckets: one bucket for requests and one for tokens. The state lives in memory (shared by
+#   every thread and task in the process) or, with `path=`, in a small locked file so several
+#   processes on the same machine share one budget.
+# - AdaptiveRateLimiter: reserves an estimated token count per request from the buckets and
+#   limits requests in flight with AIMD (additive increase, multiplicative decrease): the limit
+#   grows by ~1 per round of successful requests and halves on a 429 (or when latency exceeds an
+#   optional target). A 429's Retry-After pauses every client sharing the buckets.
+# - RateLimitedChatModel / attach_rate_limiter(llm, limiter): wraps any chat model (invoke and
+#   stream, sync and async), retries 429s itself and corrects the token estimate with the usage
+#   the provider reports. Async callers never block the event loop: they wait for a slot on a
+#   future, and the file lock is taken on a worker thread.
+#
+# The demo runs the sentiment chain from script 09 against a local mock of the Groq API that
+# enforces its own limits, first without a limiter, then with one, then from several processes
+# sharing one limiter through a file.
+#
+# Usage:
+#   python 26-langchain-adaptive-rate-limiter.py                         # no API key required
+#   python 26-langchain-adaptive-rate-limiter.py --requests 200 --processes 4
+#   python 26-langchain-adaptive-rate-limiter.py --client-rpm 2400       # client overestimates the limit
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from pydantic import Field
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English text
+    return len(text) // 4 + 1
+
+
+# --- Step 1: Request and token buckets, in memory or shared through a file ---
+# Requests reserve capacity up front and may drive a bucket negative; the caller then sleeps until
+# the deficit has refilled. This keeps waiting requests in arrival order without a queue.
+class TokenBuckets:
+    def __init__(self, requests_per_minute, tokens_per_minute, burst_seconds=1.0, path=None):
+        self.rates = {"requests": requests_per_minute / 60, "tokens": tokens_per_minute / 60}
+        self.capacity = {name: rate * burst_seconds for name, rate in self.rates.items()}
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _initial(self, now):
+        return {**self.capacity, "updated": now, "blocked_until": 0.0}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if self.path is None:
+                self._state = self._state or self._initial(time.time())
+                yield self._state
+                return
+            import fcntl
+            with open(self.path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content else self._initial(time.time())
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state["updated"])
+        for name, rate in self.rates.items():
+            state[name] = min(self.capacity[name], state[name] + elapsed * rate)
+        state["updated"] = now
+
+    def reserve(self, tokens):
+        """Take one request and `tokens` tokens; return how long to wait before sending."""
+        with self._locked() as state:
+            now = time.time()
+            self._refill(state, now)
+            state["requests"] -= 1
+            state["tokens"] -= tokens
+            return max(
+                0.0,
+                -state["requests"] / self.rates["requests"],
+                -state["tokens"] / self.rates["tokens"],
+                state["blocked_until"] - now,
+            )
+
+    def refund(self, tokens, requests=0):
+        # Negative refunds charge tokens that were used beyond the estimate
+        with self._locked() as state:
+            self._refill(state, time.time())
+            state["tokens"] = min(self.capacity["tokens"], state["tokens"] + tokens)
+            state["requests"] = min(self.capacity["requests"], state["requests"] + requests)
+
+    def block(self, seconds):
+        with self._locked() as state:
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+
+    # The in-memory state is only locked for a moment, but the file lock can be held by another
+    # process, so with `path=` the async variants wait for it on a worker thread
+    async def _run(self, method, *args):
+        if self.path is None:
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def areserve(self, tokens):
+        return await self._run(self.reserve, tokens)
+
+    async def arefund(self, tokens, requests=0):
+        await self._run(self.refund, tokens, requests)
+
+    async def ablock(self, seconds):
+        await self._run(self.block, seconds)
+
+
+# --- Step 2: AIMD concurrency on top of the buckets ---
+class AdaptiveRateLimiter:
+    def __init__(self, buckets, initial_limit=4, min_limit=1, max_limit=64, decrease=0.5, latency_target=None):
+        self.buckets = buckets
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._waiters = []  # (loop, future) of async callers waiting for a slot
+        self._last_decrease = 0.0
+        self._latency = 0.0
+        self.stats = {"requests": 0, "rate_limited": 0, "decreases": 0, "waited_seconds": 0.0, "peak_limit": self.limit}
+
+    def _try_enter(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self, tokens):
+        with self._condition:
+            self._condition.wait_for(self._try_enter)
+        try:
+            wait = self.buckets.reserve(tokens)
+            self.stats["waited_seconds"] += wait
+            if wait:
+                time.sleep(wait)
+        except BaseException:
+            self.abandon()
+            raise
+
+    async def aacquire(self, tokens):
+        # Wait on a future that release() resolves, rather than block the event loop on the
+        # thread condition
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._try_enter():
+                    break
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+        try:
+            wait = await self.buckets.areserve(tokens)
+            self.stats["waited_seconds"] += wait
+            if wait:
+                await asyncio.sleep(wait)
+        except BaseException:
+            # Cancelled (a timeout, say) while waiting for the buckets: give the slot back
+            self.abandon()
+            raise
+
+    def release(self, latency, rate_limited=False, retry_after=None):
+        self._finish(latency, rate_limited)
+        if rate_limited:
+            self.stats["rate_limited"] += 1
+            self.buckets.block(retry_after if retry_after is not None else 1.0)
+
+    async def arelease(self, latency, rate_limited=False, retry_after=None):
+        self._finish(latency, rate_limited)
+        if rate_limited:
+            self.stats["rate_limited"] += 1
+            await self.buckets.ablock(retry_after if retry_after is not None else 1.0)
+
+    def abandon(self):
+        """Give back a slot whose request was cancelled; it says nothing about congestion."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _finish(self, latency, rate_limited):
+        with self._condition:
+            self.in_flight -= 1
+            self.stats["requests"] += 1
+            self._latency = latency if not self._latency else 0.8 * self._latency + 0.2 * latency
+            congested = rate_limited or (self.latency_target is not None and latency > self.latency_target)
+            now = time.monotonic()
+            if congested:
+                # Every request in flight during an overload sees it; decrease once per round-trip
+                if now - self._last_decrease > self._latency:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self.stats["decreases"] += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.stats["peak_limit"] = max(self.stats["peak_limit"], self.limit)
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        # Woken callers try again for a slot; the futures belong to their own event loops
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# --- Step 3: Attach the limiter to any chat model ---
+def rate_limit_details(error):
+    """Return (is a 429, Retry-After seconds or None) for groq/openai/httpx errors."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return False, None
+    headers = getattr(response, "headers", {}) or {}
+    if headers.get("retry-after-ms"):
+        return True, float(headers["retry-after-ms"]) / 1000
+    if headers.get("retry-after"):
+        return True, float(headers["retry-after"])
+    return True, None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    # Give the wrapped model max_retries=0 so 429s come back here instead of being retried blindly
+    llm: Any
+    limiter: Any
+    max_retries: int = 6
+    expected_output_tokens: float = 64.0
+    stats: dict = Field(default_factory=lambda: {"retries": 0})
+
+    @property
+    def _llm_type(self) -> str:
+        return f"rate-limited-{getattr(self.llm, 'bound', self.llm)._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"llm": self.llm.bind_tools(tools, **kwargs)})
+
+    def _estimate(self, messages):
+        return sum(estimate_tokens(str(m.content)) for m in messages) + int(self.expected_output_tokens)
+
+    def _usage(self, message):
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            self.expected_output_tokens = 0.9 * self.expected_output_tokens + 0.1 * usage["output_tokens"]
+        return usage
+
+    def _settle(self, estimate, message):
+        usage = self._usage(message)
+        if usage:
+            self.limiter.buckets.refund(estimate - usage["total_tokens"])
+
+    async def _asettle(self, estimate, message):
+        usage = self._usage(message)
+        if usage:
+            await self.limiter.buckets.arefund(estimate - usage["total_tokens"])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            start = time.perf_counter()
+            try:
+                message = self.llm.invoke(messages, stop=stop, **kwargs)
+            except Exception as error:
+                rate_limited, retry_after = rate_limit_details(error)
+                self.limiter.release(time.perf_counter() - start, rate_limited, retry_after)
+                if not rate_limited or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                continue
+            except BaseException:
+                self.limiter.abandon()
+                raise
+            self.limiter.release(time.perf_counter() - start)
+            self._settle(estimate, message)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire(estimate)
+            start = time.perf_counter()
+            try:
+                message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+            except Exception as error:
+                rate_limited, retry_after = rate_limit_details(error)
+                await self.limiter.arelease(time.perf_counter() - start, rate_limited, retry_after)
+                if not rate_limited or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                continue
+            except BaseException:
+                # Cancelled mid-call (asyncio.wait_for, a client disconnect): give the slot back
+                self.limiter.abandon()
+                raise
+            self.limiter.release(time.perf_counter() - start)
+            await self._asettle(estimate, message)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    # A stream holds its slot until the last chunk; a 429 is only retried before the first chunk
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            start = time.perf_counter()
+            message = None
+            try:
+                for chunk in self.llm.stream(messages, stop=stop, **kwargs):
+                    message = chunk if message is None else message + chunk
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                    yield ChatGenerationChunk(message=chunk)
+            except Exception as error:
+                rate_limited, retry_after = rate_limit_details(error)
+                self.limiter.release(time.perf_counter() - start, rate_limited, retry_after)
+                if not rate_limited or message is not None or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                continue
+            except BaseException:
+                # The caller stopped reading (or was cancelled): give the slot back
+                self.limiter.abandon()
+                raise
+            self.limiter.release(time.perf_counter() - start)
+            self._settle(estimate, message)
+            return
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire(estimate)
+            start = time.perf_counter()
+            message = None
+            try:
+                async for chunk in self.llm.astream(messages, stop=stop, **kwargs):
+                    message = chunk if message is None else message + chunk
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                    yield ChatGenerationChunk(message=chunk)
+            except Exception as error:
+                rate_limited, retry_after = rate_limit_details(error)
+                await self.limiter.arelease(time.perf_counter() - start, rate_limited, retry_after)
+                if not rate_limited or message is not None or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                continue
+            except BaseException:
+                self.limiter.abandon()
+                raise
+            self.limiter.release(time.perf_counter() - start)
+            await self._asettle(estimate, message)
+            return
+
+
+def attach_rate_limiter(llm, limiter, **kwargs):
+    return RateLimitedChatModel(llm=llm, limiter=limiter, **kwargs)
+
+
+# --- Step 4: Local mock of the Groq API that enforces rate limits ---
+# The provider keeps its own buckets (with a one-second burst) and answers 429 with Retry-After
+# when a request does not fit, like the real API.
+def build_mock_provider(requests_per_minute, tokens_per_minute, ttft=0.1, tokens_per_second=500.0):
+    app = FastAPI(title="Rate-limited mock Groq provider")
+
+    def reset():
+        app.state.buckets = TokenBuckets(requests_per_minute, tokens_per_minute)
+        app.state.stats = {"served": 0, "rejected": 0}
+
+    app.state.reset = reset
+    reset()
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(body: dict):
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        text = random.Random(prompt).choice(["Positive", "Neutral", "Negative"])
+        usage = {"prompt_tokens": sum(estimate_tokens(str(m.get("content", ""))) for m in messages)}
+        usage["completion_tokens"] = estimate_tokens(text)
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        wait = app.state.buckets.reserve(usage["total_tokens"])
+        if wait > 0:
+            # A rejected request does not consume the budget
+            app.state.buckets.refund(usage["total_tokens"], requests=1)
+            app.state.stats["rejected"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(max(1, round(wait))), "retry-after-ms": str(int(wait * 1000))},
+                content={"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+            )
+        app.state.stats["served"] += 1
+        await asyncio.sleep(ttft + usage["completion_tokens"] / tokens_per_second)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    return app
+
+
+# --- Step 5: Demo workload and scenarios ---
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+
+FEEDBACK = [
+    "The delivery was late, and the product was damaged when it arrived.",
+    "The customer service was fantastic. The representative was friendly and knowledgeable.",
+    "The product works as described, nothing more and nothing less.",
+    "I was disappointed with the quality and the support team never answered my emails.",
+]
+
+
+def build_llm(provider_url, max_retries=2):
+    from langchain_groq import ChatGroq
+    return ChatGroq(model="llama-3.1-8b-instant", base_url=provider_url, api_key="mock-key", max_retries=max_retries)
+
+
+async def run_requests(llm, count, concurrency, offset=0):
+    chain = sentiment_template | llm | StrOutputParser()
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        feedback = f"{FEEDBACK[i % len(FEEDBACK)]} (order {i})"
+        async with semaphore:
+            try:
+                await chain.ainvoke({"feedback": feedback})
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one(offset + i) for i in range(count)))
+    return failures
+
+
+def make_limiter(args, path=None):
+    return AdaptiveRateLimiter(TokenBuckets(args.client_rpm, args.client_tpm, path=path), max_limit=args.concurrency)
+
+
+def worker(args, path, count, offset, ready, go, results):
+    # Runs in a separate process; the buckets are shared through `path`
+    limiter = make_limiter(args, path)
+    llm = attach_rate_limiter(build_llm(args.provider_url, max_retries=0), limiter)
+    ready.put(os.getpid())
+    go.wait()
+    failures = asyncio.run(run_requests(llm, count, args.concurrency, offset))
+    results.put({"failures": failures, **limiter.stats})
+
+
+def run_processes(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="ratelimit-"), "buckets.json")
+    context = multiprocessing.get_context("spawn")
+    ready, go, results = context.Queue(), context.Event(), context.Queue()
+    per_process = args.requests // args.processes
+    processes = [
+        context.Process(target=worker, args=(args, path, per_process, i * per_process, ready, go, results))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Start timing once every process has finished importing and is ready to send
+    for _ in processes:
+        ready.get()
+    start = time.perf_counter()
+    go.set()
+    stats = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return elapsed, sum(s["failures"] for s in stats), stats
+
+
+def start_provider(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def report(name, provider, elapsed, failures, requests, extra=""):
+    stats = provider.state.stats
+    print(
+        f"{name:<28} {elapsed:6.2f}s  {(requests - failures) / elapsed:6.1f} req/s  "
+        f"failed {failures:3d}  provider 429s {stats['rejected']:4d}  {extra}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-bucket rate limiter with AIMD concurrency")
+    parser.add_argument("--requests", type=int, default=120, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests the caller has in flight")
+    parser.add_argument("--provider-rpm", type=int, default=1200, help="Mock provider requests per minute")
+    parser.add_argument("--provider-tpm", type=int, default=60_000, help="Mock provider tokens per minute")
+    parser.add_argument("--client-rpm", type=int, default=1200, help="Requests per minute the limiter allows")
+    parser.add_argument("--client-tpm", type=int, default=60_000, help="Tokens per minute the limiter allows")
+    parser.add_argument("--processes", type=int, default=3, help="Processes sharing one file-backed limiter")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+    args.provider_url = f"http://127.0.0.1:{args.port}"
+
+    provider = build_mock_provider(args.provider_rpm, args.provider_tpm)
+    server = start_provider(provider, args.port)
+    print(f"Mock provider: {args.provider_rpm} requests/min, {args.provider_tpm} tokens/min; "
+          f"{args.requests} requests per scenario, caller concurrency {args.concurrency}\n")
+
+    # 1. The cookbook default: ChatGroq retries 429s with its own backoff
+    start = time.perf_counter()
+    failures = asyncio.run(run_requests(build_llm(args.provider_url), args.requests, args.concurrency))
+    report("no limiter (SDK retries)", provider, time.perf_counter() - start, failures, args.requests)
+
+    # 2. One process, in-memory buckets and AIMD concurrency
+    time.sleep(1.0)
+    provider.state.reset()
+    limiter = make_limiter(args)
+    llm = attach_rate_limiter(build_llm(args.provider_url, max_retries=0), limiter)
+    start = time.perf_counter()
+    failures = asyncio.run(run_requests(llm, args.requests, args.concurrency))
+    report(
+        "adaptive limiter", provider, time.perf_counter() - start, failures, args.requests,
+        f"retries {llm.stats['retries']}  limit {limiter.limit:.1f} (peak {limiter.stats['peak_limit']:.1f})",
+    )
+
+    # 3. Several processes sharing one budget through a locked file
+    time.sleep(1.0)
+    provider.state.reset()
+    elapsed, failures, stats = run_processes(args)
+    requests = args.requests // args.processes * args.processes
+    report(
+        f"{args.processes} processes, shared file", provider, elapsed, failures, requests,
+        f"client-side 429s {sum(s['rate_limited'] for s in stats)}",
+    )
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
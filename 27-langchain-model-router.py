@@ -0,0 +1,320 @@
+# Example: Routing easy prompts to a small, fast model and escalating on parse failures
+# Scripts 01-10 hard-code `llama-3.3-70b-versatile`, `llama3-8b-8192` or `llama-3.1-8b-instant`
+# per script. This script adds a routing chat model that picks the model per request:
+#
+# - classify_prompt() scores a request with cheap heuristics: prompt length, "hard task" wording
+#   (explain, compare, analyze, step by step, code...), several questions at once, and
+#   structured-output requirements (parser format instructions, bound tools, nested schemas).
+# - RoutingChatModel sends the request to the cheapest tier whose threshold the score reaches,
+#   and records calls, latency, tokens and cost per route.
+# - with_escalation() wraps a `prompt | model | parser` chain: when parsing fails (for example a
+#   `PydanticOutputParser` error as in script 07) the same input is retried on the next larger
+#   model, and the escalation is counted. A request that already ran on the largest model is not
+#   retried: the parse error is raised.
+#
+# The benchmark runs a mixed workload modeled on scripts 02-09 three ways: always the large model,
+# always the small model, and routed. It reports mean/p95 latency, token cost, parse failures and
+# the escalation rate. Routing lowers dollar cost, not token count: each escalation re-sends the
+# whole prompt (for the Pydantic prompts, mostly format instructions) to the large model, so the
+# routed run uses more tokens per item than "large only". Tokens from first attempts and from
+# escalation retries are printed on separate lines; with --fake the first attempts are on par with
+# "large only" and the retries add the rest, while the cost per item is still about half.
+#
+# Usage:
+#   python 27-langchain-model-router.py           # uses ChatGroq (requires GROQ_API_KEY)
+#   python 27-langchain-model-router.py --fake    # no API key required
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import statistics
+import time
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import CommaSeparatedListOutputParser, PydanticOutputParser, StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Model tiers, cheapest first ---
+# USD per million input/output tokens from Groq's price list at the time of writing
+TIERS = [
+    {"name": "small", "model": "llama-3.1-8b-instant", "input_cost": 0.05, "output_cost": 0.08, "threshold": 0},
+    {"name": "large", "model": "llama-3.3-70b-versatile", "input_cost": 0.59, "output_cost": 0.79, "threshold": 2},
+]
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English text
+    return len(text) // 4 + 1
+
+
+# --- Step 2: Cheap difficulty classifier ---
+HARD_TASK = re.compile(
+    r"\b(explain why|step by step|analy[sz]e|compare|contrast|prove|reason about|trade-?offs?|design|"
+    r"write (?:a|an) (?:essay|story|program|function|script)|code|debug|translate)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_prompt(messages, tools=None):
+    """Return (difficulty score, reasons) for a list of messages and optional bound tools."""
+    text = "\n".join(str(m.content) for m in messages)
+    score, reasons = 0, []
+    tokens = estimate_tokens(text)
+    if tokens > 1500:
+        score, reasons = score + 2, reasons + ["very long prompt"]
+    elif tokens > 400:
+        score, reasons = score + 1, reasons + ["long prompt"]
+    if HARD_TASK.search(text):
+        score, reasons = score + 2, reasons + ["hard task wording"]
+    if text.count("?") > 1:
+        score, reasons = score + 1, reasons + ["several questions"]
+    schema = ""
+    if "Here is the output schema:" in text:
+        schema = text.rsplit("```", 2)[1]
+    elif tools:
+        schema = json.dumps(tools)
+    if schema:
+        score, reasons = score + 1, reasons + ["structured output"]
+        if "$defs" in schema or schema.count('"properties"') > 1:
+            score, reasons = score + 1, reasons + ["nested schema"]
+    return score, reasons
+
+
+# --- Step 3: Routing chat model ---
+class NoLargerTier(Exception):
+    """An escalated request was already routed to the largest tier."""
+
+
+class RoutingChatModel(BaseChatModel):
+    models: list      # one chat model per entry in `tiers`
+    tiers: list = TIERS
+    stats: dict = Field(
+        default_factory=lambda: {"routed": 0, "escalations": 0, "escalation_tokens": 0, "escalation_cost": 0.0, "routes": {}}
+    )
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        # Tools are bound per call on whichever model the request is routed to
+        return self.bind(tools=list(tools), tool_choice=tool_choice, **kwargs)
+
+    def route(self, messages, tools=None, escalate=False):
+        score, _ = classify_prompt(messages, tools)
+        index = max(i for i, tier in enumerate(self.tiers) if score >= tier["threshold"])
+        if escalate:
+            if index == len(self.tiers) - 1:
+                raise NoLargerTier(f"{self.tiers[index]['name']} is the largest tier")
+            index += 1
+        return index
+
+    def _record(self, index, latency, message, escalate):
+        tier = self.tiers[index]
+        usage = getattr(message, "usage_metadata", None) or {"input_tokens": 0, "output_tokens": 0}
+        cost = (usage["input_tokens"] * tier["input_cost"] + usage["output_tokens"] * tier["output_cost"]) / 1e6
+        route = self.stats["routes"].setdefault(
+            tier["name"], {"calls": 0, "latency": 0.0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+        )
+        route["calls"] += 1
+        route["latency"] += latency
+        route["input_tokens"] += usage["input_tokens"]
+        route["output_tokens"] += usage["output_tokens"]
+        route["cost"] += cost
+        self.stats["escalations" if escalate else "routed"] += 1
+        if escalate:
+            # A retry re-sends the whole prompt, so its tokens are reported apart from first attempts
+            self.stats["escalation_tokens"] += usage["input_tokens"] + usage["output_tokens"]
+            self.stats["escalation_cost"] += cost
+
+    def _target(self, messages, tools, tool_choice, escalate):
+        index = self.route(messages, tools, escalate)
+        model = self.models[index]
+        if tools:
+            model = model.bind_tools(tools, tool_choice=tool_choice)
+        return index, model
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, tool_choice=None, escalate=False, **kwargs):
+        index, model = self._target(messages, tools, tool_choice, escalate)
+        start = time.perf_counter()
+        message = model.invoke(messages, stop=stop, **kwargs)
+        self._record(index, time.perf_counter() - start, message, escalate)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, tool_choice=None, escalate=False, **kwargs):
+        index, model = self._target(messages, tools, tool_choice, escalate)
+        start = time.perf_counter()
+        message = await model.ainvoke(messages, stop=stop, **kwargs)
+        self._record(index, time.perf_counter() - start, message, escalate)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def escalation_rate(self):
+        return self.stats["escalations"] / self.stats["routed"] if self.stats["routed"] else 0.0
+
+
+def with_escalation(prompt, router, parser):
+    """`prompt | router | parser`, retried one tier up when the output does not parse."""
+    escalated = prompt | router.bind(escalate=True) | parser
+    # When the first attempt already ran on the largest tier the router raises NoLargerTier
+    # without calling a model, and the fallback re-raises the original parse error
+    return (prompt | router | parser).with_fallbacks([escalated], exceptions_to_handle=(OutputParserException, NoLargerTier))
+
+
+# --- Step 4: Deterministic fake models for benchmarking ---
+# The small model is fast and cheap but, for structured prompts, returns truncated JSON on about
+# one request in four (decided by a hash of the prompt, so runs are repeatable).
+class FakeTierLLM(BaseChatModel):
+    model: str
+    base_latency: float
+    per_token_latency: float
+    json_failure_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return f"fake-{self.model}"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        prompt = str(messages[-1].content)
+        digest = hashlib.sha256(f"{self.model}\0{prompt}".encode()).digest()
+        rng = random.Random(digest)
+        if "Here is the output schema:" in prompt:
+            text = json.dumps({"name": "Dan Brown", "number": 3, "books": ["Inferno", "Origin", "Deception Point"]})
+            if rng.random() < self.json_failure_rate:
+                text = text[: len(text) // 2]
+        elif "comma separated" in prompt:
+            text = "Lindt, Ghirardelli, Godiva, Hershey's"
+        elif "'Positive', 'Neutral', or 'Negative'" in prompt:
+            text = rng.choice(["Positive", "Neutral", "Negative"])
+        else:
+            text = " ".join(rng.choice(prompt.split()) for _ in range(rng.randint(40, 120)))
+        message = AIMessage(content=text)
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        time.sleep(self.base_latency + self.per_token_latency * output_tokens)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# --- Step 5: Mixed workload modeled on scripts 02-09 ---
+class Author(BaseModel):
+    name: str = Field(description="The name of the author")
+    number: int = Field(description="The number of books written by the author")
+    books: list[str] = Field(description="The list of books they wrote")
+
+
+def build_workload(llm):
+    text = PromptTemplate.from_template("{question}")
+    list_parser = CommaSeparatedListOutputParser()
+    author_parser = PydanticOutputParser(pydantic_object=Author)
+    list_prompt = PromptTemplate.from_template(
+        "Answer the question.\n{format_instructions}\n{question}",
+        partial_variables={"format_instructions": list_parser.get_format_instructions()},
+    )
+    author_prompt = PromptTemplate.from_template(
+        "Answer the question.\n{format_instructions}\n{question}",
+        partial_variables={"format_instructions": author_parser.get_format_instructions()},
+    )
+    sentiment_prompt = PromptTemplate.from_template(
+        "Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{question}"
+    )
+    chains = {
+        "chat": with_escalation(text, llm, StrOutputParser()),
+        "list": with_escalation(list_prompt, llm, list_parser),
+        "pydantic": with_escalation(author_prompt, llm, author_parser),
+        "sentiment": with_escalation(sentiment_prompt, llm, StrOutputParser()),
+    }
+    items = [
+        ("chat", "What is the tallest building in the world?"),
+        ("chat", "What is the square of 2?"),
+        ("sentiment", "The customer service was fantastic. The representative was friendly and knowledgeable."),
+        ("sentiment", "The delivery was late, and the product was damaged when it arrived."),
+        ("list", "List 4 chocolate brands"),
+        ("pydantic", "Generate the books written by Dan Brown"),
+        ("pydantic", "Generate the books written by Agatha Christie"),
+        ("chat", "Explain why the sky is blue, step by step, and compare it with why sunsets are red."),
+        ("chat", "Write a function that parses ISO dates in Python and explain the trade-offs of each approach."),
+        ("chat", "Create an invitation email to John for a product launch at the Grand Ballroom on January 15, 2024."),
+    ]
+    return chains, items
+
+
+def run(name, llm, items, chains, tiers):
+    latencies, failures = [], 0
+    for kind, question in items:
+        start = time.perf_counter()
+        try:
+            chains[kind].invoke({"question": question})
+        except OutputParserException:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    cost = sum(route["cost"] for route in llm.stats["routes"].values())
+    tokens = sum(route["input_tokens"] + route["output_tokens"] for route in llm.stats["routes"].values())
+    retry_tokens, retry_cost = llm.stats["escalation_tokens"], llm.stats["escalation_cost"]
+    p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{name:<12} mean {statistics.fmean(latencies) * 1000:6.0f} ms  p95 {p95 * 1000:6.0f} ms  "
+        f"tokens/item {tokens / len(items):5.0f}  cost ${cost / len(items) * 1000:.3f}/1k items  "
+        f"parse failures {failures}  escalation rate {llm.escalation_rate():.0%}"
+    )
+    print(
+        f"  first attempts {(tokens - retry_tokens) / len(items):5.0f} tokens/item  "
+        f"escalation retries {retry_tokens / len(items):5.0f} tokens/item (${retry_cost / len(items) * 1000:.3f}/1k items)"
+    )
+    for tier in tiers:
+        route = llm.stats["routes"].get(tier["name"])
+        if route:
+            print(f"  {tier['name']:<6} calls {route['calls']:4d}  mean latency {route['latency'] / route['calls'] * 1000:5.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route prompts to the cheapest adequate model")
+    parser.add_argument("--fake", action="store_true", help="Use deterministic fake models (no API key required)")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to run through the workload")
+    args = parser.parse_args()
+
+    if args.fake:
+        models = [
+            FakeTierLLM(model=TIERS[0]["model"], base_latency=0.02, per_token_latency=0.0004, json_failure_rate=0.25),
+            FakeTierLLM(model=TIERS[1]["model"], base_latency=0.08, per_token_latency=0.002),
+        ]
+    else:
+        from langchain_groq import ChatGroq
+        models = [ChatGroq(model=tier["model"]) for tier in TIERS]
+
+    for name, indexes in [("large only", [1]), ("small only", [0]), ("routed", [0, 1])]:
+        # With a single tier every request goes to it, and there is no larger tier to escalate to
+        tiers = [TIERS[i] for i in indexes]
+        tiers[0] = {**tiers[0], "threshold": 0}
+        llm = RoutingChatModel(models=[models[i] for i in indexes], tiers=tiers)
+        chains, items = build_workload(llm)
+        run(name, llm, items * args.repeat, chains, tiers)
+
+    print("\nRouting decisions:")
+    for kind, question in items:
+        prompt = chains[kind].runnable.first.invoke({"question": question}).to_messages()
+        score, reasons = classify_prompt(prompt)
+        tier = TIERS[max(i for i, t in enumerate(TIERS) if score >= t["threshold"])]["name"]
+        print(f"- {tier:<6} score {score}  {question[:60]:<60} {', '.join(reasons)}")
+
+
+if __name__ == "__main__":
+    main()
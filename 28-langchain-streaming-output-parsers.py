@@ -0,0 +1,489 @@
+# Example: Incremental streaming output parsers for list, datetime and Pydantic outputs
+# Scripts 05, 06 and 07 wait for the whole `llm.invoke` response before calling
+# `DatetimeOutputParser.parse`, `CommaSeparatedListOutputParser.parse` or
+# `PydanticOutputParser.parse`. The parsers in this script consume `llm.stream` chunks instead:
+#
+# - StreamingListParser yields each list item as soon as the comma after it arrives.
+# - StreamingDatetimeParser checks every character against the expected format
+#   ("%Y-%m-%dT%H:%M:%S.%fZ" by default) and yields the datetime as soon as it is complete.
+# - StreamingPydanticParser scans the JSON object once, validates each field as soon as its value
+#   is complete and yields partial objects (`model_construct` with the completed fields), then the
+#   fully validated object.
+#
+# Each parser looks at every character once, and raises `OutputParserException` as soon as the
+# stream is clearly malformed (prose instead of a list, a value of the wrong JSON type, a date
+# that doesn't match the format), so a retry can start before the rest of the answer arrives.
+#
+# The benchmark compares time to first item, total time, time to error on malformed answers and
+# the parser CPU cost per response with the parse-at-end approach of scripts 05-07 and with
+# LangChain's own streaming parsers.
+#
+# Usage:
+#   python 28-langchain-streaming-output-parsers.py           # uses ChatGroq (requires GROQ_API_KEY)
+#   python 28-langchain-streaming-output-parsers.py --fake    # no API key required
+
+import argparse
+import datetime
+import json
+import re
+import time
+from typing import Any
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.output_parsers import CommaSeparatedListOutputParser, PydanticOutputParser, StrOutputParser
+from langchain_core.output_parsers.transform import BaseTransformOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, ValidationError
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: A shared base for incremental parsers ---
+# Subclasses implement `_start()`, returning a per-stream state object with `feed(text)` and
+# `close()`; both return the outputs that became available. `parse()` runs the same state machine
+# over a complete text, so streaming and non-streaming results always agree.
+class IncrementalOutputParser(BaseTransformOutputParser):
+    def _start(self):
+        raise NotImplementedError
+
+    def _outputs(self, text):
+        state = self._start()
+        return state.feed(text) + state.close()
+
+    @staticmethod
+    def _text(chunk):
+        if isinstance(chunk, BaseMessage):
+            return chunk.content if isinstance(chunk.content, str) else ""
+        return chunk
+
+    def _transform(self, input):
+        state = self._start()
+        for chunk in input:
+            yield from state.feed(self._text(chunk))
+        yield from state.close()
+
+    async def _atransform(self, input):
+        state = self._start()
+        async for chunk in input:
+            for output in state.feed(self._text(chunk)):
+                yield output
+        for output in state.close():
+            yield output
+
+
+# --- Step 2: Comma separated lists (script 06) ---
+# A word ending a sentence followed by the next one ("Sure! Here"), but not "Mr. Hyde" or "Vol. 2"
+SENTENCE_BREAK = re.compile(r"[a-z]{3,}[.!?]\s+[A-Z]")
+
+
+class _ListState:
+    def __init__(self, max_item_chars):
+        self.max_item_chars = max_item_chars
+        self.item = ""
+
+    def _check(self, item):
+        stripped = item.strip()
+        # A list item never spans lines, holds two sentences or runs on; prose means the format was ignored
+        if "\n" in stripped or len(stripped) > self.max_item_chars or SENTENCE_BREAK.search(stripped):
+            raise OutputParserException(f"Expected a comma separated list, got {stripped[:40]!r}...")
+        return stripped
+
+    def feed(self, text):
+        *complete, self.item = (self.item + text).split(",")
+        items = [[self._check(item)] for item in complete]
+        self._check(self.item)
+        return items
+
+    def close(self):
+        return [[self.item.strip()]] if self.item.strip() else []
+
+
+class StreamingListParser(IncrementalOutputParser):
+    """Yields `[item]` for each item of a comma separated list, like `CommaSeparatedListOutputParser.stream`."""
+
+    # Long enough for book and product titles; prose is caught by the sentence check first
+    max_item_chars: int = 200
+
+    def _start(self):
+        return _ListState(self.max_item_chars)
+
+    def parse(self, text):
+        return [item for [item] in self._outputs(text)]
+
+    def get_format_instructions(self):
+        return CommaSeparatedListOutputParser().get_format_instructions()
+
+
+# --- Step 3: Datetimes (script 05) ---
+# Each strptime directive maps to a fixed number of digits; anything else must match literally.
+DIRECTIVE_DIGITS = {"%Y": 4, "%m": 2, "%d": 2, "%H": 2, "%M": 2, "%S": 2, "%f": 6}
+
+
+def compile_datetime_format(fmt):
+    """Return one check per output character: a digit (True) or a literal character."""
+    checks = []
+    for token in re.findall(r"%.|[^%]", fmt):
+        if token.startswith("%"):
+            if token not in DIRECTIVE_DIGITS:
+                return None  # unsupported directive: only validate at the end
+            checks.extend([True] * DIRECTIVE_DIGITS[token])
+        else:
+            checks.append(token)
+    return checks
+
+
+class _DatetimeState:
+    def __init__(self, fmt, checks):
+        self.fmt = fmt
+        self.checks = checks
+        self.text = ""
+        self.done = False
+
+    def feed(self, text):
+        if self.done:
+            return []
+        if not self.text:
+            text = text.lstrip()
+        start = len(self.text)
+        self.text += text
+        if self.checks is None:
+            return []
+        for position in range(start, min(len(self.text), len(self.checks))):
+            char, check = self.text[position], self.checks[position]
+            if (char.isdigit() if check is True else char == check) is False:
+                raise OutputParserException(f"{self.text[:position + 1]!r} does not match the format {self.fmt!r}")
+        if len(self.text) >= len(self.checks):
+            self.done = True
+            return [self._parse(self.text[: len(self.checks)])]
+        return []
+
+    def _parse(self, text):
+        try:
+            return datetime.datetime.strptime(text.strip(), self.fmt)
+        except ValueError as e:
+            raise OutputParserException(f"Could not parse datetime string: {text!r}") from e
+
+    def close(self):
+        return [] if self.done else [self._parse(self.text)]
+
+
+class StreamingDatetimeParser(IncrementalOutputParser):
+    """Yields one `datetime` as soon as the characters for the format have arrived."""
+
+    format: str = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+    def _start(self):
+        return _DatetimeState(self.format, compile_datetime_format(self.format))
+
+    def parse(self, text):
+        return self._outputs(text)[0]
+
+    def get_format_instructions(self):
+        examples = ["2023-07-04T14:30:00.000000Z", "1999-12-31T23:59:59.999999Z", "2025-01-01T00:00:00.000000Z"]
+        return (
+            f"Write a datetime string that matches the following pattern: '{self.format}'.\n\n"
+            f"Examples: {', '.join(examples)}\n\nReturn ONLY this string, no other words!"
+        )
+
+
+# --- Step 4: Pydantic objects (script 07) ---
+# The first character of a JSON value must match the field's JSON schema type.
+FIRST_CHARS = {"string": '"', "integer": "-0123456789", "number": "-0123456789", "boolean": "tf", "array": "[", "object": "{"}
+
+
+class _ObjectState:
+    def __init__(self, parser):
+        self.parser = parser
+        self.buffer = ""
+        self.position = 0
+        self.stage = "start"  # start -> object -> done
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member_start = 0
+        self.key = None
+        self.fields = {}
+
+    def _fail(self, message):
+        raise OutputParserException(f"{message}; got {self.buffer[:60]!r}")
+
+    def _member(self, end):
+        member = self.buffer[self.member_start:end].strip()
+        self.member_start = end + 1
+        if not member:
+            return []
+        try:
+            (key, value), = json.loads("{" + member + "}").items()
+        except (ValueError, TypeError):
+            self._fail(f"Invalid JSON member {member[:40]!r}")
+        adapter = self.parser._adapters().get(key)
+        if adapter is not None:
+            try:
+                self.fields[key] = adapter.validate_python(value)
+            except ValidationError as e:
+                raise OutputParserException(f"Invalid value for field {key!r}: {e.errors()[0]['msg']}") from e
+        return [self.parser.pydantic_object.model_construct(**self.fields)]
+
+    def _check_value_start(self, position):
+        # Called at the first non-space character after "key":
+        types = self.parser._first_chars().get(self.key)
+        if types and self.buffer[position] not in types:
+            self._fail(f"Field {self.key!r} should start with one of {types!r}")
+
+    def feed(self, text):
+        outputs = []
+        self.buffer += text
+        buffer = self.buffer
+        while self.position < len(buffer):
+            i, char = self.position, buffer[self.position]
+            self.position += 1
+            if self.stage == "start":
+                if char.isspace():
+                    continue
+                if buffer.startswith("```", i) or "```".startswith(buffer[i:]):
+                    # Skip a markdown code fence such as ```json
+                    newline = buffer.find("\n", i)
+                    if newline == -1:
+                        self.position = i
+                        break
+                    self.position = newline + 1
+                elif char == "{":
+                    self.stage, self.depth, self.member_start = "object", 1, i + 1
+                else:
+                    self._fail("Expected a JSON object")
+            elif self.stage == "object":
+                if self.in_string:
+                    if self.escape:
+                        self.escape = False
+                    elif char == "\\":
+                        self.escape = True
+                    elif char == '"':
+                        self.in_string = False
+                    continue
+                if self.key is not None and not char.isspace():
+                    self._check_value_start(i)
+                    self.key = None
+                if char == '"':
+                    self.in_string = True
+                elif char in "[{":
+                    self.depth += 1
+                elif char in "]}":
+                    self.depth -= 1
+                    if self.depth == 0:
+                        # The last member's partial object is superseded by the validated one,
+                        # which is produced even for "{}" so missing required fields still raise
+                        self._member(i)
+                        outputs.append(self._final())
+                        self.stage = "done"
+                elif char == ":" and self.depth == 1:
+                    try:
+                        self.key = json.loads(buffer[self.member_start:i])
+                    except ValueError:
+                        self._fail("Invalid JSON key")
+                elif char == "," and self.depth == 1:
+                    outputs += self._member(i)
+        return outputs
+
+    def _final(self):
+        try:
+            return self.parser.pydantic_object.model_validate(self.fields)
+        except ValidationError as e:
+            raise OutputParserException(f"Failed to validate {self.parser.pydantic_object.__name__}: {e}") from e
+
+    def close(self):
+        if self.stage != "done":
+            self._fail("Incomplete JSON object")
+        return []
+
+
+class StreamingPydanticParser(IncrementalOutputParser):
+    """Yields partial objects as fields complete, then the validated object."""
+
+    pydantic_object: Any
+
+    _field_adapters: dict | None = PrivateAttr(default=None)
+    _field_first_chars: dict | None = PrivateAttr(default=None)
+
+    def _adapters(self):
+        # Built once per parser: one TypeAdapter per field validates values as they complete
+        if self._field_adapters is None:
+            self._field_adapters = {
+                name: TypeAdapter(field.annotation) for name, field in self.pydantic_object.model_fields.items()
+            }
+        return self._field_adapters
+
+    def _first_chars(self):
+        if self._field_first_chars is None:
+            properties = self.pydantic_object.model_json_schema().get("properties", {})
+            self._field_first_chars = {
+                name: FIRST_CHARS[schema["type"]] for name, schema in properties.items() if schema.get("type") in FIRST_CHARS
+            }
+        return self._field_first_chars
+
+    def _start(self):
+        return _ObjectState(self)
+
+    def parse(self, text):
+        return self._outputs(text)[-1]
+
+    def get_format_instructions(self):
+        return PydanticOutputParser(pydantic_object=self.pydantic_object).get_format_instructions()
+
+
+# --- Step 5: Deterministic fake streaming model ---
+# Streams a canned answer for each script's question a few characters (about one token) at a
+# time. With `malformed=True` it ignores the format instructions and answers in prose.
+class Author(BaseModel):
+    name: str = Field(description="The name of the author")
+    number: int = Field(description="The number of books written by the author")
+    books: list[str] = Field(description="The list of books they wrote")
+
+
+ANSWERS = {
+    "iPhone": "2007-06-29T00:00:00.000000Z",
+    "chocolate": "Lindt, Ghirardelli, Godiva, Hershey's, Ferrero Rocher, Toblerone, Cadbury, Milka",
+    "Dan Brown": json.dumps({
+        "name": "Dan Brown",
+        "number": 8,
+        "books": ["Digital Fortress", "Deception Point", "Angels & Demons", "The Da Vinci Code",
+                  "The Lost Symbol", "Inferno", "Origin", "The Secret of Secrets"],
+    }, indent=2),
+}
+
+
+class FakeStreamingLLM(BaseChatModel):
+    ttft: float = 0.15
+    per_token_latency: float = 0.01
+    malformed: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _answer(self, messages):
+        prompt = messages[-1].content
+        if self.malformed:
+            return ("Sure! Here is the answer you asked for. " + prompt.splitlines()[-1] + " is a great question, "
+                    "and the short answer is that it depends on a few things.")
+        return next(text for key, text in ANSWERS.items() if key in prompt)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.ttft)
+        for token in re.findall(r".{1,4}", self._answer(messages), re.DOTALL):
+            time.sleep(self.per_token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = "".join(chunk.message.content for chunk in self._stream(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+# --- Step 6: Benchmark ---
+def datetime_parser_at_end():
+    # Script 05's parser lives in the `langchain` package; fall back to the strptime call it makes
+    try:
+        from langchain.output_parsers import DatetimeOutputParser
+        return DatetimeOutputParser()
+    except ImportError:
+        return StrOutputParser() | RunnableLambda(StreamingDatetimeParser().parse)
+
+
+def time_stream(run):
+    """Return (time to first output, total time, error) for a callable that yields outputs."""
+    start = time.perf_counter()
+    first = None
+    try:
+        for _ in run():
+            if first is None:
+                first = time.perf_counter() - start
+    except OutputParserException as e:
+        return None, time.perf_counter() - start, e
+    return first, time.perf_counter() - start, None
+
+
+def parse_cost(run, repeat=2000):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental streaming output parsers")
+    parser.add_argument("--fake", action="store_true", help="Use a deterministic fake model (no API key required)")
+    args = parser.parse_args()
+
+    if args.fake:
+        llm, bad_llm = FakeStreamingLLM(), FakeStreamingLLM(malformed=True)
+    else:
+        from langchain_groq import ChatGroq
+        llm = bad_llm = ChatGroq(model="llama3-8b-8192")
+
+    author_parser = StreamingPydanticParser(pydantic_object=Author)
+    # (name, question, incremental parser, LangChain streaming parser, parse-at-end parser)
+    cases = [
+        ("datetime (05)", "When was the iPhone released", StreamingDatetimeParser(), None, datetime_parser_at_end()),
+        ("list (06)", "List 8 chocolate brands", StreamingListParser(), CommaSeparatedListOutputParser(),
+         CommaSeparatedListOutputParser()),
+        ("pydantic (07)", "Generate the books written by Dan Brown", author_parser,
+         PydanticOutputParser(pydantic_object=Author), PydanticOutputParser(pydantic_object=Author)),
+    ]
+
+    print(f"{'parser':<15} {'mode':<20} {'first item':>11} {'total':>9} {'parse cost':>11}")
+    for name, question, streaming, builtin, parse_at_end in cases:
+        prompt = PromptTemplate.from_template(
+            "Answer the question.\n{format_instructions}\n{question}",
+            partial_variables={"format_instructions": streaming.get_format_instructions()},
+        )
+        prompt_value = prompt.invoke({"question": question})
+        text = llm.invoke(prompt_value).content
+        chunks = [AIMessageChunk(content=token) for token in re.findall(r".{1,4}", text, re.DOTALL)]
+
+        # Parse cost goes through the Runnable interface in every mode, as it would inside a chain
+        modes = [("parse at end", lambda: [parse_at_end.invoke(llm.invoke(prompt_value))],
+                  lambda: parse_at_end.invoke(AIMessage(content=text)))]
+        if builtin is not None:
+            modes.append(("langchain stream", lambda: (prompt | llm | builtin).stream({"question": question}),
+                          lambda: list(builtin.transform(iter(chunks)))))
+        modes.append(("incremental stream", lambda: (prompt | llm | streaming).stream({"question": question}),
+                      lambda: list(streaming.transform(iter(chunks)))))
+
+        for mode, run, cost in modes:
+            first, total, error = time_stream(run)
+            if first is None:
+                # A live model can still break the format on a well-formed run
+                print(f"{name:<15} {mode:<20} {'-':>11} {total * 1000:7.0f}ms  {type(error).__name__ if error else 'no output'}")
+                continue
+            try:
+                cost_us = f"{parse_cost(cost):9.0f}us"
+            except OutputParserException as e:
+                cost_us = f"  {type(e).__name__}"
+            print(f"{name:<15} {mode:<20} {first * 1000:9.0f}ms {total * 1000:7.0f}ms {cost_us}")
+
+        # Malformed answer: how long until the parser gives up
+        for mode, run in [
+            ("parse at end", lambda: [parse_at_end.invoke(bad_llm.invoke(prompt_value))]),
+            ("incremental stream", lambda: (prompt | bad_llm | streaming).stream({"question": question})),
+        ]:
+            _, total, error = time_stream(run)
+            print(f"{name:<15} {'malformed, ' + mode:<32} error after {total * 1000:5.0f}ms"
+                  f"{'' if error else ' (no error)'}")
+        print()
+
+    print("Partial objects from the incremental Pydantic parser:")
+    prompt = PromptTemplate.from_template(
+        "Answer the question.\n{format_instructions}\n{question}",
+        partial_variables={"format_instructions": author_parser.get_format_instructions()},
+    )
+    for partial in (prompt | llm | author_parser).stream({"question": "Generate the books written by Dan Brown"}):
+        print(f"- fields so far: {sorted(partial.model_fields_set)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# Example: A parallel tool execution engine for LangGraph
+# Script 10 runs `calculate_discount.invoke(args)` by hand, one tool call at a time, and script 14
+# hands the tool calls to `ToolNode([multiply])`. When the model asks for several tools in one
+# message they are independent, so this script runs them concurrently with more control:
+#
+# - async tools run on the event loop;
+# - sync tools run in a thread pool, and tools marked CPU-bound in a process pool (a pure-Python
+#   loop holds the GIL, so threads would not run it in parallel);
+# - every tool can have its own timeout; a timed-out or failing call becomes an error
+#   `ToolMessage`, as `ToolNode` does, so the graph keeps going;
+# - calls to tools marked pure are memoized by (tool, arguments);
+# - latency is recorded per tool in a log-scale histogram.
+#
+# `ParallelToolExecutor.as_node()` is a drop-in replacement for `ToolNode` in a graph, and works
+# with `tools_condition`. The benchmark sends one message with nine tool calls through the
+# sequential loop of script 10, `ToolNode`, and the engine (cold, then with memoized results).
+#
+# Usage:
+#   python 30-langgraph-parallel-tool-executor.py          # no API key required
+#   python 30-langgraph-parallel-tool-executor.py --rounds 10
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.prebuilt import ToolNode, tools_condition
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Per-tool latency histograms ---
+class LatencyHistogram:
+    """Counts latencies in power-of-two millisecond buckets (<1 ms, 1-2 ms, 2-4 ms, ...)."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        bucket = max(0, math.ceil(math.log2(seconds * 1000))) if seconds * 1000 > 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+
+    def lines(self, width=30):
+        peak = max(self.buckets.values())
+        for bucket in sorted(self.buckets):
+            label = "<1 ms" if bucket == 0 else f"{2 ** (bucket - 1)}-{2 ** bucket} ms"
+            yield f"{label:>14} {'#' * max(1, round(self.buckets[bucket] / peak * width))} {self.buckets[bucket]}"
+
+
+# --- Step 2: The engine ---
+def _call_function(func, kwargs):
+    # Runs in a worker process; module-level so it can be pickled
+    return func(**kwargs)
+
+
+class ParallelToolExecutor:
+    def __init__(self, tools, timeouts=None, pure=(), cpu_bound=(), max_threads=16, max_processes=None):
+        self.tools = {t.name: t for t in tools}
+        self.timeouts = timeouts or {}
+        self.pure = set(pure)
+        self.cpu_bound = set(cpu_bound)
+        self.thread_pool = ThreadPoolExecutor(max_workers=max_threads)
+        self.process_pool = ProcessPoolExecutor(max_workers=max_processes) if self.cpu_bound else None
+        self.cache = {}
+        self.histograms = {name: LatencyHistogram() for name in self.tools}
+        self.stats = {"calls": 0, "cache_hits": 0, "timeouts": 0, "errors": 0}
+
+    def close(self):
+        self.thread_pool.shutdown()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+
+    async def _run(self, tool_, args):
+        if tool_.coroutine is not None:
+            return await tool_.ainvoke(args)
+        loop = asyncio.get_running_loop()
+        if tool_.name in self.cpu_bound:
+            # Validate in this process, then ship only the plain function and arguments
+            validated = tool_.args_schema.model_validate(args).model_dump()
+            return await loop.run_in_executor(self.process_pool, _call_function, tool_.func, validated)
+        return await loop.run_in_executor(self.thread_pool, tool_.invoke, args)
+
+    async def _execute_one(self, call):
+        name, args = call["name"], call["args"]
+        self.stats["calls"] += 1
+        key = None
+        if name in self.pure:
+            key = hashlib.sha256(json.dumps([name, args], sort_keys=True, default=str).encode()).hexdigest()
+            if key in self.cache:
+                self.stats["cache_hits"] += 1
+                return ToolMessage(content=self.cache[key], name=name, tool_call_id=call["id"])
+        if name not in self.tools:
+            self.stats["errors"] += 1
+            return ToolMessage(content=f"Error: {name} is not a valid tool.", name=name, tool_call_id=call["id"], status="error")
+
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._run(self.tools[name], args), self.timeouts.get(name))
+        except asyncio.TimeoutError:
+            # A thread or process that is already running can't be stopped; its result is dropped
+            self.stats["timeouts"] += 1
+            content, status = f"Error: {name} timed out after {self.timeouts[name]}s", "error"
+        except Exception as e:
+            self.stats["errors"] += 1
+            content, status = f"Error: {e!r}\n Please fix your mistakes.", "error"
+        else:
+            content, status = str(result), "success"
+            if key is not None:
+                self.cache[key] = content
+        self.histograms[name].record(time.perf_counter() - start)
+        return ToolMessage(content=content, name=name, tool_call_id=call["id"], status=status)
+
+    async def aexecute(self, tool_calls):
+        return list(await asyncio.gather(*(self._execute_one(call) for call in tool_calls)))
+
+    def execute(self, tool_calls):
+        return asyncio.run(self.aexecute(tool_calls))
+
+    def as_node(self):
+        """A graph node that runs the tool calls of the last AI message, like `ToolNode`."""
+        def node(state):
+            return {"messages": self.execute(state["messages"][-1].tool_calls)}
+
+        async def anode(state):
+            return {"messages": await self.aexecute(state["messages"][-1].tool_calls)}
+
+        return RunnableLambda(node, afunc=anode, name="tools")
+
+    def report(self):
+        for name, histogram in self.histograms.items():
+            if histogram.count:
+                print(f"{name}: {histogram.count} calls, mean {histogram.total / histogram.count * 1000:.1f} ms")
+                for line in histogram.lines():
+                    print(line)
+
+
+# --- Step 3: Tools: the ones from scripts 10 and 14, plus slow I/O and CPU-bound ones ---
+@tool
+def multiply(a: int, b: int) -> int:
+    """Multiplies two integers."""
+    return a * b
+
+
+@tool
+def calculate_discount(price: float, discount_percentage: float) -> float:
+    """
+    Calculates the final price after applying a discount.
+
+    Args:
+        price (float): The original price of the item.
+        discount_percentage (float): The discount percentage (e.g., 20 for 20%).
+
+    Returns:
+        float: The final price after the discount is applied.
+    """
+    if not (0 <= discount_percentage <= 100):
+        raise ValueError("Discount percentage must be between 0 and 100")
+    return price - price * (discount_percentage / 100)
+
+
+@tool
+def fetch_price(item: str) -> float:
+    """Looks up the list price of an item (a blocking HTTP call in real life)."""
+    time.sleep(0.2)
+    return float(len(item) * 10)
+
+
+@tool
+async def exchange_rate(currency: str) -> float:
+    """Returns the USD exchange rate for a currency (an async HTTP call in real life)."""
+    await asyncio.sleep(0.2)
+    return {"EUR": 0.92, "GBP": 0.79, "INR": 83.1}.get(currency, 1.0)
+
+
+def compute_checksum(text: str, rounds: int = 2_000_000) -> int:
+    """Computes a slow checksum of a text (CPU-bound)."""
+    value = 0
+    for i in range(rounds):
+        value = (value * 31 + ord(text[i % len(text)])) % 1_000_000_007
+    return value
+
+
+# Registered under another name so worker processes can still import the plain function
+checksum = tool("checksum")(compute_checksum)
+
+
+@tool
+def inventory_report(warehouse: str) -> str:
+    """Builds a full inventory report for a warehouse (slow)."""
+    time.sleep(2.0)
+    return f"{warehouse}: 1,204 items"
+
+
+TOOLS = [multiply, calculate_discount, fetch_price, exchange_rate, checksum, inventory_report]
+
+# One model turn asking for nine tools at once
+TOOL_CALLS = [
+    {"name": "fetch_price", "args": {"item": "laptop"}, "id": "call_1"},
+    {"name": "fetch_price", "args": {"item": "monitor"}, "id": "call_2"},
+    {"name": "exchange_rate", "args": {"currency": "EUR"}, "id": "call_3"},
+    {"name": "exchange_rate", "args": {"currency": "INR"}, "id": "call_4"},
+    {"name": "checksum", "args": {"text": "order-1234"}, "id": "call_5"},
+    {"name": "checksum", "args": {"text": "order-5678"}, "id": "call_6"},
+    {"name": "multiply", "args": {"a": 3, "b": 2}, "id": "call_7"},
+    {"name": "calculate_discount", "args": {"price": 100, "discount_percentage": 20}, "id": "call_8"},
+    {"name": "inventory_report", "args": {"warehouse": "north"}, "id": "call_9"},
+]
+
+
+# --- Step 4: Graphs shaped like script 14, with a fake model that returns the tool calls ---
+def fake_tool_calling_llm(state):
+    return {"messages": [AIMessage(content="", tool_calls=TOOL_CALLS)]}
+
+
+def build_graph(tools_node):
+    builder = StateGraph(MessagesState)
+    builder.add_node("tool_calling_llm", fake_tool_calling_llm)
+    builder.add_node("tools", tools_node)
+    builder.add_edge(START, "tool_calling_llm")
+    builder.add_conditional_edges("tool_calling_llm", tools_condition)
+    builder.add_edge("tools", END)
+    return builder.compile()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel tool execution for LangGraph")
+    parser.add_argument("--rounds", type=int, default=3, help="Messages to run through each mode")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Timeout for inventory_report (seconds)")
+    args = parser.parse_args()
+
+    messages = {"messages": [HumanMessage(content="Price my order")]}
+    executor = ParallelToolExecutor(
+        TOOLS,
+        timeouts={"inventory_report": args.timeout},
+        pure={"multiply", "calculate_discount", "checksum", "exchange_rate"},
+        cpu_bound={"checksum"},
+    )
+    tools = {t.name: t for t in TOOLS}
+
+    async def sequential(messages):
+        # Script 10: run each tool call by hand, one after another
+        for call in TOOL_CALLS:
+            await tools[call["name"]].ainvoke(call["args"])
+
+    async def run_all():
+        modes = [
+            ("sequential (script 10)", sequential),
+            ("ToolNode (script 14)", build_graph(ToolNode(TOOLS)).ainvoke),
+            ("engine, cold cache", build_graph(executor.as_node()).ainvoke),
+            ("engine, memoized pure tools", build_graph(executor.as_node()).ainvoke),
+        ]
+        for label, run in modes:
+            start = time.perf_counter()
+            for _ in range(args.rounds if label != "engine, cold cache" else 1):
+                result = await run(messages)
+            rounds = args.rounds if label != "engine, cold cache" else 1
+            print(f"{label:<32} {(time.perf_counter() - start) / rounds:6.2f}s per message")
+        return result
+
+    result = asyncio.run(run_all())
+    executor.close()
+
+    print("\nTool results from the engine:")
+    for message in result["messages"][2:]:
+        print(f"- {message.name:<20} {message.status:<8} {message.content}")
+    print(f"\nEngine stats: {executor.stats}\n")
+    executor.report()
+
+
+if __name__ == "__main__":
+    main()
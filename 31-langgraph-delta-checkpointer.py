@@ -0,0 +1,530 @@
+# Example: A compact, incremental SQLite checkpointer for MessagesState conversations
+# The graphs in scripts 13 and 14 are compiled without a checkpointer, so every `graph.invoke`
+# starts from an empty history. LangGraph's own savers (InMemorySaver, SqliteSaver) store a new
+# version of a channel as a full snapshot, so for `MessagesState` every step rewrites the whole
+# message list and a conversation of n turns writes O(n^2) bytes. This script adds:
+#
+# - DeltaSqliteSaver: a `BaseCheckpointSaver` backed by the standard-library sqlite3 module. The
+#   messages of a thread go into an append-only log; a version of the `messages` channel is only a
+#   (start, stop) range over that log, so a turn writes just the messages it added. When the list
+#   is not an extension of the last one written (messages removed or replaced, a fork from an
+#   older checkpoint), the new list is written as a fresh range: a snapshot.
+# - A compact binary encoding: LangGraph's msgpack serializer followed by raw deflate with a
+#   preset dictionary of the message envelopes, which halves the size of a typical message.
+# - Resume by thread id: the latest checkpoint is one indexed lookup plus one range scan of the
+#   log; `compact(thread_id)` drops the checkpoints and log rows the latest one no longer uses.
+# - A token budget: once the history passes it, a summarize node folds the older messages into a
+#   summary message and keeps the most recent ones, so the history (and a resume) stays bounded.
+#
+# The benchmark runs a 1,000-turn conversation with a fake model through each saver and reports
+# time per turn, bytes written, write amplification (bytes written / bytes of the messages
+# themselves) and the latency of resuming the thread from a freshly opened database.
+#
+# Usage:
+#   python 31-langgraph-delta-checkpointer.py                    # benchmark, no API key required
+#   python 31-langgraph-delta-checkpointer.py --turns 200
+#   python 31-langgraph-delta-checkpointer.py --demo             # chat with ChatGroq (requires GROQ_API_KEY)
+#   python 31-langgraph-delta-checkpointer.py --demo --fake      # same, with a fake model
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+    trim_messages,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Compact binary encoding ---
+class CompactCodec:
+    """msgpack (through the saver's serializer) + raw deflate with a preset dictionary.
+
+    A single message is too short for deflate to find much to compress on its own; the preset
+    dictionary holds empty messages of every type, so the class paths and field names that make
+    up most of a serialized message compress away.
+    """
+
+    def __init__(self, serde, level=6):
+        self.serde = serde
+        self.level = level
+        self.zdict = b"".join(
+            serde.dumps_typed(m)[1]
+            for m in [ToolMessage(content="", tool_call_id=""), SystemMessage(content=""), HumanMessage(content=""), AIMessage(content="")]
+        )
+
+    def dumps(self, value):
+        type_, data = self.serde.dumps_typed(value)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=self.zdict)
+        return type_.encode() + b"\0" + compressor.compress(data) + compressor.flush()
+
+    def loads(self, blob):
+        type_, _, data = blob.partition(b"\0")
+        return self.serde.loads_typed((type_.decode(), zlib.decompressobj(-15, zdict=self.zdict).decompress(data)))
+
+
+# --- Step 2: The checkpointer ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_checkpoint_id TEXT,
+    checkpoint BLOB, metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version));
+CREATE TABLE IF NOT EXISTS message_log (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, seq INTEGER, blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, seq));
+CREATE TABLE IF NOT EXISTS message_versions (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, start INTEGER, stop INTEGER,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version));
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+    channel TEXT, blob BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));
+"""
+
+
+class DeltaSqliteSaver(BaseCheckpointSaver):
+    """A SQLite checkpointer that stores message channels as deltas over an append-only log.
+
+    With `delta=False` message channels are stored as full snapshots, like LangGraph's savers.
+    """
+
+    def __init__(self, path, message_channels=("messages",), delta=True):
+        super().__init__()
+        self.codec = CompactCodec(self.serde)
+        self.message_channels = set(message_channels)
+        self.delta = delta
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        # (thread_id, checkpoint_ns, channel) -> (stop, messages) of the range written last
+        self.heads = {}
+        self.stats = {"bytes_written": 0, "rows_written": 0, "deltas": 0, "snapshots": 0}
+
+    def close(self):
+        self.conn.close()
+
+    def _write(self, sql, rows):
+        self.conn.executemany(sql, rows)
+        self.stats["rows_written"] += len(rows)
+        self.stats["bytes_written"] += sum(len(v) for row in rows for v in row if isinstance(v, (bytes, str)))
+
+    # Writing
+    def _put_messages(self, thread_id, checkpoint_ns, channel, version, messages):
+        key = (thread_id, checkpoint_ns, channel)
+        end = self.conn.execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ?", key
+        ).fetchone()[0]
+        head = self.heads.get(key)
+        # add_messages keeps the message objects of the previous value, so an append is cheap to
+        # recognise: the old list is an identical prefix of the new one
+        if head and head[0] == end and len(messages) >= len(head[1]) and all(a is b for a, b in zip(head[1], messages)):
+            start, new = end - len(head[1]), messages[len(head[1]):]
+            self.stats["deltas"] += 1
+        else:
+            start, new = end, messages
+            self.stats["snapshots"] += 1
+        self._write(
+            "INSERT INTO message_log VALUES (?, ?, ?, ?, ?)",
+            [(*key, end + i, self.codec.dumps(m)) for i, m in enumerate(new)],
+        )
+        self._write("INSERT OR REPLACE INTO message_versions VALUES (?, ?, ?, ?, ?, ?)", [(*key, version, start, end + len(new))])
+        self.heads[key] = (end + len(new), list(messages))
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                for channel, version in new_versions.items():
+                    value = values.get(channel)
+                    if self.delta and channel in self.message_channels and isinstance(value, list):
+                        self._put_messages(thread_id, checkpoint_ns, channel, str(version), value)
+                    else:
+                        blob = self.codec.dumps(value) if channel in values else None
+                        self._write("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)", [(thread_id, checkpoint_ns, channel, str(version), blob)])
+                self._write(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                    [(
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        self.codec.dumps(c),
+                        self.codec.dumps(get_checkpoint_metadata(config, metadata)),
+                    )],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self.heads.clear()
+                raise
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts) have negative indexes and may be overwritten
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, self.codec.dumps(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self._write(f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+
+    # Reading
+    def _load_values(self, thread_id, checkpoint_ns, versions):
+        values = {}
+        for channel, version in versions.items():
+            key = (thread_id, checkpoint_ns, channel)
+            if channel in self.message_channels:
+                row = self.conn.execute(
+                    "SELECT start, stop FROM message_versions WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                    (*key, str(version)),
+                ).fetchone()
+                if row is not None:
+                    start, stop = row
+                    head = self.heads.get(key)
+                    if head and head[0] == stop and len(head[1]) == stop - start:
+                        # The range written (or read) last: every invoke of a thread starts by
+                        # loading its latest checkpoint, so this skips decoding the whole history
+                        values[channel] = list(head[1])
+                        continue
+                    rows = self.conn.execute(
+                        "SELECT blob FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                        (*key, start, stop),
+                    ).fetchall()
+                    values[channel] = [self.codec.loads(blob) for blob, in rows]
+                    # Later appends to this list can be written as deltas, as long as no other
+                    # range was written after it
+                    if head is None or head[0] == stop:
+                        self.heads[key] = (stop, list(values[channel]))
+                    continue
+            row = self.conn.execute(
+                "SELECT blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (*key, str(version)),
+            ).fetchone()
+            if row is not None and row[0] is not None:
+                values[channel] = self.codec.loads(row[0])
+        return values
+
+    def _tuple(self, thread_id, checkpoint_ns, row):
+        checkpoint_id, parent_checkpoint_id, checkpoint_blob, metadata_blob = row
+        checkpoint = self.codec.loads(checkpoint_blob)
+        writes = self.conn.execute(
+            "SELECT task_id, channel, blob FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": self._load_values(thread_id, checkpoint_ns, checkpoint["channel_versions"])},
+            metadata=self.codec.loads(metadata_blob),
+            pending_writes=[(task_id, channel, self.codec.loads(blob)) for task_id, channel, blob in writes],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = "SELECT checkpoint_id, parent_checkpoint_id, checkpoint, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(query + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self.conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint, metadata FROM checkpoints WHERE 1 = 1"
+        params = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY checkpoint_id DESC", params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.codec.loads(row[3])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self.lock:
+                item = self._tuple(thread_id, checkpoint_ns, row)
+            yield item
+
+    # Local SQLite calls are short, so the async API runs them inline, as InMemorySaver does
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return self.delete_thread(thread_id)
+
+    # Housekeeping
+    def delete_thread(self, thread_id):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            for table in ("checkpoints", "blobs", "message_log", "message_versions", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("COMMIT")
+            self.heads = {k: v for k, v in self.heads.items() if k[0] != thread_id}
+
+    def compact(self, thread_id, checkpoint_ns=""):
+        """Drops every checkpoint of a thread but the latest, and the data only they used."""
+        latest = self.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}})
+        if latest is None:
+            return
+        key = (thread_id, checkpoint_ns)
+        versions = latest.checkpoint["channel_versions"]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?", (*key, latest.checkpoint["id"]))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?", (*key, latest.checkpoint["id"]))
+            for table in ("blobs", "message_versions"):
+                for channel, version in self.conn.execute(f"SELECT channel, version FROM {table} WHERE thread_id = ? AND checkpoint_ns = ?", key).fetchall():
+                    if str(versions.get(channel)) != version:
+                        self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", (*key, channel, version))
+            for channel, start, stop in self.conn.execute("SELECT channel, start, stop FROM message_versions WHERE thread_id = ? AND checkpoint_ns = ?", key).fetchall():
+                # Rows past `stop` stay, so that the log keeps growing from the same position
+                self.conn.execute("DELETE FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND seq < ?", (*key, channel, start))
+            self.conn.execute("COMMIT")
+
+
+# --- Step 3: Keep the history under a token budget ---
+SUMMARY_PROMPT = "Summarize the conversation above in a few sentences, keeping any facts the user may ask about later."
+
+
+def make_summarize_node(llm, max_tokens):
+    def summarize_history(state):
+        messages = state["messages"]
+        if count_tokens_approximately(messages) <= max_tokens:
+            return {}
+        # Keep the most recent half of the budget, starting on a user turn, and fold the rest
+        # (including an earlier summary) into a new summary
+        kept = trim_messages(messages, max_tokens=max_tokens // 2, strategy="last", token_counter=count_tokens_approximately, start_on="human")
+        # The latest user turn is always kept, even when it alone is over the budget: the model
+        # has to answer the question, not a summary of it
+        last_human = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=None)
+        if last_human is not None and len(kept) < len(messages) - last_human:
+            kept = messages[last_human:]
+        dropped = messages[: len(messages) - len(kept)]
+        if not dropped:
+            return {}
+        summary = llm.invoke([*dropped, HumanMessage(content=SUMMARY_PROMPT)])
+        return {
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                SystemMessage(content=f"Summary of the earlier conversation: {summary.content}"),
+                *kept,
+            ]
+        }
+
+    return summarize_history
+
+
+# --- Step 4: A script 13-style chat graph, now with a checkpointer ---
+def build_graph(llm, checkpointer, max_tokens=None):
+    def chatbot(state: MessagesState):
+        return {"messages": [llm.invoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("chatbot", chatbot)
+    if max_tokens:
+        builder.add_node("summarize_history", make_summarize_node(llm, max_tokens))
+        builder.add_edge(START, "summarize_history")
+        builder.add_edge("summarize_history", "chatbot")
+    else:
+        builder.add_edge(START, "chatbot")
+    builder.add_edge("chatbot", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+class FakeChatLLM(BaseChatModel):
+    """Answers every question with a deterministic reply of realistic length."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        question = messages[-1].content
+        if question == SUMMARY_PROMPT:
+            content = f"The user asked {len(messages) - 1} questions about various topics and got short answers."
+        else:
+            content = f"Here is an answer to '{question}'. " + "It depends on the details, but in short: yes. " * 4
+        message = AIMessage(
+            content=content,
+            response_metadata={"model_name": "fake-chat", "finish_reason": "stop"},
+            usage_metadata={"input_tokens": 12, "output_tokens": 40, "total_tokens": 52},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def question(turn):
+    return f"Question {turn}: what should I know about topic number {turn % 37}?"
+
+
+# --- Step 5: Benchmark ---
+def in_memory_bytes(saver):
+    checkpoints = sum(len(c) + len(m) for ns in saver.storage.values() for cps in ns.values() for (_, c), (_, m), _ in cps.values())
+    blobs = sum(len(b) for _, b in saver.blobs.values())
+    writes = sum(len(w[2][1]) for ws in saver.writes.values() for w in ws.values())
+    return checkpoints + blobs + writes
+
+
+def benchmark(label, llm, saver, turns, max_tokens=None, path=None):
+    graph = build_graph(llm, saver, max_tokens)
+    config = {"configurable": {"thread_id": "bench"}}
+    per_turn = []
+    start = time.perf_counter()
+    for turn in range(turns):
+        t = time.perf_counter()
+        result = graph.invoke({"messages": [HumanMessage(content=question(turn))]}, config)
+        per_turn.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    # The bytes of every message of the conversation, serialized once (every turn adds a
+    # question and an answer of about the same size as the last ones)
+    history = [m for c in saver.list(config, limit=1) for m in c.checkpoint["channel_values"]["messages"]]
+    payload = turns * (len(saver.serde.dumps_typed(history[-2])[1]) + len(saver.serde.dumps_typed(history[-1])[1]))
+    written = saver.stats["bytes_written"] if isinstance(saver, DeltaSqliteSaver) else in_memory_bytes(saver)
+
+    resume = last_turn = "n/a"
+    if path:
+        # Resume from a fresh connection, as a new process would after a restart
+        saver.close()
+        t = time.perf_counter()
+        resumed = DeltaSqliteSaver(path, delta=saver.delta)
+        state = build_graph(llm, resumed, max_tokens).get_state(config)
+        resume = f"{(time.perf_counter() - t) * 1000:.1f} ms"
+        assert len(state.values["messages"]) == len(result["messages"])
+        t = time.perf_counter()
+        build_graph(llm, resumed, max_tokens).invoke({"messages": [HumanMessage(content=question(turns))]}, config)
+        last_turn = f"{(time.perf_counter() - t) * 1000:.1f} ms"
+        resumed.compact("bench")
+        resumed.close()
+
+    last = per_turn[-100:]
+    print(
+        f"{label:<32} {elapsed:7.2f}s  {sum(last) / len(last) * 1000:6.2f} ms/turn (last 100)  "
+        f"{written / 1e6:8.2f} MB written  amplification {written / payload:7.1f}x  "
+        f"resume {resume:>9}  next turn {last_turn:>9}  history {len(result['messages'])} messages"
+    )
+    if isinstance(saver, DeltaSqliteSaver) and saver.delta:
+        print(f"{'':<32} {saver.stats['deltas']} delta writes, {saver.stats['snapshots']} snapshots, "
+              f"database {os.path.getsize(path) / 1e6:.2f} MB after compact()")
+
+
+def demo(llm, path, thread_id, max_tokens):
+    config = {"configurable": {"thread_id": thread_id}}
+    turns = [
+        "Hi, my name is Priya and I'm planning a trip to Lisbon.",
+        "What's a good neighbourhood to stay in?",
+        "Remind me, what is my name?",
+    ]
+    for i, text in enumerate(turns):
+        # A new saver and graph per turn, as if the script were restarted in between
+        saver = DeltaSqliteSaver(path)
+        graph = build_graph(llm, saver, max_tokens)
+        before = len(graph.get_state(config).values.get("messages", []))
+        result = graph.invoke({"messages": [HumanMessage(content=text)]}, config)
+        print(f"\n--- Turn {i + 1}: resumed thread '{thread_id}' with {before} messages ---")
+        result["messages"][-1].pretty_print()
+        saver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact delta checkpointing for MessagesState")
+    parser.add_argument("--turns", type=int, default=1000, help="Conversation length for the benchmark")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="History token budget before summarizing")
+    parser.add_argument("--demo", action="store_true", help="Chat for a few turns, resuming the thread each time")
+    parser.add_argument("--fake", action="store_true", help="Use a fake model in the demo (no API key required)")
+    parser.add_argument("--db", default="checkpoints.sqlite", help="SQLite file for the demo")
+    parser.add_argument("--thread", default="demo", help="Thread id for the demo")
+    args = parser.parse_args()
+
+    if args.demo:
+        if args.fake:
+            llm = FakeChatLLM()
+        else:
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(model="llama-3.1-8b-instant")
+        demo(llm, args.db, args.thread, args.max_tokens)
+        return
+
+    llm = FakeChatLLM()
+    print(f"{args.turns}-turn conversation, fake model\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        benchmark("InMemorySaver (full snapshots)", llm, InMemorySaver(), args.turns)
+        for label, delta, max_tokens in [
+            ("SQLite, full snapshots", False, None),
+            ("SQLite, deltas", True, None),
+            (f"SQLite, deltas, {args.max_tokens}-token budget", True, args.max_tokens),
+        ]:
+            path = os.path.join(tmp, f"{label}.sqlite")
+            benchmark(label, llm, DeltaSqliteSaver(path, delta=delta), args.turns, max_tokens, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+# Example: Faster cold starts with lazy imports, prebuilt objects and a pre-forked warm worker pool
+# Every script imports langchain_groq / langchain_openai / langchain_core / langgraph at the top and
+# builds its templates, graphs and clients before doing any work, so a `docker run ... python
+# NN-script.py` job spends most of a second or more starting up. This script adds:
+#
+# - lazy_import(name): the module is created at once but only executed on first attribute access
+#   (importlib's LazyLoader), so code paths that never touch a heavy package don't pay for it. This
+#   runner imports LangChain and LangGraph that way: `imports` never loads them.
+# - A warm worker pool: the parent imports the heavy modules and builds the prompt templates and
+#   compiled graphs once, then forks the workers, which inherit all of it copy-on-write. Model
+#   clients (and their HTTP connection pools) are created in each worker after the fork. Jobs are
+#   either scripts, run with `runpy` as `python NN-script.py args` would, or prebuilt runnables.
+#   A worker that dies mid-job (or overruns --job-timeout) fails that job and is replaced, and
+#   `pool` exits 1 if any job failed.
+#   Compiled graphs can't be pickled (they hold closures), which is why they are built before
+#   forking rather than loaded from a cache file.
+# - An import-time report: each script's top-level imports are run under `python -X importtime`
+#   in a fresh interpreter and the output parsed into a per-script total and the heaviest packages.
+#   The totals can be saved as a baseline and compared on later runs as a regression check.
+#
+# The benchmark runs the same jobs as fresh `python` processes and through the warm pool.
+# Workers are forked (Linux); where fork isn't available they are spawned and warm up in their
+# initializer instead.
+#
+# Usage:
+#   python 33-langchain-warm-runner.py bench                          # no API key required
+#   python 33-langchain-warm-runner.py imports                        # import-time report for every script
+#   python 33-langchain-warm-runner.py imports --only 09 12 --save-baseline imports.json
+#   python 33-langchain-warm-runner.py imports --baseline imports.json    # exits 1 on regression
+#   echo "12-langgraph-simple-example.py" | python 33-langchain-warm-runner.py pool --workers 2
+#   echo 'sentiment {"feedback": "Great support!"}' | python 33-langchain-warm-runner.py pool --fake
+
+import argparse
+import ast
+import collections
+import contextlib
+import glob
+import importlib
+import importlib.util
+import inspect
+import io
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
+import runpy
+import shlex
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Lazy imports ---
+def lazy_import(name):
+    """Returns module `name`; its code runs on the first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+prompts = lazy_import("langchain_core.prompts")
+output_parsers = lazy_import("langchain_core.output_parsers")
+graph = lazy_import("langgraph.graph")
+
+# The example scripts live next to this one, wherever it is run from
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def script_path(name):
+    """`name` as given if it exists, else the example script of that name next to this one."""
+    return name if os.path.exists(name) else os.path.join(SCRIPT_DIR, name)
+
+
+# What a warm worker has loaded before it takes its first job
+PRELOAD = ["langchain_core.prompts", "langchain_core.output_parsers", "langgraph.graph", "langgraph.prebuilt", "langchain_groq"]
+
+
+# --- Step 2: Objects built once, before forking ---
+def _node_1(state):
+    return {"graph_state": state["graph_state"] + " AGI"}
+
+
+def _node_2(state):
+    return {"graph_state": state["graph_state"] + " Achieved!"}
+
+
+def _node_3(state):
+    return {"graph_state": state["graph_state"] + " Not Achieved :("}
+
+
+def _decide_mood(state):
+    return "node_2" if random.random() < 0.5 else "node_3"
+
+
+def prebuild():
+    """Templates and graphs that don't hold clients, so they can be shared by forked workers."""
+    from typing_extensions import TypedDict
+
+    class State(TypedDict):
+        graph_state: str
+
+    # Script 12's graph
+    builder = graph.StateGraph(State)
+    builder.add_node("node_1", _node_1)
+    builder.add_node("node_2", _node_2)
+    builder.add_node("node_3", _node_3)
+    builder.add_edge(graph.START, "node_1")
+    builder.add_conditional_edges("node_1", _decide_mood, ["node_2", "node_3"])
+    builder.add_edge("node_2", graph.END)
+    builder.add_edge("node_3", graph.END)
+
+    return {
+        "mood_graph": builder.compile(),
+        # Script 09's sentiment prompt
+        "sentiment_template": prompts.PromptTemplate(
+            input_variables=["feedback"],
+            template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+        ),
+    }
+
+
+PREBUILT = {}
+RUNNABLES = {}
+
+
+def _init_worker(fake):
+    # Forked workers already have PREBUILT; spawned ones build it here
+    if not PREBUILT:
+        for name in PRELOAD:
+            importlib.import_module(name)
+        PREBUILT.update(prebuild())
+    if fake:
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        llm = FakeListChatModel(responses=["Positive"])
+    else:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(model="llama-3.1-8b-instant")
+    RUNNABLES["mood_graph"] = PREBUILT["mood_graph"]
+    RUNNABLES["sentiment"] = PREBUILT["sentiment_template"] | llm | output_parsers.StrOutputParser()
+
+
+# --- Step 3: The warm worker pool ---
+def run_job(job):
+    """Runs ("script", path, argv) or ("runnable", name, input); returns (exit code, output, seconds)."""
+    kind, target, arg = job
+    start = time.perf_counter()
+    output = io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(output):
+        try:
+            if kind == "script":
+                sys.argv = [target, *arg]
+                runpy.run_path(target, run_name="__main__")
+            else:
+                print(RUNNABLES[target].invoke(arg))
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            print(f"Error: {e!r}")
+            code = 1
+    return code, output.getvalue(), time.perf_counter() - start
+
+
+def _worker_loop(conn, fake):
+    _init_worker(fake)
+    conn.send("ready")
+    for job in iter(conn.recv, None):
+        conn.send(run_job(job))
+
+
+class WarmPool:
+    """Each worker gets one job at a time over its own pipe, so the pool always knows which job a
+    worker is running. A worker that dies (os._exit, a segfault, an uncaught BaseException) or
+    overruns `job_timeout` fails its job and is replaced by a fresh one."""
+
+    def __init__(self, workers=2, fake=False, job_timeout=None):
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        if self.context.get_start_method() == "fork":
+            for name in PRELOAD:
+                importlib.import_module(name)
+            PREBUILT.update(prebuild())
+        self.fake = fake
+        self.job_timeout = job_timeout
+        self.workers = [self._start_worker() for _ in range(workers)]
+        for _, conn in self.workers:
+            conn.recv()
+
+    def _start_worker(self):
+        conn, child_conn = self.context.Pipe()
+        # Regular (non-daemon) processes, so scripts can start process pools of their own
+        process = self.context.Process(target=_worker_loop, args=(child_conn, self.fake))
+        process.start()
+        # Without the parent's copy of the child end, the pipe reports EOF when the worker dies
+        child_conn.close()
+        return process, conn
+
+    def _replace_worker(self, slot):
+        process, conn = self.workers[slot]
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+        self.workers[slot] = self._start_worker()
+        self.workers[slot][1].recv()
+        return process.exitcode
+
+    def map(self, jobs):
+        """Runs the jobs on the workers and returns their results in order."""
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+        pending = collections.deque(range(len(jobs)))
+        idle = list(range(len(self.workers)))
+        running = {}
+        while pending or running:
+            while pending and idle:
+                slot, index = idle.pop(), pending.popleft()
+                self.workers[slot][1].send(jobs[index])
+                running[slot] = (index, time.perf_counter())
+            # The pipes answer when a job finishes; the sentinels when a worker exits. The timeout
+            # bounds the wait even if neither ever happens
+            waiting = {}
+            for slot in running:
+                process, conn = self.workers[slot]
+                waiting[conn] = waiting[process.sentinel] = slot
+            timeout = self.job_timeout if self.job_timeout is not None else 1.0
+            ready = {waiting[obj] for obj in multiprocessing.connection.wait(list(waiting), timeout)}
+            now = time.perf_counter()
+            for slot, (index, started) in list(running.items()):
+                process, conn = self.workers[slot]
+                if slot in ready or not process.is_alive():
+                    try:
+                        results[index] = conn.recv()
+                        del running[slot]
+                        idle.append(slot)
+                        continue
+                    except EOFError:
+                        error = "worker died"
+                elif self.job_timeout is not None and now - started > self.job_timeout:
+                    error = f"timed out after {self.job_timeout:g}s"
+                else:
+                    continue
+                exitcode = self._replace_worker(slot)
+                error += f" (exit code {exitcode})" if exitcode else ""
+                results[index] = (exitcode or 1, f"Error: {error}\n", now - started)
+                del running[slot]
+                idle.append(slot)
+        return results
+
+    def close(self):
+        for process, conn in self.workers:
+            with contextlib.suppress(OSError):
+                conn.send(None)
+        for process, conn in self.workers:
+            process.join()
+            conn.close()
+
+
+def parse_job(line):
+    """`NN-script.py args...` or `<prebuilt runnable> <JSON input>`."""
+    name, _, rest = line.strip().partition(" ")
+    if name in ("mood_graph", "sentiment"):
+        return ("runnable", name, json.loads(rest or "{}"))
+    return ("script", script_path(name), shlex.split(rest))
+
+
+# --- Step 4: Import-time report ---
+def import_times(code):
+    """Runs `code` in a fresh interpreter under -X importtime: [(module, self us, cumulative us, depth)]."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=SCRIPT_DIR)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def script_imports(path):
+    """The top-level import statements of a script, as code."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+EAGER_PREAMBLE = """\
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langgraph.graph import StateGraph, START, END
+from langchain_groq import ChatGroq
+"""
+
+LAZY_PREAMBLE = "import importlib.util, sys\n" + inspect.getsource(lazy_import) + """\
+prompts = lazy_import("langchain_core.prompts")
+output_parsers = lazy_import("langchain_core.output_parsers")
+graph = lazy_import("langgraph.graph")
+langchain_groq = lazy_import("langchain_groq")
+"""
+
+
+def import_report(only=None, repeat=1):
+    cases = {"preamble (eager)": EAGER_PREAMBLE, "preamble (lazy)": LAZY_PREAMBLE}
+    for path in sorted(glob.glob(os.path.join(SCRIPT_DIR, "[0-9][0-9]-*.py"))):
+        name = os.path.basename(path)
+        if not only or name[:2] in only:
+            cases[name] = script_imports(path)
+    results = {}
+    for name, code in cases.items():
+        try:
+            runs = [import_times(code) for _ in range(repeat)]
+        except ImportError as e:
+            results[name] = {"error": str(e)}
+            continue
+        # Keep the fastest run; the others only add noise from the machine
+        modules = min(runs, key=lambda m: sum(c for _, _, c, d in m if d == 0))
+        packages = {}
+        for module, self_us, _, _ in modules:
+            top = module.split(".")[0]
+            packages[top] = packages.get(top, 0) + self_us
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])[:3]
+        results[name] = {
+            "total_ms": sum(c for _, _, c, d in modules if d == 0) / 1000,
+            "modules": len(modules),
+            "heaviest": [f"{package} {us / 1000:.0f} ms" for package, us in heaviest],
+        }
+    return results
+
+
+def print_import_report(results, baseline=None, tolerance=0.5):
+    regressions = []
+    print(f"{'script':<52} {'import ms':>9} {'modules':>8}  {'heaviest packages (self time)':<44} baseline")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<52} skipped ({result['error']})")
+            continue
+        compare = ""
+        if baseline and baseline.get(name, {}).get("total_ms"):
+            previous = baseline[name]["total_ms"]
+            change = (result["total_ms"] - previous) / previous
+            compare = f"{change:+.0%}"
+            if change > tolerance:
+                compare += "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:<52} {result['total_ms']:>9.0f} {result['modules']:>8}  {', '.join(result['heaviest']):<44} {compare}")
+    return regressions
+
+
+# --- Step 5: Cold vs warm benchmark ---
+# Script 09's first chain as a standalone job, with the fake model of the warm workers
+COLD_SENTIMENT = """\
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_groq import ChatGroq
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\\n\\n{feedback}"
+)
+chain = sentiment_template | FakeListChatModel(responses=["Positive"]) | StrOutputParser()
+print(chain.invoke({"feedback": "The customer service was fantastic."}))
+"""
+
+
+def bench(workers, rounds):
+    jobs = [
+        ("script", "12-langgraph-simple-example.py", []),
+        ("script", "29-langchain-compiled-prompt-templates.py", ["--renders", "100"]),
+        ("runnable", "mood_graph", {"graph_state": "Hi, this is Lance."}),
+        ("runnable", "sentiment", {"feedback": "The customer service was fantastic."}),
+    ]
+    # A cold job is a fresh interpreter, as with `docker run ... python script.py`
+    cold_commands = {
+        "12-langgraph-simple-example.py": ["12-langgraph-simple-example.py"],
+        "29-langchain-compiled-prompt-templates.py": ["29-langchain-compiled-prompt-templates.py", "--renders", "100"],
+        "mood_graph": ["12-langgraph-simple-example.py"],
+        "sentiment": ["-c", COLD_SENTIMENT],
+    }
+
+    cold = {}
+    for _, target, arg in jobs:
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *cold_commands[target]], capture_output=True, check=True, cwd=SCRIPT_DIR)
+            times.append(time.perf_counter() - start)
+        cold[target] = min(times)
+
+    start = time.perf_counter()
+    pool = WarmPool(workers, fake=True)
+    startup = time.perf_counter() - start
+    warm = {}
+    for kind, target, arg in jobs:
+        path = os.path.join(SCRIPT_DIR, target) if kind == "script" else target
+        results = pool.map([(kind, path, arg)] * rounds)
+        assert all(code == 0 for code, _, _ in results), results
+        warm[target] = min(seconds for _, _, seconds in results)
+    pool.close()
+
+    print(f"Warm pool with {workers} workers started in {startup:.2f}s (imports, prebuilt objects, fork)\n")
+    print(f"{'job':<44} {'cold process':>13} {'warm worker':>12} {'speed-up':>9}")
+    for _, target, _ in jobs:
+        print(f"{target:<44} {cold[target] * 1000:>10.0f} ms {warm[target] * 1000:>9.1f} ms {cold[target] / warm[target]:>8.0f}x")
+    print("\n(cold 'mood_graph' runs script 12; cold 'sentiment' builds and runs script 09's chain with a fake model)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start tools: lazy imports, a warm worker pool, import-time report")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench_parser = commands.add_parser("bench", help="Compare cold processes with a warm worker pool")
+    bench_parser.add_argument("--workers", type=int, default=2)
+    bench_parser.add_argument("--rounds", type=int, default=3, help="Runs per job (the fastest is kept)")
+
+    pool_parser = commands.add_parser("pool", help="Run jobs from stdin (one per line) on a warm worker pool")
+    pool_parser.add_argument("--workers", type=int, default=2)
+    pool_parser.add_argument("--fake", action="store_true", help="Use a fake model for prebuilt chains (no API key required)")
+    pool_parser.add_argument("--job-timeout", type=float, help="Seconds before a job's worker is killed and replaced")
+
+    imports_parser = commands.add_parser("imports", help="Import-time report for the scripts")
+    imports_parser.add_argument("--only", nargs="*", help="Script numbers to report (default: all)")
+    imports_parser.add_argument("--repeat", type=int, default=1, help="Runs per script (the fastest is kept)")
+    imports_parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+    imports_parser.add_argument("--baseline", help="Compare against a saved JSON baseline")
+    imports_parser.add_argument(
+        "--tolerance", type=float, default=0.5,
+        help="Allowed import-time increase over the baseline (start-up times are noisy on shared machines)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.workers, args.rounds)
+    elif args.command == "pool":
+        pool = WarmPool(args.workers, fake=args.fake, job_timeout=args.job_timeout)
+        failed = []
+        try:
+            lines = [line for line in sys.stdin if line.strip()]
+            for line, (code, output, seconds) in zip(lines, pool.map([parse_job(line) for line in lines])):
+                print(f"--- {line.strip()} (exit {code}, {seconds * 1000:.1f} ms) ---")
+                print(output, end="")
+                if code != 0:
+                    failed.append(line.strip())
+        finally:
+            pool.close()
+        if failed:
+            print(f"\n{len(failed)} of {len(lines)} jobs failed: {', '.join(failed)}")
+            raise SystemExit(1)
+    else:
+        results = import_report(args.only, args.repeat)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        regressions = print_import_report(results, baseline, args.tolerance)
+        if args.save_baseline:
+            with open(args.save_baseline, "w", encoding="utf-8") as f:
+                json.dump({"settings": vars(args), "results": results}, f, indent=2)
+            print(f"\nBaseline written to {args.save_baseline}")
+        if regressions:
+            print(f"\nImport-time regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+# Example: A structured-output engine with cached validators, JSON repair and error-diff retries
+# Script 07 parses the model's text with `PydanticOutputParser` and script 08 uses
+# `llm.with_structured_output(Author)`. Either way an answer that is almost right (wrapped in a
+# markdown fence, cut off by the token limit, "8 books" for an integer) raises, and the only fix
+# is a whole new call. This script adds StructuredOutput, a runnable that wraps a chat model and a
+# Pydantic class:
+#
+# - Cached compiled validators: the model's pydantic-core validator (and one for lists of it) is
+#   built once per class. The fast path is a single `validate_json` call on the raw text, which
+#   parses and validates in one pass without LangChain's markdown/JSON pre-processing.
+# - Partial repair when that fails: extract the JSON object from surrounding text or fences, close
+#   truncated JSON (unterminated strings, open brackets, a dangling key), drop trailing commas, and
+#   coerce values from the validation errors ("8 books" -> 8, "a, b" -> ["a", "b"], 3 -> "3").
+# - Bounded retries that send back only the error diff: the failing fields and why, with a request
+#   for a JSON object holding just those fields, which is merged into what was already valid.
+# - Batch validation for `batch`: the outputs are validated as one JSON array with a single call,
+#   bisecting around the malformed ones. This pays off when most answers are clean; with many
+#   malformed ones the bisection costs more than validating one at a time.
+# - Tool-call answers (as `with_structured_output` produces) are validated the same way.
+#
+# The benchmark validates a seeded corpus of malformed outputs (fences, prose, truncation, number
+# strings, trailing commas, missing or unusable fields) and measures validation throughput, and
+# then retry rates and retry traffic end to end with a fake model.
+#
+# Usage:
+#   python 34-langchain-structured-output-engine.py            # uses ChatGroq (requires GROQ_API_KEY)
+#   python 34-langchain-structured-output-engine.py --fake     # no API key required
+#   python 34-langchain-structured-output-engine.py --fake --corpus 5000
+
+import argparse
+import json
+import random
+import re
+import time
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Compiled validators, cached per class ---
+class CompiledValidator:
+    def __init__(self, model):
+        self.model = model
+        self.one = TypeAdapter(model)
+        self.many = TypeAdapter(list[model])
+
+
+_validators = {}
+
+
+def validator_for(model):
+    if model not in _validators:
+        _validators[model] = CompiledValidator(model)
+    return _validators[model]
+
+
+# --- Step 2: Partial repair ---
+def _scan(text):
+    """Open brackets, whether the text ends inside a string, and the commas outside strings."""
+    closers, commas, in_string, escape = [], [], False, False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                return text[: i + 1], [], False, commas
+        elif ch == ",":
+            commas.append(i)
+    return text, closers, in_string, commas
+
+
+def repair_json(text):
+    """The JSON object in `text`, repaired if possible, else None."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    # Everything after the object's closing brace (prose, a closing fence) is dropped by the scan
+    text, closers, in_string, commas = _scan(text[start:])
+    if not closers:
+        candidates = [text]
+    else:
+        # Truncated: close what is open; if the cut left a partial key or value, drop back to the
+        # last complete member and close that instead
+        head = text[:-1] if text.endswith("\\") else text
+        candidates = [head + ('"' if in_string else "")]
+        candidates += [text[:i] for i in reversed(commas[-3:])]
+    for candidate in candidates:
+        candidate = re.sub(r",\s*([}\]])", r"\1", candidate.rstrip().rstrip(","))
+        _, still_open, _, _ = _scan(candidate)
+        try:
+            return json.loads(candidate + "".join(reversed(still_open)))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _set(data, loc, value):
+    for key in loc[:-1]:
+        data = data[key]
+    data[loc[-1]] = value
+
+
+def coerce(data, errors):
+    """Fixes the values pydantic's lax mode can't; returns the number of fields changed."""
+    fixed = 0
+    for error in errors:
+        value, loc = error["input"], error["loc"]
+        if error["type"] in ("int_parsing", "int_from_float") and isinstance(value, str):
+            match = re.search(r"(-?\d[\d,]*)(\.\d+)?", value)
+            # "8 books" and "8.0" are 8, but "1.5" is not an integer and stays an error
+            if match and not (match.group(2) and float(match.group(2))):
+                _set(data, loc, int(match.group(1).replace(",", "")))
+                fixed += 1
+        elif error["type"] == "list_type" and isinstance(value, str):
+            _set(data, loc, [item.strip() for item in re.split(r"[,;\n]", value) if item.strip()])
+            fixed += 1
+        elif error["type"] == "string_type" and isinstance(value, (int, float)):
+            _set(data, loc, str(value))
+            fixed += 1
+    return fixed
+
+
+def error_diff(errors):
+    lines = []
+    for error in errors:
+        field = ".".join(str(part) for part in error["loc"]) or "(root)"
+        got = "" if error["type"] == "missing" else f" (got {json.dumps(error['input'], default=str)[:60]})"
+        lines.append(f"- {field}: {error['msg']}{got}")
+    return "\n".join(lines)
+
+
+# --- Step 3: The engine ---
+class StructuredOutput(Runnable):
+    """Chat model + Pydantic class -> validated instances, repairing and retrying as needed."""
+
+    def __init__(self, llm, model, max_retries=2, use_tools=False):
+        self.llm = llm.bind_tools([model], tool_choice=model.__name__) if use_tools else llm
+        self.model = model
+        self.validator = validator_for(model)
+        self.max_retries = max_retries
+        self.stats = {"outputs": 0, "fast_path": 0, "repaired": 0, "retried": 0, "failed": 0, "retry_calls": 0, "retry_chars_sent": 0, "retry_chars_received": 0}
+
+    def validate(self, output):
+        """Returns (instance or None, data so far, errors) for a model message or raw text."""
+        if isinstance(output, AIMessage) and output.tool_calls:
+            data = output.tool_calls[0]["args"]
+            try:
+                return self.validator.one.validate_python(data), data, []
+            except ValidationError as e:
+                return self._repair(data, e.errors())
+        text = output.content if isinstance(output, AIMessage) else output
+        try:
+            return self.validator.one.validate_json(text), None, []
+        except ValidationError:
+            pass
+        data = repair_json(text)
+        if not isinstance(data, dict):
+            return None, {}, [{"type": "json_invalid", "loc": (), "msg": "No JSON object found in the answer", "input": text}]
+        try:
+            return self.validator.one.validate_python(data), data, []
+        except ValidationError as e:
+            return self._repair(data, e.errors())
+
+    def _repair(self, data, errors):
+        if coerce(data, errors):
+            try:
+                return self.validator.one.validate_python(data), data, []
+            except ValidationError as e:
+                errors = e.errors()
+        return None, data, errors
+
+    def validate_batch(self, texts):
+        """Validates many raw texts with one call per clean run, bisecting around bad ones."""
+        if not texts:
+            return []
+        try:
+            values = self.validator.many.validate_json("[" + ",".join(texts) + "]")
+        except ValidationError:
+            values = None
+        # An answer holding several objects ("{...}, {...}") still parses as an array, just one
+        # of the wrong length; treat that like a validation error so results stay aligned
+        if values is not None and len(values) == len(texts):
+            return [(value, None, []) for value in values]
+        if len(texts) == 1:
+            return [self.validate(texts[0])]
+        middle = len(texts) // 2
+        return self.validate_batch(texts[:middle]) + self.validate_batch(texts[middle:])
+
+    def _finish(self, input, result, config=None):
+        value, data, errors = result
+        self.stats["outputs"] += 1
+        if value is not None:
+            self.stats["fast_path" if data is None else "repaired"] += 1
+            return value
+        return self._retry(input, data, errors, config)
+
+    def _retry(self, input, data, errors, config=None):
+        if hasattr(input, "to_messages"):
+            messages = input.to_messages()
+        elif isinstance(input, str):
+            messages = [HumanMessage(content=input)]
+        else:
+            messages = list(input)
+        self.stats["retried"] += 1
+        for _ in range(self.max_retries):
+            fields = sorted({str(e["loc"][0]) for e in errors if e["loc"]}) or list(self.model.model_fields)
+            request = (
+                f"Your answer had these problems:\n{error_diff(errors)}\n"
+                f"Reply with only a JSON object containing the corrected keys: {', '.join(fields)}."
+            )
+            # The original prompt goes again (a provider's prefix cache can reuse it), but not the
+            # failed answer, and only the failing fields come back
+            retry = [*messages, HumanMessage(content=request)]
+            response = self.llm.invoke(retry, config)
+            self.stats["retry_calls"] += 1
+            self.stats["retry_chars_sent"] += sum(len(m.content) for m in retry)
+            self.stats["retry_chars_received"] += len(response.content) + len(json.dumps([c["args"] for c in response.tool_calls]))
+            patch, patch_data, _ = self.validate(response)
+            if patch_data is None and patch is not None:
+                patch_data = patch.model_dump()
+            data = {**data, **(patch_data or {})}
+            try:
+                return self.validator.one.validate_python(data)
+            except ValidationError as e:
+                value, data, errors = self._repair(data, e.errors())
+                if value is not None:
+                    return value
+        self.stats["failed"] += 1
+        raise OutputParserException(f"Could not produce a valid {self.model.__name__}:\n{error_diff(errors)}")
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._finish(input, self.validate(self.llm.invoke(input, config)), config)
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        responses = self.llm.batch(inputs, config)
+        if all(not r.tool_calls for r in responses):
+            results = self.validate_batch([r.content for r in responses])
+        else:
+            results = [self.validate(r) for r in responses]
+        outputs = []
+        for input, result in zip(inputs, results):
+            try:
+                outputs.append(self._finish(input, result, config))
+            except OutputParserException as e:
+                if not return_exceptions:
+                    raise
+                outputs.append(e)
+        return outputs
+
+
+# --- Step 4: Script 07's model and prompt, a corpus of malformed answers, and a fake model ---
+class Author(BaseModel):
+    name: str = Field(description="The name of the author")
+    number: int = Field(description="The number of books written by the author")
+    books: list[str] = Field(description="The list of books they wrote")
+
+
+PROMPT = "Answer the question.\n{format_instructions}\n{question}"
+
+AUTHORS = {
+    "Dan Brown": ["Digital Fortress", "Deception Point", "Angels & Demons", "The Da Vinci Code", "The Lost Symbol", "Inferno", "Origin"],
+    "Agatha Christie": ["The Mysterious Affair at Styles", "Murder on the Orient Express", "Death on the Nile", "And Then There Were None"],
+    "Haruki Murakami": ["Norwegian Wood", "Kafka on the Shore", "1Q84", "The Wind-Up Bird Chronicle", "Killing Commendatore"],
+    "Chimamanda Ngozi Adichie": ["Purple Hibiscus", "Half of a Yellow Sun", "Americanah"],
+}
+
+# Kinds of answers and how often they occur in the corpus
+DAMAGE = {
+    "clean": 40, "fenced": 12, "prose": 10, "truncated": 10, "number as text": 8,
+    "trailing comma": 6, "books as text": 5, "missing field": 5, "unusable value": 4,
+}
+
+
+def damaged_answer(rng, truth, kind):
+    data = truth.model_dump()
+    if kind == "number as text":
+        data["number"] = rng.choice([f"{truth.number} books", f"about {truth.number}", str(truth.number)])
+    elif kind == "books as text":
+        data["books"] = ", ".join(truth.books)
+    elif kind == "missing field":
+        del data["number"]
+    elif kind == "unusable value":
+        data["number"] = "several"
+    text = json.dumps(data)
+    if kind == "fenced":
+        return "```json\n" + json.dumps(data, indent=2) + "\n```"
+    if kind == "prose":
+        return f"Here is the information you asked for:\n{text}\nLet me know if you need anything else."
+    if kind == "truncated":
+        return text[: rng.randint(int(len(text) * 0.6), len(text) - 2)]
+    if kind == "trailing comma":
+        return text[:-2] + ",]," + "}"
+    return text
+
+
+def build_corpus(size, seed=0):
+    """[(question, truth, kind, answer)] with the DAMAGE mix."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        name = rng.choice(list(AUTHORS))
+        truth = Author(name=name, number=len(AUTHORS[name]), books=AUTHORS[name])
+        kind = rng.choices(list(DAMAGE), weights=list(DAMAGE.values()))[0]
+        corpus.append((f"Generate the books written by {name} (request {i})", truth, kind, damaged_answer(rng, truth, kind)))
+    return corpus
+
+
+class FakeStructuredLLM(BaseChatModel):
+    """Answers each corpus question with its damaged answer, and retries correctly.
+
+    A repeated question gets the clean answer, and an error-diff request gets just the
+    requested fields.
+    """
+
+    answers: dict
+    seen: set = Field(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-structured"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        question = messages[0].content.splitlines()[-1]
+        truth, answer = self.answers[question]
+        if len(messages) > 1:
+            fields = messages[-1].content.rsplit(": ", 1)[1].rstrip(".").split(", ")
+            answer = json.dumps({k: v for k, v in truth.model_dump().items() if k in fields})
+        elif question in self.seen:
+            answer = truth.model_dump_json()
+        self.seen.add(question)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+
+# --- Step 5: Benchmarks ---
+def timed(function, items):
+    start = time.perf_counter()
+    results = function(items)
+    return results, (time.perf_counter() - start) / len(items) * 1e6
+
+
+def validation_benchmark(corpus, chunk=32):
+    parser = PydanticOutputParser(pydantic_object=Author)
+    engine = StructuredOutput(None, Author)
+
+    def with_parser(texts):
+        results = []
+        for text in texts:
+            try:
+                results.append(parser.parse(text))
+            except OutputParserException:
+                results.append(None)
+        return results
+
+    def one_at_a_time(texts):
+        return [engine.validate(text)[0] for text in texts]
+
+    def in_batches(texts):
+        return [r[0] for i in range(0, len(texts), chunk) for r in engine.validate_batch(texts[i : i + chunk])]
+
+    malformed = [answer for _, _, _, answer in corpus]
+    clean = [answer for _, _, kind, answer in corpus if kind == "clean"]
+    print(f"Validation throughput ({len(malformed)} mixed answers, {len(clean)} clean ones):")
+    print(f"{'':<34} {'mixed us/item':>14} {'valid':>7} {'clean us/item':>14}")
+    for label, function in [
+        ("PydanticOutputParser (script 07)", with_parser),
+        ("engine, one at a time", one_at_a_time),
+        (f"engine, batches of {chunk}", in_batches),
+    ]:
+        function(malformed[:50])  # warm up
+        results, mixed = timed(function, malformed)
+        _, fast = timed(function, clean)
+        valid = sum(r is not None for r in results) / len(results)
+        print(f"{label:<34} {mixed:14.1f} {valid:7.0%} {fast:14.1f}")
+
+    print("\nOutcome by kind of answer (parser / engine):")
+    for kind in DAMAGE:
+        texts = [answer for _, _, k, answer in corpus if k == kind]
+        if texts:
+            parsed = sum(r is not None for r in with_parser(texts)) / len(texts)
+            repaired = sum(r is not None for r in one_at_a_time(texts)) / len(texts)
+            print(f"  {kind:<16} {parsed:5.0%} / {repaired:5.0%}")
+
+
+def retry_benchmark(corpus):
+    """End to end with a fake model: script 07's parse-or-call-again against the engine."""
+    parser = PydanticOutputParser(pydantic_object=Author)
+    prompt = PromptTemplate(
+        template=PROMPT,
+        input_variables=["question"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+    answers = {question: (truth, answer) for question, truth, _, answer in corpus}
+    inputs = [prompt.invoke({"question": question}) for question, _, _, _ in corpus]
+    truths = [truth for _, truth, _, _ in corpus]
+
+    def script_07(llm, max_retries=2):
+        stats = {"calls": 0, "retried": 0, "failed": 0, "retry_chars_sent": 0, "retry_chars_received": 0}
+        results = []
+        for prompt_value in inputs:
+            for attempt in range(max_retries + 1):
+                response = llm.invoke(prompt_value)
+                stats["calls"] += 1
+                if attempt:
+                    stats["retry_chars_sent"] += len(prompt_value.to_string())
+                    stats["retry_chars_received"] += len(response.content)
+                try:
+                    results.append(parser.parse(response.content))
+                    break
+                except OutputParserException:
+                    stats["retried"] += attempt == 0
+            else:
+                stats["failed"] += 1
+                results.append(None)
+        return results, stats
+
+    def engine_run(llm, batched):
+        engine = StructuredOutput(llm, Author)
+        if batched:
+            results = engine.batch(inputs, return_exceptions=True)
+        else:
+            results = []
+            for prompt_value in inputs:
+                try:
+                    results.append(engine.invoke(prompt_value))
+                except OutputParserException as e:
+                    results.append(e)
+        stats = dict(engine.stats, calls=len(inputs) + engine.stats["retry_calls"])
+        return [r if isinstance(r, Author) else None for r in results], stats
+
+    n = len(inputs)
+    print(f"\nEnd to end with a fake model ({n} questions, at most 2 retries):")
+    print(f"{'':<34} {'calls/item':>10} {'retried':>8} {'failed':>7} {'correct':>8} {'sent/retry':>11} {'recv/retry':>11} {'ms':>7}")
+    for label, run in [
+        ("script 07: parse, call again", script_07),
+        ("engine.invoke", lambda llm: engine_run(llm, False)),
+        ("engine.batch", lambda llm: engine_run(llm, True)),
+    ]:
+        llm = FakeStructuredLLM(answers=answers)
+        start = time.perf_counter()
+        results, stats = run(llm)
+        elapsed = (time.perf_counter() - start) * 1000
+        retries = max(1, stats["calls"] - n)
+        correct = sum(r is not None and r.number == t.number and r.books[:1] == t.books[:1] for r, t in zip(results, truths))
+        print(
+            f"{label:<34} {stats['calls'] / n:10.2f} {stats['retried'] / n:8.1%} {stats['failed']:7d} {correct / n:8.1%}"
+            f" {stats['retry_chars_sent'] / retries:11.0f} {stats['retry_chars_received'] / retries:11.0f} {elapsed:7.0f}"
+        )
+
+
+# --- Step 6: Demo: script 07's question through the engine ---
+def main():
+    parser = argparse.ArgumentParser(description="Structured-output engine with repair and error-diff retries")
+    parser.add_argument("--fake", action="store_true", help="Use a fake model (no API key required)")
+    parser.add_argument("--corpus", type=int, default=2000, help="Size of the malformed-output corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.corpus, args.seed)
+    validation_benchmark(corpus)
+    retry_benchmark(corpus[:500])
+
+    if args.fake:
+        question, truth, _, _ = build_corpus(1, args.seed)[0]
+        question = question.rsplit(" (", 1)[0] + " (demo)"
+        llm = FakeStructuredLLM(answers={question: (truth, f"Sure!\n```json\n{{\"name\": \"{truth.name}\", \"number\": \"{truth.number} books\", \"books\": {json.dumps(truth.books)}")})
+    else:
+        from langchain_groq import ChatGroq
+
+        question = "Generate the books written by Dan Brown"
+        llm = ChatGroq(model="llama-3.1-8b-instant")
+
+    prompt = PromptTemplate(
+        template=PROMPT,
+        input_variables=["question"],
+        partial_variables={"format_instructions": PydanticOutputParser(pydantic_object=Author).get_format_instructions()},
+    )
+    engine = StructuredOutput(llm, Author)
+    chain = prompt | engine
+    print(f"\nQ: {question}")
+    print(f"A: {chain.invoke({'question': question})!r}")
+    print(f"Engine stats: {engine.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+# Example: A lightweight superstep executor for LangGraph StateGraphs
+# Script 12 builds node_1 -> decide_mood -> node_2/node_3, and scripts 13 and 14 build small
+# graphs around a tool-calling model. `builder.compile()` runs them on LangGraph's Pregel engine,
+# which copies channel values into a fresh state dict for every node and routes every write
+# through channels, checkpoint bookkeeping and callbacks. For graphs without checkpointers or
+# interrupts this script runs the same uncompiled `StateGraph` builder with much less per-node
+# work:
+#
+# - The plan is read once from the builder: static edges, conditional edges (with their path maps)
+#   and joins (`add_edge([a, b], c)`), so the nodes that can run in the same superstep are known
+#   from the edges.
+# - All nodes of a superstep run concurrently: sync nodes in a thread pool (`invoke`), or async
+#   nodes on the event loop and sync nodes in the pool (`ainvoke`). A superstep with a single node
+#   runs inline, without a hop to a worker (in `ainvoke` a sync node then runs on the event loop).
+# - Nodes get the current state dict itself rather than a copy. Updates are merged after the
+#   superstep through the state's reducers (`Annotated[list, operator.add]`, `add_messages`), so
+#   only the changed keys are rebuilt; two writes to a plain key in one superstep raise
+#   `InvalidUpdateError`, as in LangGraph. Nodes must not mutate the state in place.
+# - Nodes and routers that take only the state are called directly. Ones that also ask for
+#   `config` or `runtime` (such as script 14's `ToolNode`) are called through `invoke(state, config)`
+#   with the caller's RunnableConfig; the default LangGraph `Runtime` (no store, context or stream
+#   writer) is passed as an explicit `runtime=` keyword, which RunnableCallable leaves as given.
+#
+# Send, Command, interrupts, checkpointers and node retry/cache policies are not supported; use
+# `builder.compile()` for those. The benchmark measures graph overhead per node on a wide graph
+# (fan-out to 100 branches and a join) and a deep one (1,000 nodes chained with conditional
+# edges), built with the same `add_node`/`add_conditional_edges` API, and then the wide graph
+# with simulated I/O in each branch.
+#
+# Usage:
+#   python 35-langgraph-superstep-executor.py            # no API key required
+#   python 35-langgraph-superstep-executor.py --width 200 --depth 2000 --io-ms 50
+
+import argparse
+import asyncio
+import operator
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Literal
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.channels.binop import BinaryOperatorAggregate
+from langgraph.errors import EmptyChannelError, GraphRecursionError, InvalidUpdateError
+from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.runtime import DEFAULT_RUNTIME
+from typing_extensions import TypedDict
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+# --- Step 1: Reading the plan from a StateGraph builder ---
+def _plain(runnable):
+    """(sync, async, injected): the node's own functions when it takes only the state, else the
+    runnable's invoke/ainvoke plus the `runtime` arguments to pass it. RunnableCallable keeps
+    keyword arguments that are already set, so the default Runtime goes in through public kwargs."""
+    if not hasattr(runnable, "func_accepts"):
+        return runnable.invoke, runnable.ainvoke, {}
+    if not runnable.func_accepts:
+        return runnable.func, runnable.afunc, None
+    injected = {}
+    for kw, (runtime_key, _) in runnable.func_accepts.items():
+        if kw == "runtime":
+            injected[kw] = DEFAULT_RUNTIME
+        elif kw not in ("config", "error") and hasattr(DEFAULT_RUNTIME, runtime_key):
+            injected[kw] = getattr(DEFAULT_RUNTIME, runtime_key)
+    return runnable.invoke, runnable.ainvoke, injected
+
+
+def _call(node, state, config):
+    func, _, injected = node
+    return func(state) if injected is None else func(state, config, **injected)
+
+
+async def _acall(node, state, config):
+    func, afunc, injected = node
+    if injected is not None:
+        return await afunc(state, config, **injected)
+    return func(state) if func is not None else await afunc(state)
+
+
+class SuperstepExecutor:
+    def __init__(self, builder, max_workers=None, recursion_limit=25):
+        builder.validate()
+        self.nodes = {name: _plain(spec.runnable) for name, spec in builder.nodes.items()}
+        self.edges = {}
+        for start, end in builder.edges:
+            self.edges.setdefault(start, []).append(end)
+        self.branches = {
+            source: [(_plain(branch.path), branch.ends) for branch in branches.values()]
+            for source, branches in builder.branches.items()
+        }
+        self.joins = {}
+        for starts, end in builder.waiting_edges:
+            for start in starts:
+                self.joins.setdefault(start, []).append((frozenset(starts), end))
+        self.reducers, self.empty = {}, {}
+        for key, channel in builder.channels.items():
+            if isinstance(channel, BinaryOperatorAggregate):
+                self.reducers[key] = channel.operator
+                try:
+                    self.empty[key] = channel.get()
+                except EmptyChannelError:
+                    pass
+        self.keys = set(builder.channels)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.recursion_limit = recursion_limit
+        self.stats = {"supersteps": 0, "nodes": 0, "parallel_nodes": 0}
+
+    def close(self):
+        self.pool.shutdown()
+
+    # --- Step 2: Merging updates through reducers ---
+    def _merge(self, state, updates):
+        changes = {}
+        # In node-name order, as LangGraph applies a superstep's writes, so reducers see the same order
+        for name, update in sorted(updates, key=lambda item: item[0]):
+            if update is None:
+                continue
+            if not isinstance(update, dict):
+                raise InvalidUpdateError(f"Node {name} returned {type(update).__name__}; only dict updates are supported here")
+            for key, value in update.items():
+                if key not in self.keys:
+                    raise InvalidUpdateError(f"Node {name} wrote to unknown key {key!r}")
+                reducer = self.reducers.get(key)
+                if reducer is not None:
+                    current = changes[key] if key in changes else state.get(key, self.empty.get(key))
+                    changes[key] = value if current is None else reducer(current, value)
+                elif key in changes:
+                    raise InvalidUpdateError(f"Key {key!r} got several values in one superstep; give it a reducer")
+                else:
+                    changes[key] = value
+        # A new dict with the changed keys; unchanged values are shared, not copied
+        return {**state, **changes} if changes else state
+
+    def _targets(self, route, ends):
+        for target in [route] if isinstance(route, str) else route:
+            target = ends[target] if ends else target
+            if target != END:
+                yield target
+
+    def _next(self, state, done, arrived, routes):
+        frontier = {}
+        for name in done:
+            for end in self.edges.get(name, ()):
+                frontier[end] = None
+            for starts, end in self.joins.get(name, ()):
+                waiting = arrived.setdefault((starts, end), set())
+                waiting.add(name)
+                if waiting == starts:
+                    waiting.clear()
+                    frontier[end] = None
+            for route, ends in routes.get(name, ()):
+                for target in self._targets(route, ends):
+                    frontier[target] = None
+        frontier.pop(END, None)
+        return list(frontier)
+
+    def _route(self, state, names, config):
+        return {
+            name: [(_call(path, state, config), ends) for path, ends in self.branches[name]]
+            for name in names if name in self.branches
+        }
+
+    async def _aroute(self, state, names, config):
+        routes = {}
+        for name in names:
+            for path, ends in self.branches.get(name, ()):
+                routes.setdefault(name, []).append((await _acall(path, state, config), ends))
+        return routes
+
+    def _count(self, frontier, step, recursion_limit):
+        if step > recursion_limit:
+            raise GraphRecursionError(f"Recursion limit of {recursion_limit} reached without hitting a stop condition.")
+        self.stats["supersteps"] += 1
+        self.stats["nodes"] += len(frontier)
+        if len(frontier) > 1:
+            self.stats["parallel_nodes"] += len(frontier)
+
+    def _output(self, state):
+        return {key: value for key, value in state.items() if key in self.keys}
+
+    # --- Step 3: Running supersteps on threads or on the event loop ---
+    def invoke(self, input, config=None, recursion_limit=None):
+        recursion_limit = recursion_limit or self.recursion_limit
+        state = self._merge({}, [(START, input)])
+        arrived = {}
+        frontier = self._next(state, [START], arrived, self._route(state, [START], config))
+        step = 0
+        while frontier:
+            step += 1
+            self._count(frontier, step, recursion_limit)
+            if len(frontier) == 1:
+                name = frontier[0]
+                updates = [(name, _call(self.nodes[name], state, config))]
+            else:
+                futures = [(name, self.pool.submit(_call, self.nodes[name], state, config)) for name in frontier]
+                updates = [(name, future.result()) for name, future in futures]
+            state = self._merge(state, updates)
+            frontier = self._next(state, frontier, arrived, self._route(state, frontier, config))
+        return self._output(state)
+
+    async def _arun(self, name, state, config):
+        node = self.nodes[name]
+        func, _, injected = node
+        if injected is not None or func is None:
+            return await _acall(node, state, config)
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, state)
+
+    async def ainvoke(self, input, config=None, recursion_limit=None):
+        recursion_limit = recursion_limit or self.recursion_limit
+        state = self._merge({}, [(START, input)])
+        arrived = {}
+        frontier = self._next(state, [START], arrived, await self._aroute(state, [START], config))
+        step = 0
+        while frontier:
+            step += 1
+            self._count(frontier, step, recursion_limit)
+            if len(frontier) == 1:
+                updates = [(frontier[0], await _acall(self.nodes[frontier[0]], state, config))]
+            else:
+                results = await asyncio.gather(*(self._arun(name, state, config) for name in frontier))
+                updates = list(zip(frontier, results))
+            state = self._merge(state, updates)
+            frontier = self._next(state, frontier, arrived, await self._aroute(state, frontier, config))
+        return self._output(state)
+
+
+# --- Step 4: Script 12's graph, and synthetic wide and deep graphs ---
+class State(TypedDict):
+    graph_state: str
+
+
+def node_1(state):
+    return {"graph_state": state["graph_state"] + " AGI"}
+
+
+def node_2(state):
+    return {"graph_state": state["graph_state"] + " Achieved!"}
+
+
+def node_3(state):
+    return {"graph_state": state["graph_state"] + " Not Achieved :("}
+
+
+def decide_mood(state) -> Literal["node_2", "node_3"]:
+    if random.random() < 0.5:
+        return "node_2"
+    return "node_3"
+
+
+def build_mood_graph():
+    builder = StateGraph(State)
+    builder.add_node("node_1", node_1)
+    builder.add_node("node_2", node_2)
+    builder.add_node("node_3", node_3)
+    builder.add_edge(START, "node_1")
+    builder.add_conditional_edges("node_1", decide_mood)
+    builder.add_edge("node_2", END)
+    builder.add_edge("node_3", END)
+    return builder
+
+
+def multiply(a: int, b: int) -> int:
+    """Multiplies two integers."""
+    return a * b
+
+
+def fake_tool_calling_llm(state: MessagesState):
+    # Stands in for script 14's model: asks for `multiply` on "Multiply a and b", else answers
+    text = state["messages"][-1].content
+    numbers = [int(word) for word in text.split() if word.isdigit()]
+    if text.startswith("Multiply") and len(numbers) == 2:
+        call = {"name": "multiply", "args": {"a": numbers[0], "b": numbers[1]}, "id": "call_1"}
+        return {"messages": [AIMessage(content="", tool_calls=[call])]}
+    return {"messages": [AIMessage(content="Hello! How can I help you?")]}
+
+
+def build_tool_graph():
+    # Script 14's graph: the model node, ToolNode([multiply]) and tools_condition
+    builder = StateGraph(MessagesState)
+    builder.add_node("tool_calling_llm", fake_tool_calling_llm)
+    builder.add_node("tools", ToolNode([multiply]))
+    builder.add_edge(START, "tool_calling_llm")
+    builder.add_conditional_edges("tool_calling_llm", tools_condition)
+    builder.add_edge("tools", END)
+    return builder
+
+
+class WideState(TypedDict):
+    question: str
+    results: Annotated[list, operator.add]
+    total: int
+
+
+def build_wide_graph(width, io_seconds=0.0, use_async=False):
+    """fan_out -> branch_0 .. branch_{width-1} -> join."""
+    builder = StateGraph(WideState)
+    names = [f"branch_{i}" for i in range(width)]
+
+    def make_branch(i):
+        if use_async:
+            async def branch(state):
+                if io_seconds:
+                    await asyncio.sleep(io_seconds)
+                return {"results": [i]}
+        else:
+            def branch(state):
+                if io_seconds:
+                    time.sleep(io_seconds)
+                return {"results": [i]}
+        return branch
+
+    builder.add_node("fan_out", lambda state: {"results": []})
+    for i, name in enumerate(names):
+        builder.add_node(name, make_branch(i))
+    builder.add_node("join", lambda state: {"total": sum(state["results"])})
+    builder.add_edge(START, "fan_out")
+    builder.add_conditional_edges("fan_out", lambda state: names, names)
+    builder.add_edge(names, "join")
+    builder.add_edge("join", END)
+    return builder
+
+
+class DeepState(TypedDict):
+    step: int
+    visited: Annotated[int, operator.add]
+
+
+def build_deep_graph(depth):
+    """node_0 -> node_1 -> ... -> node_{depth-1}, each hop a conditional edge."""
+    builder = StateGraph(DeepState)
+
+    def step(state):
+        return {"step": state["step"] + 1, "visited": 1}
+
+    def route(state):
+        return f"node_{state['step']}" if state["step"] < depth else END
+
+    for i in range(depth):
+        builder.add_node(f"node_{i}", step)
+        builder.add_conditional_edges(f"node_{i}", route)
+    builder.add_edge(START, "node_0")
+    return builder
+
+
+# --- Step 5: Benchmark ---
+def measure(label, run, nodes, rounds):
+    run()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = run()
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"  {label:<32} {elapsed * 1000:9.2f} ms {elapsed / nodes * 1e6:9.1f} us/node")
+    return result
+
+
+def compare(builder, input, nodes, rounds, async_builder=None):
+    limit = nodes + 10
+    graph = builder.compile()
+    executor = SuperstepExecutor(builder, max_workers=64, recursion_limit=limit)
+    async_executor = SuperstepExecutor(async_builder or builder, max_workers=64, recursion_limit=limit)
+    config = {"recursion_limit": limit}
+    results = [
+        measure("builder.compile().invoke", lambda: graph.invoke(input, config), nodes, rounds),
+        measure("SuperstepExecutor.invoke", lambda: executor.invoke(input), nodes, rounds),
+        measure("SuperstepExecutor.ainvoke", lambda: asyncio.run(async_executor.ainvoke(input)), nodes, rounds),
+    ]
+    executor.close()
+    async_executor.close()
+    assert all(result == results[0] for result in results), "executors disagree"
+    return results[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Superstep executor for LangGraph StateGraphs")
+    parser.add_argument("--width", type=int, default=100, help="Branches in the wide graph")
+    parser.add_argument("--depth", type=int, default=1000, help="Nodes in the deep graph")
+    parser.add_argument("--io-ms", type=float, default=20, help="Simulated I/O per branch in the last benchmark")
+    parser.add_argument("--rounds", type=int, default=20, help="Runs per measurement")
+    args = parser.parse_args()
+
+    # Script 12's graph, run by the executor
+    executor = SuperstepExecutor(build_mood_graph())
+    print("Script 12's graph:")
+    for _ in range(3):
+        print(f"  {executor.invoke({'graph_state': 'Has AGI been achieved?'})}")
+    executor.close()
+
+    # Script 14's graph: ToolNode asks for config and runtime, which the executor provides
+    executor = SuperstepExecutor(build_tool_graph())
+    print("Script 14's graph:")
+    for text in ["Multiply 3 and 2", "Hello world!"]:
+        result = executor.invoke({"messages": [HumanMessage(content=text)]})
+        print(f"  {text!r} -> {result['messages'][-1].content!r}")
+    result = asyncio.run(executor.ainvoke({"messages": [HumanMessage(content="Multiply 6 and 7")]}))
+    print(f"  'Multiply 6 and 7' (ainvoke) -> {result['messages'][-1].content!r}")
+    executor.close()
+    print()
+
+    question = {"question": "Has AGI been achieved?"}
+    nodes = args.width + 2
+    print(f"Wide graph: fan-out to {args.width} branches and a join ({nodes} nodes, 3 supersteps)")
+    compare(build_wide_graph(args.width), question, nodes, args.rounds, build_wide_graph(args.width, use_async=True))
+
+    print(f"\nDeep graph: {args.depth} nodes chained with conditional edges ({args.depth} supersteps)")
+    result = compare(build_deep_graph(args.depth), {"step": 0}, args.depth, max(1, args.rounds // 4))
+    print(f"  visited {result['visited']} nodes")
+
+    io = args.io_ms / 1000
+    print(f"\nWide graph with {args.io_ms:g} ms of I/O per branch (sequential would be {io * args.width * 1000:.0f} ms)")
+    compare(
+        build_wide_graph(args.width, io), question, nodes, max(1, args.rounds // 4),
+        build_wide_graph(args.width, io, use_async=True),
+    )
+
+
+if __name__ == "__main__":
+    main()
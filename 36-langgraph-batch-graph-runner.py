@@ -0,0 +1,397 @@
+# Example: High-throughput batch invocation of one compiled LangGraph graph
+# Scripts 12-14 call `graph.invoke(...)` once per input, so a thousand inputs take a thousand
+# model round-trips back to back. This script pushes many independent states through one compiled
+# graph (script 14's tool-calling graph) at once:
+#
+# - BatchGraphRunner.astream(inputs) takes a list, a generator or an async stream of inputs and
+#   runs them with bounded parallelism (`max_concurrency` workers fed through a bounded queue, so a
+#   long stream is not read ahead). Results come back in completion order, or in input order with
+#   `ordered=True`, optionally with exceptions as results instead of raising.
+# - CoalescingChatModel sits in front of the model: calls from the in-flight states that arrive
+#   within `max_wait` seconds (or until `max_batch` are waiting) and share the same bound tools and
+#   parameters are sent as one provider batch request. The provider here is a fake endpoint that
+#   accepts a list of conversations, like the multi-prompt completion endpoints of self-hosted
+#   servers, and limits in-flight requests as a rate limit would. `RunnableProvider` adapts any
+#   chat model (e.g. ChatGroq) by sending the batch with `abatch`, which doesn't cut requests but
+#   keeps the same interface.
+# - The runner reports per-node calls, mean time and throughput (from the graph's "updates"
+#   stream), queueing delay before a worker picks an input up, end-to-end latency, and the
+#   coalescer's requests and batch sizes.
+#
+# The benchmark compares a serial `graph.invoke` loop (on a sample, extrapolated), the runner
+# without coalescing, and the runner with coalescing.
+#
+# Usage:
+#   python 36-langgraph-batch-graph-runner.py                       # no API key required
+#   python 36-langgraph-batch-graph-runner.py --items 5000 --concurrency 256 --max-batch 64
+#   python 36-langgraph-batch-graph-runner.py --groq --items 20     # ChatGroq (requires GROQ_API_KEY)
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.prebuilt import ToolNode, tools_condition
+from pydantic import PrivateAttr
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# --- Step 1: Providers that take a list of conversations per request ---
+class FakeBatchProvider:
+    """A fake endpoint: each request costs `latency` plus `per_item` per conversation in it.
+
+    At most `max_inflight` requests run at once. The model answers like script 14's: a tool
+    call for "Multiply a and b" when tools are bound, a greeting otherwise.
+    """
+
+    def __init__(self, latency=0.05, per_item=0.0005, max_inflight=8):
+        self.latency = latency
+        self.per_item = per_item
+        self.max_inflight = max_inflight
+        self.requests = 0
+        self.conversations = 0
+        self._semaphore = None
+
+    def _answer(self, messages, kwargs):
+        words = messages[-1].content.split()
+        if kwargs.get("tools") and len(words) == 4 and words[0] == "Multiply":
+            args = {"a": int(words[1]), "b": int(words[3])}
+            return AIMessage(content="", tool_calls=[{"name": "multiply", "args": args, "id": f"call_{words[1]}_{words[3]}"}])
+        return AIMessage(content="Hello! How can I help you today?")
+
+    def complete(self, batch, kwargs):
+        self.requests += 1
+        self.conversations += len(batch)
+        time.sleep(self.latency + self.per_item * len(batch))
+        return [self._answer(messages, kwargs) for messages in batch]
+
+    async def acomplete(self, batch, kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        async with self._semaphore:
+            self.requests += 1
+            self.conversations += len(batch)
+            await asyncio.sleep(self.latency + self.per_item * len(batch))
+        return [self._answer(messages, kwargs) for messages in batch]
+
+
+class RunnableProvider:
+    """Sends a batch through a regular chat model's `batch`/`abatch` (one request per conversation)."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.requests = 0
+        self.conversations = 0
+
+    def complete(self, batch, kwargs):
+        self.requests += len(batch)
+        self.conversations += len(batch)
+        return self.llm.bind(**kwargs).batch(batch)
+
+    async def acomplete(self, batch, kwargs):
+        self.requests += len(batch)
+        self.conversations += len(batch)
+        return await self.llm.bind(**kwargs).abatch(batch)
+
+
+# --- Step 2: Coalescing concurrent calls into provider batch requests ---
+class CoalescingChatModel(BaseChatModel):
+    provider: object
+    max_batch: int = 32
+    max_wait: float = 0.005
+    _pending: dict = PrivateAttr(default_factory=dict)
+    _timers: dict = PrivateAttr(default_factory=dict)
+    _sending: set = PrivateAttr(default_factory=set)
+    _stats: dict = PrivateAttr(default_factory=lambda: {"batches": 0, "calls": 0, "wait": 0.0})
+
+    @property
+    def _llm_type(self) -> str:
+        return "coalescing"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Sync callers (a plain `graph.invoke` loop) have nothing to coalesce with
+        self._stats["batches"] += 1
+        self._stats["calls"] += 1
+        message = self.provider.complete([messages], {**kwargs, "stop": stop} if stop else kwargs)[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Calls only share a request when every request parameter, stop sequences included, matches
+        key = json.dumps({**kwargs, "stop": stop} if stop else kwargs, sort_keys=True, default=str)
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((messages, future, time.perf_counter()))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        message = await future
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            # The loop only keeps a weak reference to tasks; hold on to it until it finishes
+            task = asyncio.ensure_future(self._send(batch, json.loads(key)))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch, kwargs):
+        now = time.perf_counter()
+        self._stats["batches"] += 1
+        self._stats["calls"] += len(batch)
+        self._stats["wait"] += sum(now - queued for _, _, queued in batch)
+        try:
+            messages = await self.provider.acomplete([messages for messages, _, _ in batch], kwargs)
+            if len(messages) != len(batch):
+                # zip() would leave the tail of the batch waiting forever, or pair the wrong answers
+                raise ValueError(f"Provider returned {len(messages)} completions for a batch of {len(batch)}")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), message in zip(batch, messages):
+            if not future.done():
+                future.set_result(message)
+
+    def coalescing_stats(self):
+        stats = self._stats
+        return {
+            "requests": stats["batches"],
+            "calls": stats["calls"],
+            "mean_batch": stats["calls"] / max(1, stats["batches"]),
+            "mean_wait_ms": stats["wait"] / max(1, stats["calls"]) * 1000,
+        }
+
+
+# --- Step 3: The batch runner ---
+class BatchGraphRunner:
+    def __init__(self, graph, max_concurrency=64, buffer=None):
+        self.graph = graph
+        self.max_concurrency = max_concurrency
+        self.buffer = buffer or max_concurrency * 2
+        self.node_calls = {}
+        self.node_time = {}
+        self.queue_delays = []
+        self.latencies = []
+        self.elapsed = 0.0
+
+    async def _run_one(self, input, config):
+        state, last = None, time.perf_counter()
+        async for mode, chunk in self.graph.astream(input, config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                state = chunk
+                continue
+            now = time.perf_counter()
+            # Nodes of one superstep that finish together share the time since the last update
+            for node in chunk:
+                self.node_calls[node] = self.node_calls.get(node, 0) + 1
+                self.node_time[node] = self.node_time.get(node, 0.0) + (now - last) / len(chunk)
+            last = now
+        return state
+
+    async def astream(self, inputs, config=None, ordered=False, return_exceptions=False):
+        """Yields (index, output) as inputs finish; in input order with `ordered=True`."""
+        queue = asyncio.Queue(self.buffer)
+        done = asyncio.Queue()
+        started = time.perf_counter()
+
+        async def feed():
+            try:
+                if hasattr(inputs, "__aiter__"):
+                    index = 0
+                    async for input in inputs:
+                        await queue.put((index, input, time.perf_counter()))
+                        index += 1
+                else:
+                    for index, input in enumerate(inputs):
+                        await queue.put((index, input, time.perf_counter()))
+            except Exception as e:
+                # A failing input source is raised to the consumer, whatever return_exceptions says
+                await done.put((None, e, True))
+            finally:
+                # Always release the workers, or they (and the consumer) would wait forever
+                for _ in range(self.max_concurrency):
+                    await queue.put(None)
+
+        async def worker():
+            while (job := await queue.get()) is not None:
+                index, input, queued = job
+                start = time.perf_counter()
+                self.queue_delays.append(start - queued)
+                try:
+                    output = await self._run_one(input, config)
+                except Exception as e:
+                    if not return_exceptions:
+                        await done.put((index, e, True))
+                        break
+                    output = e
+                self.latencies.append(time.perf_counter() - queued)
+                await done.put((index, output, False))
+            await done.put(None)
+
+        tasks = [asyncio.create_task(feed())] + [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        waiting, next_index, running = {}, 0, self.max_concurrency
+        try:
+            while running:
+                item = await done.get()
+                if item is None:
+                    running -= 1
+                    continue
+                index, output, failed = item
+                if failed:
+                    raise output
+                if not ordered:
+                    yield index, output
+                    continue
+                waiting[index] = output
+                while next_index in waiting:
+                    yield next_index, waiting.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.elapsed += time.perf_counter() - started
+
+    async def abatch(self, inputs, config=None, return_exceptions=False):
+        return [output async for _, output in self.astream(inputs, config, ordered=True, return_exceptions=return_exceptions)]
+
+    def report(self):
+        print(f"  {'node':<20} {'calls':>7} {'mean ms':>9} {'calls/s':>9}")
+        for node, calls in self.node_calls.items():
+            print(f"  {node:<20} {calls:7d} {self.node_time[node] / calls * 1000:9.2f} {calls / self.elapsed:9.0f}")
+        print(
+            f"  queueing p50/p99 {percentile(self.queue_delays, 50) * 1000:.1f}/{percentile(self.queue_delays, 99) * 1000:.1f} ms,"
+            f" latency p50/p99 {percentile(self.latencies, 50) * 1000:.1f}/{percentile(self.latencies, 99) * 1000:.1f} ms"
+        )
+
+
+# --- Step 4: Script 14's graph with a sync and an async model node ---
+def multiply(a: int, b: int) -> int:
+    """Multiplies two integers."""
+    return a * b
+
+
+def build_graph(llm):
+    llm_with_tools = llm.bind_tools([multiply])
+
+    def tool_calling_llm(state: MessagesState):
+        return {"messages": [llm_with_tools.invoke(state["messages"])]}
+
+    async def atool_calling_llm(state: MessagesState):
+        return {"messages": [await llm_with_tools.ainvoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("tool_calling_llm", RunnableLambda(tool_calling_llm, afunc=atool_calling_llm, name="tool_calling_llm"))
+    builder.add_node("tools", ToolNode([multiply]))
+    builder.add_edge(START, "tool_calling_llm")
+    builder.add_conditional_edges("tool_calling_llm", tools_condition)
+    builder.add_edge("tools", END)
+    return builder.compile()
+
+
+def make_inputs(n, seed=0):
+    rng = random.Random(seed)
+    inputs = []
+    for _ in range(n):
+        text = f"Multiply {rng.randint(1, 99)} and {rng.randint(1, 99)}" if rng.random() < 0.7 else "Hello!"
+        inputs.append({"messages": [HumanMessage(content=text)]})
+    return inputs
+
+
+def check(input, output):
+    words = input["messages"][0].content.split()
+    expected = str(int(words[1]) * int(words[3])) if words[0] == "Multiply" else "Hello! How can I help you today?"
+    return output["messages"][-1].content == expected
+
+
+# --- Step 5: Benchmark ---
+async def collect(runner, inputs, ordered=False):
+    return [item async for item in runner.astream(inputs, ordered=ordered)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch invocation of a compiled LangGraph graph")
+    parser.add_argument("--items", type=int, default=2000, help="Inputs to push through the graph")
+    parser.add_argument("--serial-items", type=int, default=50, help="Inputs for the serial invoke loop")
+    parser.add_argument("--concurrency", type=int, default=128, help="States in flight at once")
+    parser.add_argument("--max-batch", type=int, default=32, help="Most model calls per provider request")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="Longest a model call waits for a batch")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider latency per request (seconds)")
+    parser.add_argument("--max-inflight", type=int, default=8, help="Fake provider's concurrent request limit")
+    parser.add_argument("--groq", action="store_true", help="Run a small batch through ChatGroq instead")
+    args = parser.parse_args()
+
+    if args.groq:
+        from langchain_groq import ChatGroq
+
+        llm = CoalescingChatModel(provider=RunnableProvider(ChatGroq(model="llama-3.1-8b-instant")))
+        runner = BatchGraphRunner(build_graph(llm), max_concurrency=args.concurrency)
+        for index, output in asyncio.run(collect(runner, make_inputs(args.items), ordered=True)):
+            print(f"{index:3d}: {output['messages'][-1].content[:80]!r}")
+        runner.report()
+        return
+
+    inputs = make_inputs(args.items)
+    print(f"{args.items} inputs through script 14's graph; provider: {args.latency * 1000:g} ms per request, at most {args.max_inflight} in flight\n")
+
+    provider = FakeBatchProvider(args.latency, max_inflight=args.max_inflight)
+    graph = build_graph(CoalescingChatModel(provider=provider))
+    sample = inputs[: args.serial_items]
+    start = time.perf_counter()
+    outputs = [graph.invoke(input) for input in sample]
+    per_item = (time.perf_counter() - start) / len(sample)
+    print(f"serial graph.invoke loop ({len(sample)} items): {1 / per_item:8.1f} items/s, ~{per_item * args.items:.1f}s for all")
+    print(f"  correct {sum(map(check, sample, outputs))}/{len(sample)}, provider requests per item {provider.requests / len(sample):.2f}\n")
+
+    for label, max_batch in [("runner, one request per call", 1), (f"runner, coalescing up to {args.max_batch}", args.max_batch)]:
+        provider = FakeBatchProvider(args.latency, max_inflight=args.max_inflight)
+        llm = CoalescingChatModel(provider=provider, max_batch=max_batch, max_wait=args.max_wait_ms / 1000 if max_batch > 1 else 0)
+        runner = BatchGraphRunner(build_graph(llm), max_concurrency=args.concurrency)
+        results = asyncio.run(collect(runner, inputs))
+        correct = sum(check(inputs[index], output) for index, output in results)
+        in_order = all(results[i][0] < results[i + 1][0] for i in range(len(results) - 1))
+        print(f"{label}: {len(results) / runner.elapsed:8.1f} items/s, {runner.elapsed:.2f}s")
+        print(f"  correct {correct}/{len(results)}, completion order differs from input order: {not in_order}")
+        stats = llm.coalescing_stats()
+        print(
+            f"  provider requests {stats['requests']} ({stats['requests'] / len(results):.2f} per item),"
+            f" mean batch {stats['mean_batch']:.1f}, mean coalescing wait {stats['mean_wait_ms']:.1f} ms"
+        )
+        runner.report()
+        print()
+
+    # Input order is kept on request, at the cost of holding finished results back
+    runner = BatchGraphRunner(build_graph(CoalescingChatModel(provider=FakeBatchProvider(args.latency), max_batch=args.max_batch)), args.concurrency)
+    ordered = asyncio.run(collect(runner, inputs[:200], ordered=True))
+    print(f"ordered=True on 200 items: indexes in order: {[index for index, _ in ordered] == list(range(200))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+# Example: Token-budgeted conversation history with incremental background summaries
+# Script 03 builds the message list by hand, and scripts 13 and 14 let `MessagesState["messages"]`
+# grow without limit, so every turn resends the whole conversation: tokens sent, cost and prompt
+# processing time grow linearly with its length. This script adds HistoryManager:
+#
+# - A running token count: each message is counted once when it is added, and the total is kept
+#   up to date, instead of recounting the whole list every turn (as `trim_messages` does).
+# - When the history passes `trigger` (a fraction of the budget), the oldest turns are folded into
+#   a summary in a background thread, while the conversation goes on. Summaries are incremental:
+#   only the previous summary and the newly folded messages go to the model, never the whole
+#   history. Until the summary arrives, `context()` still fits the budget by leaving out the oldest
+#   unpinned messages. A failed summary call (a 429, say) leaves the history unfolded and is
+#   retried after a growing delay; the failures are counted in `stats`.
+# - System messages are pinned, and so are tool exchanges (the AI message with the tool calls and
+#   its tool messages, kept together so the history stays valid for the provider): tool results
+#   are exact values a summary might garble. Once pinned tool exchanges take more than
+#   `max_pinned_tool_tokens`, the oldest become foldable again.
+#
+# The benchmark replays a synthetic 500-turn conversation (with a tool exchange every few turns)
+# against a fake model whose latency grows with the prompt length, and compares the full history
+# (scripts 13/14), `trim_messages` every turn, and HistoryManager with inline and with background
+# summaries: per-turn latency, tokens sent per turn and in total (summary calls included), and
+# time spent keeping the history per turn (which includes the summary calls when they are inline).
+#
+# Usage:
+#   python 37-langchain-history-budget.py                  # no API key required
+#   python 37-langchain-history-budget.py --turns 1000 --budget 4000
+#   python 37-langchain-history-budget.py --chat           # chat with ChatGroq (requires GROQ_API_KEY)
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep a running summary of a conversation. Update the summary with the new messages, "
+    "keeping any facts the user may ask about later. Reply with the updated summary only."
+)
+
+
+def _is_tool_exchange(message):
+    return isinstance(message, ToolMessage) or (isinstance(message, AIMessage) and bool(message.tool_calls))
+
+
+def _render(messages):
+    return "\n".join(f"{message.type}: {message.content}" for message in messages if message.content)
+
+
+# --- Step 1: The history manager ---
+class HistoryManager:
+    def __init__(self, llm, budget=3000, trigger=0.8, target=0.5, keep_recent=6, max_pinned_tool_tokens=None,
+                 token_counter=count_tokens_approximately, background=True, retry_after=5.0):
+        self.llm = llm
+        self.budget = budget
+        self.trigger = int(budget * trigger)
+        self.target = int(budget * target)
+        self.keep_recent = keep_recent
+        self.max_pinned_tool_tokens = budget // 4 if max_pinned_tool_tokens is None else max_pinned_tool_tokens
+        self.count = lambda message: token_counter([message])
+        self.system = []  # [(message, tokens)]
+        self.entries = []  # [(message, tokens, pinned)]
+        self.summary = None
+        self.summary_tokens = 0
+        self.total = 0
+        self.pending = None  # (future, number of leading entries it covers, messages folded)
+        self.pool = ThreadPoolExecutor(max_workers=1) if background else None
+        # After a failed summary call (a 429, a timeout), wait before trying again, twice as long
+        # after each further failure
+        self.retry_after = retry_after
+        self.retry_at = 0.0
+        self.failures = 0
+        self.last_error = None
+        self.stats = {"summaries": 0, "summary_tokens_sent": 0, "folded_messages": 0, "failed_summaries": 0}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def add(self, *messages):
+        for message in messages:
+            tokens = self.count(message)
+            if isinstance(message, SystemMessage):
+                self.system.append((message, tokens))
+            else:
+                self.entries.append((message, tokens, _is_tool_exchange(message)))
+            self.total += tokens
+        self._apply()
+        self._maybe_summarize()
+
+    def context(self):
+        """The messages to send: pinned system messages, the summary and as much recent history as fits."""
+        self._apply()
+        entries = self.entries
+        over = self.total - self.budget
+        if over > 0:
+            # The latest user turn is always sent; if it can't fit next to the system messages,
+            # trimming older history won't help
+            last = max((i for i, (message, _, _) in enumerate(entries) if isinstance(message, HumanMessage)), default=len(entries))
+            required = sum(tokens for _, tokens in self.system) + sum(tokens for _, tokens, _ in entries[last:])
+            if required > self.budget:
+                raise ValueError(f"The latest turn needs {required} tokens with the system messages, over the {self.budget}-token budget")
+            # A summary is still on its way (or can't shrink things enough): leave out the oldest
+            # unpinned messages for this turn, and the rest of their turn up to the next user message
+            kept, skipping = [], True
+            for message, tokens, pinned in entries[:last]:
+                if skipping and over > 0 and not pinned:
+                    over -= tokens
+                    continue
+                if skipping and not isinstance(message, HumanMessage) and not pinned:
+                    continue
+                skipping = False
+                kept.append((message, tokens, pinned))
+            entries = kept + entries[last:]
+        summary = [self.summary] if self.summary is not None else []
+        return [message for message, _ in self.system] + summary + [message for message, _, _ in entries]
+
+    # --- Step 2: Choosing what to fold, and folding it in the background ---
+    def _foldable(self):
+        """How many leading entries to fold, and which of them (the unpinned ones)."""
+        pinned_tool_tokens = sum(tokens for _, tokens, pinned in self.entries if pinned)
+        end = max(0, len(self.entries) - self.keep_recent)
+        # Only whole turns are folded, so a turn is never split between the summary and the history
+        while 0 < end < len(self.entries) and not isinstance(self.entries[end][0], HumanMessage):
+            end -= 1
+        freed, folded, count, fold_exchange = 0, [], 0, False
+        for message, tokens, pinned in self.entries[:end]:
+            if isinstance(message, HumanMessage) and self.total - freed <= self.target:
+                break
+            count += 1
+            if pinned:
+                if isinstance(message, AIMessage):
+                    # A tool exchange is kept or folded as a whole
+                    fold_exchange = pinned_tool_tokens > self.max_pinned_tool_tokens
+                if not fold_exchange:
+                    continue
+                pinned_tool_tokens -= tokens
+            freed += tokens
+            folded.append(message)
+        return count, folded
+
+    def _maybe_summarize(self):
+        if self.pending is None and self.total > self.trigger and time.monotonic() >= self.retry_at:
+            self._start_summary()
+
+    def _start_summary(self):
+        count, folded = self._foldable()
+        if not folded:
+            return
+        previous = self.summary.content if self.summary is not None else "(none yet)"
+        request = [
+            SystemMessage(content=SUMMARY_INSTRUCTIONS),
+            HumanMessage(content=f"Summary so far: {previous}\n\nNew messages:\n{_render(folded)}"),
+        ]
+        self.stats["summaries"] += 1
+        self.stats["summary_tokens_sent"] += count_tokens_approximately(request)
+        if self.pool is None:
+            try:
+                self.pending = (_Done(self.llm.invoke(request)), count, folded)
+            except Exception as e:
+                self.pending = (_Done(error=e), count, folded)
+            self._apply()
+        else:
+            self.pending = (self.pool.submit(self.llm.invoke, request), count, folded)
+
+    def _apply(self):
+        if self.pending is None or not self.pending[0].done():
+            return
+        future, count, folded = self.pending
+        self.pending = None
+        try:
+            summary = future.result()
+        except Exception as e:
+            # Keep the entries unfolded (context() still fits the budget without them) and retry later
+            self.failures += 1
+            self.last_error = e
+            self.retry_at = time.monotonic() + self.retry_after * 2 ** min(self.failures - 1, 4)
+            self.stats["failed_summaries"] += 1
+            return
+        self.failures = 0
+        folded_ids = {id(message) for message in folded}
+        kept = [entry for entry in self.entries[:count] if id(entry[0]) not in folded_ids]
+        self.total -= sum(tokens for message, tokens, _ in self.entries[:count] if id(message) in folded_ids)
+        self.entries = kept + self.entries[count:]
+        self.summary = SystemMessage(content=f"Summary of the earlier conversation: {summary.content}")
+        self.total += self.count(self.summary) - self.summary_tokens
+        self.summary_tokens = self.count(self.summary)
+        self.stats["folded_messages"] += len(folded)
+        self._maybe_summarize()
+
+
+class _Done:
+    """A finished future, for inline summaries."""
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+
+    def done(self):
+        return True
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+# --- Step 3: A fake model whose latency grows with the prompt ---
+class FakeChatLLM(BaseChatModel):
+    """Sleeps `base + per_input_token * prompt tokens + per_output_token * reply tokens`."""
+
+    base: float = 0.005
+    per_input_token: float = 0.000002
+    per_output_token: float = 0.0002
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        input_tokens = sum(len(message.content) for message in messages) // 4
+        text = messages[-1].content
+        if messages[0].content == SUMMARY_INSTRUCTIONS:
+            # Keep the summary bounded: the newest ~120 words of the old summary and the new messages
+            words = [line.split(": ", 1)[-1].split()[:8] for line in text.splitlines()]
+            content = " ".join(" ".join(w) for w in words if w).split()[-120:]
+            content = " ".join(content)
+        else:
+            content = f"About '{text[:40]}': " + "it depends on the details, but in short the answer is yes. " * 4
+        output_tokens = len(content) // 4
+        time.sleep(self.base + self.per_input_token * input_tokens + self.per_output_token * output_tokens)
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# --- Step 4: A synthetic conversation and the ways to keep its history ---
+def make_conversation(turns, seed=0, tool_every=7):
+    rng = random.Random(seed)
+    topics = ["billing", "shipping", "returns", "warranty", "discounts", "accounts", "invoices", "delivery"]
+    for turn in range(turns):
+        topic = rng.choice(topics)
+        filler = " ".join(rng.choice(topics) for _ in range(rng.randint(10, 50)))
+        question = HumanMessage(content=f"Turn {turn}: a question about {topic}. Some context: {filler}")
+        tool = None
+        if turn % tool_every == tool_every - 1:
+            call_id = f"call_{turn}"
+            tool = (
+                AIMessage(content="", tool_calls=[{"name": "lookup_order", "args": {"order": 1000 + turn}, "id": call_id}]),
+                ToolMessage(content=f"Order {1000 + turn}: shipped, total ${rng.randint(10, 500)}.00", tool_call_id=call_id),
+            )
+        yield question, tool
+
+
+class FullHistory:
+    """Scripts 13/14: every message is kept and sent."""
+
+    def __init__(self, system):
+        self.messages = [system]
+
+    def add(self, *messages):
+        self.messages.extend(messages)
+
+    def context(self):
+        return self.messages
+
+    def close(self):
+        pass
+
+
+class TrimEachTurn(FullHistory):
+    """`trim_messages` over the whole history every turn (recounting every message)."""
+
+    def __init__(self, system, budget):
+        super().__init__(system)
+        self.budget = budget
+
+    def context(self):
+        return trim_messages(
+            self.messages, max_tokens=self.budget, strategy="last", token_counter=count_tokens_approximately,
+            include_system=True, start_on="human",
+        )
+
+
+def replay(history, llm, turns, seed):
+    latencies, sent, bookkeeping = [], [], []
+    for question, tool in make_conversation(turns, seed):
+        start = time.perf_counter()
+        history.add(question)
+        if tool is not None:
+            history.add(*tool)
+        context = history.context()
+        spent = time.perf_counter() - start
+        response = llm.invoke(context)
+        start_add = time.perf_counter()
+        history.add(response)
+        spent += time.perf_counter() - start_add
+        latencies.append(time.perf_counter() - start)
+        sent.append(response.usage_metadata["input_tokens"])
+        bookkeeping.append(spent)
+    history.close()
+    return latencies, sent, bookkeeping
+
+
+# --- Step 5: Benchmark ---
+def benchmark(args):
+    llm = FakeChatLLM()
+    system = SystemMessage(content="You are a helpful customer support assistant for an online store.")
+    print(f"{args.turns}-turn conversation, budget {args.budget} tokens\n")
+    print(f"{'':<30} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'tok/turn':>9} {'last 50':>8} {'total tok':>10} {'keep us':>8}")
+    for label, make in [
+        ("full history (scripts 13/14)", lambda: FullHistory(system)),
+        ("trim_messages every turn", lambda: TrimEachTurn(system, args.budget)),
+        ("manager, inline summaries", lambda: HistoryManager(llm, args.budget, background=False)),
+        ("manager, background summaries", lambda: HistoryManager(llm, args.budget)),
+    ]:
+        history = make()
+        if isinstance(history, HistoryManager):
+            history.add(system)
+        latencies, sent, bookkeeping = replay(history, llm, args.turns, args.seed)
+        total = sum(sent)
+        stats = getattr(history, "stats", None)
+        if stats:
+            total += stats["summary_tokens_sent"]
+        print(
+            f"{label:<30} {statistics.median(latencies) * 1000:7.1f} {sorted(latencies)[int(len(latencies) * 0.99)] * 1000:7.1f}"
+            f" {max(latencies) * 1000:7.1f} {statistics.fmean(sent):9.0f} {statistics.fmean(sent[-50:]):8.0f} {total:10d}"
+            f" {statistics.fmean(bookkeeping) * 1e6:8.0f}"
+        )
+        if stats:
+            failed = f" ({stats['failed_summaries']} failed)" if stats["failed_summaries"] else ""
+            print(f"{'':<30} {stats['summaries']} summaries{failed} folded {stats['folded_messages']} messages, {stats['summary_tokens_sent']} tokens sent for them")
+
+
+def chat(args):
+    from langchain_groq import ChatGroq
+
+    llm = ChatGroq(model="llama-3.1-8b-instant")
+    history = HistoryManager(llm, args.budget)
+    history.add(SystemMessage(content="You are a math tutor who provides answers with a bit of sarcasm."))
+    try:
+        while text := input("You: ").strip():
+            history.add(HumanMessage(content=text))
+            response = llm.invoke(history.context())
+            history.add(response)
+            print(f"Assistant: {response.content}\n  ({history.total} tokens of history, {history.stats['summaries']} summaries)")
+    except EOFError:
+        pass
+    history.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-budgeted conversation history with background summaries")
+    parser.add_argument("--turns", type=int, default=500, help="Turns in the synthetic conversation")
+    parser.add_argument("--budget", type=int, default=3000, help="Token budget for the history sent each turn")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic conversation")
+    parser.add_argument("--chat", action="store_true", help="Chat with ChatGroq through the history manager")
+    args = parser.parse_args()
+    if args.chat:
+        chat(args)
+    else:
+        benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
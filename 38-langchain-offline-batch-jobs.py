@@ -0,0 +1,469 @@
+# Example: Offline batch jobs for LangChain chains (JSONL batch files, resumable)
+# Bulk work such as tagging the sentiment of thousands of reviews with script 09's chain, drafting
+# emails with script 04's template, or extracting authors with script 08's
+# `with_structured_output(Author)` doesn't need an answer within seconds, yet calling `invoke`
+# per item pays interactive prices and holds a connection per call. Provider batch APIs (Groq's
+# and OpenAI's `/v1/batches`) take a JSONL file of requests and return the results within hours,
+# at a discount. This script runs a chain that way:
+#
+# - The chain is split at its chat model: the stages before it (prompt templates, lambdas) turn
+#   each input into messages; the model's own settings and bound tools (from `bind_tools` or
+#   `with_structured_output`) go into each request body; the stages after it are the parsers.
+# - The requests are written as JSONL batch files (`custom_id`, `method`, `url`, `body`), split into
+#   jobs of at most `--chunk` lines, and submitted through a small provider interface: `submit`,
+#   `retrieve` (status) and `results`. GroqBatchProvider uses Groq's batch API; FileBatchProvider is
+#   a local stand-in that keeps jobs in a directory and answers them with any chat model after a
+#   simulated turnaround.
+# - Finished jobs are fed back through the parser stages, and each result is written to
+#   results.jsonl as `{"custom_id", "input", "output"}` or `{"custom_id", "input", "error"}`.
+#   A request the job returned no line for (the job expired, failed or was cancelled) gets an
+#   error record too, so every input ends up with exactly one record.
+# - Progress is checkpointed in the work directory (state.json, the batch files and the results),
+#   so an interrupted run, or one started with `--no-wait`, resumes where it left off when it is run
+#   again with the same work directory.
+#
+# Usage:
+#   python 38-langchain-offline-batch-jobs.py --task sentiment --fake --sample 500          # no API key required
+#   python 38-langchain-offline-batch-jobs.py --task authors --fake --sample 50 --no-wait   # submit, then exit
+#   python 38-langchain-offline-batch-jobs.py --task authors --fake                         # resume and collect
+#   python 38-langchain-offline-batch-jobs.py --task email --input details.jsonl --workdir email-job  # Groq batch API (requires GROQ_API_KEY)
+
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+from operator import itemgetter
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, convert_to_messages, convert_to_openai_messages
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.prompt_values import PromptValue
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableBinding, RunnablePassthrough, RunnableSequence
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+# --- Step 1: Splitting a chain into prompt stage, model request and parser stages ---
+def _flatten(runnable):
+    if isinstance(runnable, RunnableSequence):
+        return [step for part in runnable.steps for step in _flatten(part)]
+    return [runnable]
+
+
+def _pipe(steps):
+    if not steps:
+        return RunnablePassthrough()
+    return steps[0] if len(steps) == 1 else RunnableSequence(*steps)
+
+
+class BatchPlan:
+    """A chain taken apart at its chat model."""
+
+    def __init__(self, chain):
+        steps = _flatten(chain)
+        for i, step in enumerate(steps):
+            model = step.bound if isinstance(step, RunnableBinding) else step
+            if isinstance(model, BaseChatModel):
+                break
+        else:
+            raise ValueError("The chain has no chat model to batch")
+        self.prompt = _pipe(steps[:i])
+        self.parser = _pipe(steps[i + 1 :])
+        self.model = model
+        kwargs = dict(step.kwargs) if isinstance(step, RunnableBinding) else {}
+        kwargs.pop("ls_structured_output_format", None)
+        settings = {k: v for k, v in getattr(model, "_default_params", {}).items() if v is not None and k not in ("stream", "n", "service_tier")}
+        settings.setdefault("model", getattr(model, "model_name", None) or getattr(model, "model", None) or model._llm_type)
+        self.body = {**settings, **kwargs}
+
+    def messages(self, item):
+        value = self.prompt.invoke(item)
+        if isinstance(value, PromptValue):
+            return value.to_messages()
+        if isinstance(value, str):
+            return [HumanMessage(content=value)]
+        return convert_to_messages(value)
+
+    def request(self, custom_id, item):
+        body = {**self.body, "messages": convert_to_openai_messages(self.messages(item))}
+        return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+    def parse(self, response):
+        """A batch result line's response -> the chain's output (raises on an error response)."""
+        if response.get("status_code") != 200:
+            raise RuntimeError(f"HTTP {response.get('status_code')}: {json.dumps(response.get('body'))[:200]}")
+        message = response["body"]["choices"][0]["message"]
+        return self.parser.invoke(convert_to_messages([message])[0])
+
+
+# --- Step 2: Batch providers ---
+class GroqBatchProvider:
+    """Groq's batch API (files + batches, 24h completion window)."""
+
+    def __init__(self, client=None):
+        from groq import Groq
+
+        self.client = client or Groq()
+
+    def submit(self, path):
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions", completion_window="24h")
+        return batch.id
+
+    def retrieve(self, job_id):
+        batch = self.client.batches.retrieve(job_id)
+        return {"status": batch.status, "request_counts": dict(batch.request_counts or {})}
+
+    def results(self, job_id):
+        batch = self.client.batches.retrieve(job_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text().splitlines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class FileBatchProvider:
+    """A local stand-in: jobs live in a directory and are answered by a chat model after `turnaround` seconds.
+
+    Each job is `<root>/<job_id>/` with input.jsonl, batch.json (status) and output.jsonl, so
+    another process (or a later run) can poll and collect it, as with a real provider.
+    """
+
+    def __init__(self, root, llm, turnaround=2.0):
+        self.root = root
+        self.llm = llm
+        self.turnaround = turnaround
+        os.makedirs(root, exist_ok=True)
+
+    def _batch(self, job_id):
+        with open(os.path.join(self.root, job_id, "batch.json")) as f:
+            return json.load(f)
+
+    def _save(self, job_id, batch):
+        path = os.path.join(self.root, job_id, "batch.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(batch, f)
+        os.replace(path + ".tmp", path)
+
+    def submit(self, path):
+        job_id = f"batch_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.root, job_id))
+        shutil.copy(path, os.path.join(self.root, job_id, "input.jsonl"))
+        self._save(job_id, {"id": job_id, "status": "validating", "created_at": time.time()})
+        return job_id
+
+    def _process(self, job_id):
+        directory = os.path.join(self.root, job_id)
+        counts = {"total": 0, "completed": 0, "failed": 0}
+        with open(os.path.join(directory, "input.jsonl")) as requests, open(os.path.join(directory, "output.jsonl"), "w") as output:
+            for line in requests:
+                request = json.loads(line)
+                body = dict(request["body"])
+                messages = convert_to_messages(body.pop("messages"))
+                body.pop("model", None)
+                counts["total"] += 1
+                try:
+                    message = self.llm.invoke(messages, **body)
+                    response = {"status_code": 200, "body": {"choices": [{"index": 0, "message": convert_to_openai_messages(message)}]}}
+                    counts["completed"] += 1
+                except Exception as e:
+                    response = {"status_code": 500, "body": {"error": {"message": str(e)}}}
+                    counts["failed"] += 1
+                output.write(json.dumps({"custom_id": request["custom_id"], "response": response}) + "\n")
+        return counts
+
+    def retrieve(self, job_id):
+        batch = self._batch(job_id)
+        if batch["status"] not in TERMINAL:
+            elapsed = time.time() - batch["created_at"]
+            if elapsed >= self.turnaround:
+                batch.update(status="completed", request_counts=self._process(job_id))
+            elif elapsed >= self.turnaround / 4:
+                batch["status"] = "in_progress"
+            self._save(job_id, batch)
+        return {"status": batch["status"], "request_counts": batch.get("request_counts", {})}
+
+    def results(self, job_id):
+        path = os.path.join(self.root, job_id, "output.jsonl")
+        if not os.path.exists(path):
+            return  # expired or cancelled before it ran
+        with open(path) as f:
+            for line in f:
+                yield json.loads(line)
+
+
+# --- Step 3: The resumable job runner ---
+class OfflineBatchRunner:
+    def __init__(self, chain, provider, workdir, chunk=50_000, poll=30.0):
+        self.plan = BatchPlan(chain)
+        self.provider = provider
+        self.workdir = workdir
+        self.chunk = chunk
+        self.poll = poll
+        self.state_path = os.path.join(workdir, "state.json")
+        self.results_path = os.path.join(workdir, "results.jsonl")
+        os.makedirs(workdir, exist_ok=True)
+
+    def _load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return None
+
+    def _save(self, state):
+        with open(self.state_path + ".tmp", "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def prepare(self, items):
+        """Writes the batch files and the initial state (once; a resumed run keeps the existing ones)."""
+        state = self._load()
+        if state is not None:
+            return state
+        jobs, handle = [], None
+        for index, item in enumerate(items):
+            if index % self.chunk == 0:
+                if handle is not None:
+                    handle.close()
+                path = os.path.join(self.workdir, f"requests-{len(jobs):03d}.jsonl")
+                jobs.append({"file": path, "job_id": None, "status": "prepared", "collected": False, "requests": 0})
+                handle = open(path, "w")
+            handle.write(json.dumps(self.plan.request(f"item-{index}", item)) + "\n")
+            jobs[-1]["requests"] += 1
+        if handle is not None:
+            handle.close()
+        state = {"body": self.plan.body, "jobs": jobs}
+        self._save(state)
+        return state
+
+    def submit(self, state):
+        for job in state["jobs"]:
+            if job["job_id"] is None:
+                job["job_id"] = self.provider.submit(job["file"])
+                job["status"] = "submitted"
+                self._save(state)
+                print(f"submitted {job['file']} as {job['job_id']} ({job['requests']} requests)")
+
+    def _collected_ids(self):
+        """The custom ids already in results.jsonl, dropping a partial last line left by a crash."""
+        if not os.path.exists(self.results_path):
+            return set()
+        ids, complete = set(), 0
+        with open(self.results_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    ids.add(json.loads(line)["custom_id"])
+                complete += len(line)
+        if os.path.getsize(self.results_path) > complete:
+            os.truncate(self.results_path, complete)
+        return ids
+
+    @staticmethod
+    def _job_ids(job):
+        with open(job["file"]) as f:
+            return [json.loads(line)["custom_id"] for line in f if line.strip()]
+
+    def collect(self, state, items):
+        """Feeds finished jobs back through the parser stages; returns True when all jobs are collected."""
+        done = self._collected_ids()
+        with open(self.results_path, "a") as output:
+            for job in state["jobs"]:
+                if job["collected"]:
+                    continue
+                status = self.provider.retrieve(job["job_id"])
+                if status["status"] != job["status"]:
+                    job["status"] = status["status"]
+                    self._save(state)
+                    print(f"{job['job_id']}: {status['status']} {status.get('request_counts') or ''}")
+                if status["status"] not in TERMINAL:
+                    continue
+                for line in self.provider.results(job["job_id"]):
+                    custom_id = line["custom_id"]
+                    if custom_id in done:
+                        continue
+                    record = {"custom_id": custom_id, "input": items[int(custom_id.split("-")[1])]}
+                    try:
+                        record["output"] = _jsonable(self.plan.parse(line.get("response") or {"status_code": None, "body": line.get("error")}))
+                    except Exception as e:
+                        record["error"] = str(e)
+                    output.write(json.dumps(record) + "\n")
+                    done.add(custom_id)
+                # An expired, failed or cancelled job (or a completed one with gaps) returns fewer
+                # lines than it was sent; record an error for each request that got no answer
+                missing = [custom_id for custom_id in self._job_ids(job) if custom_id not in done]
+                for custom_id in missing:
+                    record = {"custom_id": custom_id, "input": items[int(custom_id.split("-")[1])],
+                              "error": f"No result: batch job {job['job_id']} ended as {status['status']}"}
+                    output.write(json.dumps(record) + "\n")
+                    done.add(custom_id)
+                if missing:
+                    print(f"{job['job_id']}: {len(missing)} of {job['requests']} requests had no result ({status['status']}); error records written")
+                output.flush()
+                job["missing"] = len(missing)
+                job["collected"] = True
+                self._save(state)
+        return all(job["collected"] for job in state["jobs"])
+
+    def run(self, items, wait=True):
+        state = self.prepare(items)
+        self.submit(state)
+        while not self.collect(state, items):
+            if not wait:
+                print(f"jobs submitted; run again with the same work directory ({self.workdir}) to collect the results")
+                return False
+            time.sleep(self.poll)
+        return True
+
+
+def _jsonable(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, AIMessage):
+        return value.content
+    return value
+
+
+# --- Step 4: The chains from scripts 04, 08 and 09, and a fake model ---
+email_template = PromptTemplate.from_template(
+    "Create an invitation email to the recipient that is {recipient_name}\n"
+    "for an event that is {event_type}\n"
+    "in a language that is {language}\n"
+    "Mention the event location that is {event_location}\n"
+    "and event date that is {event_date}.\n"
+    "Also write few sentences about the event description that is {event_description}\n"
+    "in style that is {style}."
+)
+
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+
+
+class Author(BaseModel):
+    name: str = Field(description="The name of the author")
+    number: int = Field(description="The number of books written by the author")
+    books: list[str] = Field(description="The list of books they wrote")
+
+
+def build_chain(task, llm):
+    if task == "sentiment":
+        return sentiment_template | llm | StrOutputParser()
+    if task == "email":
+        return email_template | llm | StrOutputParser()
+    return itemgetter("question") | llm.with_structured_output(Author)
+
+
+def sample_items(task, n, seed=0):
+    rng = random.Random(seed)
+    if task == "sentiment":
+        phrases = ["The customer service was fantastic.", "The delivery was late.", "The product works as described.",
+                   "I was extremely disappointed with the support.", "Great value for the price."]
+        return [{"feedback": " ".join(rng.sample(phrases, 2))} for _ in range(n)]
+    if task == "email":
+        names = ["John", "Priya", "Mei", "Carlos", "Amara"]
+        return [
+            {"recipient_name": rng.choice(names), "event_type": "product launch", "language": "American english",
+             "event_location": "Grand Ballroom, City Center Hotel", "event_date": f"11 AM, January {i % 28 + 1}, 2025",
+             "event_description": "an exciting unveiling of our latest GenAI product", "style": "enthusiastic tone"}
+            for i in range(n)
+        ]
+    authors = ["Dan Brown", "Agatha Christie", "Haruki Murakami", "Chimamanda Ngozi Adichie"]
+    return [{"question": f"Generate the books written by {rng.choice(authors)}"} for _ in range(n)]
+
+
+class FakeBatchLLM(BaseChatModel):
+    """Answers the three tasks: a sentiment word, an email, or an Author tool call when tools are bound."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-batch"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        if tool_choice and tool_choice != "any":
+            kwargs["tool_choice"] = {"type": "function", "function": {"name": formatted[0]["function"]["name"]}}
+        elif tool_choice:
+            kwargs["tool_choice"] = "required"
+        return self.bind(tools=formatted, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        text = messages[-1].content
+        if tools:
+            name = text.rsplit(" by ", 1)[-1]
+            args = {"name": name, "number": len(name) % 5 + 2, "books": [f"{name}'s book {i + 1}" for i in range(len(name) % 5 + 2)]}
+            message = AIMessage(content="", tool_calls=[{"name": tools[0]["function"]["name"], "args": args, "id": f"call_{uuid.uuid4().hex[:8]}"}])
+        elif text.startswith("Determine the sentiment"):
+            lowered = text.lower()
+            if any(word in lowered for word in ("disappointed", "late", "terrible")):
+                content = "Negative"
+            elif any(word in lowered for word in ("fantastic", "great")):
+                content = "Positive"
+            else:
+                content = "Neutral"
+            message = AIMessage(content=content)
+        else:
+            recipient = text.split("recipient that is ", 1)[-1].split("\n", 1)[0]
+            message = AIMessage(content=f"Subject: You're invited!\n\nDear {recipient},\n\nJoin us for our product launch...")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# --- Step 5: Run a job end to end ---
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch jobs for LangChain chains")
+    parser.add_argument("--task", choices=["sentiment", "email", "authors"], default="sentiment", help="Chain to run (scripts 09, 04, 08)")
+    parser.add_argument("--input", help="JSONL file of chain inputs (default: generated samples)")
+    parser.add_argument("--sample", type=int, default=200, help="Generated inputs when --input is not given")
+    parser.add_argument("--workdir", help="Work directory with the checkpoint (default: batch-<task>)")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Most requests per batch job")
+    parser.add_argument("--poll", type=float, help="Seconds between status checks (default: 30, or 0.5 with --fake)")
+    parser.add_argument("--no-wait", action="store_true", help="Submit and exit; run again to collect")
+    parser.add_argument("--fake", action="store_true", help="Use the local file-based stand-in provider (no API key required)")
+    parser.add_argument("--turnaround", type=float, default=2.0, help="Stand-in provider's seconds until a job completes")
+    args = parser.parse_args()
+
+    workdir = args.workdir or f"batch-{args.task}"
+    if args.fake:
+        llm = FakeBatchLLM()
+        provider = FileBatchProvider(os.path.join(workdir, "provider"), llm, args.turnaround)
+    else:
+        from langchain_groq import ChatGroq
+
+        llm = ChatGroq(model="llama-3.1-8b-instant")
+        provider = GroqBatchProvider()
+
+    if args.input:
+        with open(args.input) as f:
+            items = [json.loads(line) for line in f if line.strip()]
+    else:
+        items = sample_items(args.task, args.sample)
+
+    runner = OfflineBatchRunner(build_chain(args.task, llm), provider, workdir, args.chunk, args.poll or (0.5 if args.fake else 30.0))
+    start = time.perf_counter()
+    if not runner.run(items, wait=not args.no_wait):
+        return
+    with open(runner.results_path) as f:
+        results = [json.loads(line) for line in f]
+    errors = sum("error" in r for r in results)
+    print(f"\n{len(results)} results ({errors} errors) in {runner.results_path}, {time.perf_counter() - start:.1f}s this run")
+    for record in results[:3]:
+        print(f"- {record['custom_id']}: {json.dumps(record.get('output', record.get('error')))[:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+# Example: Single-flight deduplication of identical in-flight LLM calls
+# When many concurrent requests reach a chain with the same input (script 09's
+# `sentiment_template` on a popular review, script 02's "What is the tallest building in the
+# world?"), each one makes its own ChatGroq call, though the answers are interchangeable. Script 16
+# caches finished answers; this script covers the window before the first answer is back:
+#
+# - SingleFlightChatModel wraps any chat model. Requests are keyed on the normalized messages (role
+#   and content only, surrounding whitespace stripped, line endings unified; ids and metadata
+#   ignored) and the model's params (`_get_llm_string`, as script 16 keys its cache), so the same
+#   prompt with a different run id, tags or trailing newline still matches.
+# - The first request for a key makes the upstream call in its own task; identical requests that
+#   arrive while it is in flight wait for it instead of calling. Nothing is kept afterwards: the
+#   next request after the answer arrives calls again (put script 16's cache in front for that).
+# - Streams are shared too: every waiter gets every chunk, and one that joins late first gets the
+#   chunks already streamed. An `invoke` that joins a stream gets the merged message, and a
+#   stream that joins an `invoke` gets the whole message as one chunk. The upstream call keeps
+#   going if the caller that started it goes away, and an upstream error reaches every waiter.
+# - Sync `invoke` calls from threads are deduplicated the same way; sync `stream` is passed through.
+#
+# The benchmark drives script 09's sentiment chain (half `ainvoke`, half `astream`) and script 02's
+# question with Poisson arrivals and a skewed (Zipf) choice of inputs, against a mock provider with
+# time-to-first-token, tokens/second and a concurrency limit, with and without single-flight:
+# upstream calls and p50/p95/p99 latency and time to first token.
+#
+# Usage:
+#   python 39-langchain-single-flight.py                       # no API key required
+#   python 39-langchain-single-flight.py --requests 5000 --rate 500 --zipf 1.3
+#   python 39-langchain-single-flight.py --groq                # a short burst against ChatGroq (requires GROQ_API_KEY)
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, convert_to_openai_messages, message_chunk_to_message
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import PromptTemplate
+from pydantic import Field, PrivateAttr
+from dotenv import load_dotenv
+
+# Load environment variables (e.g., GROQ_API_KEY) from .env
+load_dotenv()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def to_chunk(message):
+    """The message as a chunk, with every field (ids, usage and response metadata, tool calls) kept."""
+    if isinstance(message, AIMessageChunk):
+        return message
+    fields = message.model_dump(exclude={"type", "tool_calls", "invalid_tool_calls"})
+    tool_call_chunks = [
+        {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index, "type": "tool_call_chunk"}
+        for index, call in enumerate(message.tool_calls)
+    ]
+    return AIMessageChunk(**fields, tool_call_chunks=tool_call_chunks)
+
+
+def merge_chunks(chunks):
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged += chunk
+    return message_chunk_to_message(merged)
+
+
+# --- Step 1: One in-flight upstream call and everyone waiting on it ---
+class _Flight:
+    def __init__(self):
+        self.chunks = []
+        self.message = None
+        self.error = None
+        self.done = False
+        self.waiters = 1
+        self.changed = asyncio.Condition()
+
+    async def _publish(self, chunk=None, message=None, error=None, done=False):
+        async with self.changed:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            self.message = message or self.message
+            self.error = error
+            self.done = done
+            self.changed.notify_all()
+
+    async def result(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.message if self.message is not None else merge_chunks(self.chunks)
+
+    async def follow(self):
+        seen = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.done or len(self.chunks) > seen)
+                new, done = self.chunks[seen:], self.done
+            seen += len(new)
+            for chunk in new:
+                yield chunk
+            if done:
+                if self.error is not None:
+                    raise self.error
+                if self.message is not None and not self.chunks:
+                    yield to_chunk(self.message)
+                return
+
+
+# --- Step 2: The single-flight wrapper ---
+class SingleFlightChatModel(BaseChatModel):
+    llm: BaseChatModel
+    stats: dict = Field(default_factory=lambda: {"requests": 0, "upstream_calls": 0, "shared": 0})
+    _inflight: dict = PrivateAttr(default_factory=dict)
+    _threads: dict = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _tasks: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"single-flight-{self.llm._llm_type}"
+
+    # The wrapper answers exactly as the wrapped model does, so caches and tracing identify it by
+    # the wrapped model's parameters (model name, temperature, ...)
+    @property
+    def _identifying_params(self):
+        return self.llm._identifying_params
+
+    def _get_llm_string(self, stop=None, **kwargs):
+        return self.llm._get_llm_string(stop=stop, **kwargs)
+
+    def _key(self, messages, stop, kwargs):
+        normalized = []
+        for message in convert_to_openai_messages(messages):
+            content = message.get("content")
+            if isinstance(content, str):
+                message["content"] = content.replace("\r\n", "\n").strip()
+            normalized.append(message)
+        payload = json.dumps({"llm": self.llm._get_llm_string(stop=stop, **kwargs), "messages": normalized}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _join(self, key):
+        self.stats["requests"] += 1
+        flight = self._inflight.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.stats["shared"] += 1
+        return flight
+
+    def _start(self, key, produce):
+        flight = _Flight()
+        self._inflight[key] = flight
+        self.stats["upstream_calls"] += 1
+
+        async def run():
+            try:
+                await produce(flight)
+            except Exception as e:
+                await flight._publish(error=e, done=True)
+            finally:
+                self._inflight.pop(key, None)
+
+        # A task of its own, so the call survives the caller that started it being cancelled. The
+        # loop only keeps a weak reference to it, so hold on to it until it finishes
+        task = asyncio.ensure_future(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._key(messages, stop, kwargs)
+        flight = self._join(key)
+        if flight is None:
+            async def produce(flight):
+                message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+                await flight._publish(message=message, done=True)
+
+            flight = self._start(key, produce)
+        message = await flight.result()
+        return ChatResult(generations=[ChatGeneration(message=message.model_copy())])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._key(messages, stop, kwargs)
+        flight = self._join(key)
+        if flight is None:
+            async def produce(flight):
+                async for chunk in self.llm.astream(messages, stop=stop, **kwargs):
+                    await flight._publish(chunk=chunk)
+                await flight._publish(done=True)
+
+            flight = self._start(key, produce)
+        async for chunk in flight.follow():
+            # Each waiter gets its own copy: LangChain sets the run id on the chunks it yields
+            chunk = chunk.model_copy()
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._key(messages, stop, kwargs)
+        with self._lock:
+            self.stats["requests"] += 1
+            future = self._threads.get(key)
+            leader = future is None
+            if leader:
+                future = self._threads[key] = Future()
+                self.stats["upstream_calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        if leader:
+            try:
+                future.set_result(self.llm.invoke(messages, stop=stop, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._threads.pop(key, None)
+        return ChatResult(generations=[ChatGeneration(message=future.result().model_copy())])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self.llm.stream(messages, stop=stop, **kwargs):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+# --- Step 3: A mock provider with time-to-first-token, tokens/second and a concurrency limit ---
+class MockProvider(BaseChatModel):
+    ttft: float = 0.15
+    tokens_per_second: float = 200.0
+    max_concurrency: int = 64
+    model_name: str = "mock-llama"
+    calls: int = 0
+    _semaphore: asyncio.Semaphore | None = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-provider"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def _answer(self, messages):
+        text = messages[-1].content.lower()
+        if "tallest building" in text:
+            return "The tallest building in the world is the Burj Khalifa in Dubai, at 828 metres."
+        if any(word in text for word in ("disappointed", "rude", "late", "broken")):
+            return "Negative"
+        if any(word in text for word in ("fantastic", "great", "friendly", "love")):
+            return "Positive"
+        return "Neutral"
+
+    def _tokens(self, messages):
+        return re.findall(r"\S+\s*", self._answer(messages))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.calls += 1
+            await asyncio.sleep(self.ttft)
+            for token in self._tokens(messages):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+                await asyncio.sleep(1 / self.tokens_per_second)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [chunk.message async for chunk in self._astream(messages)]
+        return ChatResult(generations=[ChatGeneration(message=merge_chunks(chunks))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.ttft + len(self._tokens(messages)) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+
+# --- Step 4: Script 09's chain and script 02's question under a skewed load ---
+sentiment_template = PromptTemplate(
+    input_variables=["feedback"],
+    template="Determine the sentiment of this feedback and reply in one word as either 'Positive', 'Neutral', or 'Negative':\n\n{feedback}"
+)
+
+QUESTION = "What is the tallest building in the world?"
+
+
+def make_feedback(count, seed=0):
+    rng = random.Random(seed)
+    openings = ["The delivery was late.", "The customer service was fantastic.", "The product arrived broken.",
+                "The app works as described.", "I love the new design.", "The representative was rude."]
+    details = ["order", "refund", "package", "support call", "checkout", "subscription", "invoice", "courier"]
+    return [f"{rng.choice(openings)} Regarding my {rng.choice(details)} #{i}." for i in range(count)]
+
+
+def zipf_sampler(count, s, rng):
+    weights = [1 / (rank + 1) ** s for rank in range(count)]
+    total, cumulative = 0.0, []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return lambda: rng.choices(range(count), cum_weights=cumulative)[0]
+
+
+async def run_load(llm, args):
+    rng = random.Random(args.seed)
+    feedback = make_feedback(args.distinct, args.seed)
+    pick = zipf_sampler(len(feedback), args.zipf, rng)
+    chain = sentiment_template | llm | StrOutputParser()
+    latencies, first_tokens, wrong = [], [], 0
+
+    async def request(kind, value):
+        nonlocal wrong
+        start = time.perf_counter()
+        first = None
+        if kind == "question":
+            # Script 02 asks the model directly; callers add stray whitespace
+            answer = (await llm.ainvoke(value)).content
+        elif kind == "stream":
+            parts = []
+            async for part in chain.astream({"feedback": value}):
+                first = first or time.perf_counter()
+                parts.append(part)
+            answer = "".join(parts)
+        else:
+            answer = await chain.ainvoke({"feedback": value})
+        latencies.append(time.perf_counter() - start)
+        if first is not None:
+            first_tokens.append(first - start)
+        expected = MockProvider()._answer([AIMessage(content=value)])
+        wrong += answer != expected
+
+    tasks, due = [], time.perf_counter()
+    for _ in range(args.requests):
+        due += rng.expovariate(args.rate)
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        if rng.random() < 0.1:
+            kind, value = "question", QUESTION + rng.choice(["", " ", "\n", "  \n"])
+        else:
+            kind, value = rng.choice(["invoke", "stream"]), feedback[pick()]
+        tasks.append(asyncio.create_task(request(kind, value)))
+    await asyncio.gather(*tasks)
+    return latencies, first_tokens, wrong
+
+
+async def groq_burst():
+    from langchain_groq import ChatGroq
+
+    llm = SingleFlightChatModel(llm=ChatGroq(model="llama-3.1-8b-instant"))
+    chain = sentiment_template | llm | StrOutputParser()
+    feedback = "The customer service was fantastic. The representative was friendly and resolved my issue quickly."
+    answers = await asyncio.gather(*(chain.ainvoke({"feedback": feedback}) for _ in range(20)))
+    print(f"20 identical requests -> {llm.stats['upstream_calls']} ChatGroq call(s); answers: {set(answers)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-flight deduplication of identical in-flight LLM calls")
+    parser.add_argument("--requests", type=int, default=3000, help="Requests to send")
+    parser.add_argument("--rate", type=float, default=300, help="Mean arrivals per second (Poisson)")
+    parser.add_argument("--distinct", type=int, default=2000, help="Distinct feedback texts")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of the input popularity")
+    parser.add_argument("--ttft", type=float, default=0.15, help="Mock provider time to first token (seconds)")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Mock provider's concurrent call limit")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for inputs and arrivals")
+    parser.add_argument("--groq", action="store_true", help="Send a burst of identical requests to ChatGroq instead")
+    args = parser.parse_args()
+
+    if args.groq:
+        asyncio.run(groq_burst())
+        return
+
+    print(f"{args.requests} requests at ~{args.rate:g}/s, Zipf({args.zipf:g}) over {args.distinct} inputs + script 02's question;")
+    print(f"mock provider: {args.ttft * 1000:g} ms to first token, at most {args.max_concurrency} calls at once\n")
+    print(f"{'':<16} {'upstream':>9} {'saved':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft p50':>9} {'ttft p99':>9} {'wrong':>6}")
+    for label, wrap in [("direct", False), ("single-flight", True)]:
+        provider = MockProvider(ttft=args.ttft, max_concurrency=args.max_concurrency)
+        llm = SingleFlightChatModel(llm=provider) if wrap else provider
+        latencies, first_tokens, wrong = asyncio.run(run_load(llm, args))
+        print(
+            f"{label:<16} {provider.calls:9d} {1 - provider.calls / args.requests:6.0%}"
+            f" {percentile(latencies, 50) * 1000:8.0f} {percentile(latencies, 95) * 1000:8.0f} {percentile(latencies, 99) * 1000:8.0f}"
+            f" {percentile(first_tokens, 50) * 1000:9.0f} {percentile(first_tokens, 99) * 1000:9.0f} {wrong:6d}"
+        )
+        if wrap:
+            print(f"{'':<16} {llm.stats}")
+
+    # Threads calling the sync `invoke` share too
+    provider = MockProvider(ttft=args.ttft)
+    llm = SingleFlightChatModel(llm=provider)
+    threads = [threading.Thread(target=llm.invoke, args=(QUESTION,)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"\n10 threads invoking script 02's question -> {provider.calls} upstream call(s)")
+
+
+if __name__ == "__main__":
+    main()